@@ -0,0 +1,185 @@
+"""Archivage des anciens messages dans un stockage froid compact.
+
+Les messages des mois antérieurs à `MESSAGE_ARCHIVE['HOT_MONTHS']` quittent la table
+`accounts_message` (partition du mois supprimée d'un bloc si la table est partitionnée,
+voir `accounts.partitions`; suppression par tranches sinon) et sont conservés dans
+`MessageArchiveSegment`: des tranches d'au plus `SEGMENT_SIZE` messages d'une même
+conversation, en JSON Lines compressé (zlib), bornées par `(created_at, id)`.
+
+L'historique paginé (`list_messages`) lit les tranches de façon transparente une
+fois la table chaude épuisée (`archived_before` / `archived_after`): les requêtes
+courantes ne touchent que les partitions récentes. Les messages archivés ne changent
+plus (statuts figés) et ne sont plus indexés pour la recherche plein texte. Leurs
+médias restent dans le stockage; `ArchivedMedia` en garde les participants pour que
+`serve_media` continue de les autoriser.
+"""
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat, Greatest, Least
+from django.utils.dateparse import parse_datetime
+
+from . import partitions
+from .encoders import ROW_FIELDS, MessageRow
+from .models import ArchivedMedia, ConversationSummary, MediaJob, MediaUpload, Message, MessageArchiveSegment
+
+DEFAULTS = {
+    'HOT_MONTHS': 12,
+    'SEGMENT_SIZE': 500,
+    'PARTITIONS_AHEAD': 3,
+}
+DATETIME_FIELDS = ('created_at', 'delivered_at', 'read_at', 'updated_at')
+DELETE_BATCH_SIZE = 5000
+
+
+def archive_setting(name):
+    return getattr(settings, 'MESSAGE_ARCHIVE', {}).get(name, DEFAULTS[name])
+
+
+def pack(rows):
+    """Compresse des lignes de messages (dicts) en JSON Lines zlib."""
+    # Horodatages à la microseconde (DjangoJSONEncoder tronque à la milliseconde): les curseurs en dépendent
+    lines = '\n'.join(
+        json.dumps({**row, **{f: row[f] and row[f].isoformat() for f in DATETIME_FIELDS}}, separators=(',', ':'))
+        for row in rows
+    )
+    return zlib.compress(lines.encode(), 6)
+
+
+def unpack(payload):
+    """Lignes `MessageRow` d'une tranche, dans l'ordre `(created_at, id)`."""
+    messages = []
+    for line in zlib.decompress(bytes(payload)).decode().splitlines():
+        row = json.loads(line)
+        for field in DATETIME_FIELDS:
+            if row[field]:
+                row[field] = parse_datetime(row[field])
+        messages.append(MessageRow(**row))
+    return messages
+
+
+def _segments(month, rows, segment_size):
+    """Tranches successives (au plus `segment_size` messages d'une conversation) de `rows`, triées par conversation."""
+    chunk = []
+    for row in rows:
+        if chunk and (row['conversation_key'] != chunk[0]['conversation_key'] or len(chunk) == segment_size):
+            yield _segment(month, chunk)
+            chunk = []
+        chunk.append(row)
+    if chunk:
+        yield _segment(month, chunk)
+
+
+def _segment(month, chunk):
+    return MessageArchiveSegment(
+        conversation_key=chunk[0]['conversation_key'],
+        month=month.date(),
+        first_created_at=chunk[0]['created_at'],
+        first_id=chunk[0]['id'],
+        last_created_at=chunk[-1]['created_at'],
+        last_id=chunk[-1]['id'],
+        count=len(chunk),
+        payload=pack(chunk),
+    )
+
+
+def archive_month(month, segment_size=None):
+    """Archive les messages du mois commençant à `month` (UTC). Retourne le nombre de messages archivés.
+
+    Copie et suppression ont lieu dans la même transaction: une archive interrompue ne laisse
+    ni doublon ni perte, et une nouvelle exécution reprend les lignes encore présentes.
+    Les lignes sont lues en flux (`iterator`) et les tranches écrites par lots.
+    """
+    segment_size = segment_size or archive_setting('SEGMENT_SIZE')
+    end = partitions.add_months(month, 1)
+    hot = Message.objects.filter(created_at__gte=month, created_at__lt=end)
+    total = 0
+    with transaction.atomic():
+        # Clé de conversation manquante (lignes antérieures à `backfill_conversation_keys`): le regroupement en dépend
+        hot.filter(conversation_key__isnull=True).update(conversation_key=Concat(
+            Cast(Least('sender_id', 'receiver_id'), CharField()), Value(':'),
+            Cast(Greatest('sender_id', 'receiver_id'), CharField()),
+        ))
+        rows = hot.order_by('conversation_key', 'created_at', 'id').values(*ROW_FIELDS).iterator(chunk_size=2000)
+        batch = []
+        for segment in _segments(month, rows, segment_size):
+            batch.append(segment)
+            total += segment.count
+            if len(batch) == 100:
+                MessageArchiveSegment.objects.bulk_create(batch)
+                batch = []
+        MessageArchiveSegment.objects.bulk_create(batch)
+        if not total:
+            return 0
+
+        # Références sans contrainte en base vers les messages archivés
+        ids = hot.values('id')
+        _record_media(hot)
+        ConversationSummary.objects.filter(last_message_id__in=ids).update(last_message=None)
+        MediaUpload.objects.filter(message_id__in=ids).update(message=None)
+        MediaJob.objects.filter(message_id__in=ids).delete()
+
+        if not (partitions.is_partitioned() and partitions.drop_month_partition(month)):
+            # Partition héritée (ou table non partitionnée): suppression par tranches
+            while True:
+                batch_ids = list(hot.values_list('id', flat=True)[:DELETE_BATCH_SIZE])
+                if not batch_ids:
+                    break
+                Message.objects.filter(id__in=batch_ids).delete()
+    return total
+
+
+def _record_media(hot):
+    """Enregistre les participants des fichiers et posters de `hot` (`ArchivedMedia`), par lots."""
+    media = hot.exclude(message_type='text').values_list('file', 'poster', 'sender_id', 'receiver_id').iterator(chunk_size=2000)
+    batch = []
+    for file, poster, sender_id, receiver_id in media:
+        batch.extend(ArchivedMedia(name=name, sender_id=sender_id, receiver_id=receiver_id) for name in (file, poster) if name)
+        if len(batch) >= 1000:
+            ArchivedMedia.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ArchivedMedia.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def archivable_months(now, hot_months=None):
+    """Mois (UTC) antérieurs à la fenêtre chaude qui contiennent encore des messages."""
+    hot_months = archive_setting('HOT_MONTHS') if hot_months is None else hot_months
+    cutoff = partitions.add_months(partitions.month_start(now), -hot_months)
+    oldest = Message.objects.filter(created_at__lt=cutoff).order_by('created_at').values_list('created_at', flat=True).first()
+    months = []
+    month = partitions.month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        months.append(month)
+        month = partitions.add_months(month, 1)
+    return months
+
+
+def archived_before(conversation_key, cursor, limit):
+    """Au plus `limit` messages archivés antérieurs au curseur `(created_at, id)` (tous si `None`), du plus récent au plus ancien."""
+    segments = MessageArchiveSegment.objects.filter(conversation_key=conversation_key)
+    if cursor is not None:
+        segments = segments.filter(first_created_at__lte=cursor[0])
+    messages = []
+    for segment in segments.order_by('-first_created_at', '-first_id').iterator(chunk_size=4):
+        for message in reversed(unpack(segment.payload)):
+            if cursor is None or (message.created_at, message.id) < cursor:
+                messages.append(message)
+                if len(messages) == limit:
+                    return messages
+    return messages
+
+
+def archived_after(conversation_key, cursor, limit):
+    """Au plus `limit` messages archivés postérieurs au curseur `(created_at, id)`, du plus ancien au plus récent."""
+    segments = MessageArchiveSegment.objects.filter(conversation_key=conversation_key, last_created_at__gte=cursor[0])
+    messages = []
+    for segment in segments.order_by('first_created_at', 'first_id').iterator(chunk_size=4):
+        for message in unpack(segment.payload):
+            if (message.created_at, message.id) > cursor:
+                messages.append(message)
+                if len(messages) == limit:
+                    return messages
+    return messages
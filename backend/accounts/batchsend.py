@@ -0,0 +1,129 @@
+"""Envoi groupé de messages texte (bots, annonces à de nombreux destinataires).
+
+- `parse_batch`: normalise la requête (`items: [{receiver, content}]`, ou `receivers` + `content`)
+- `create_batch`: valide les éléments, persiste les messages valides en un seul `bulk_create`
+  et met à jour les résumés de conversation en quelques requêtes (`record_messages`)
+  ainsi que l'index de recherche
+- `batch_events`: un seul événement par utilisateur concerné (publié via `apublish_many`)
+
+Utilisé par l'endpoint REST `messages/send/batch/` et la commande WebSocket `send_batch`.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .encoders import MessageRow, get_message_encoder
+from .models import Message
+from .search import get_search_backend
+from .summaries import record_messages
+
+MAX_BATCH_SIZE = 500
+MAX_CONTENT_LENGTH = 10_000
+
+
+class BatchError(Exception):
+    """Requête d'envoi groupé invalide dans son ensemble (message destiné au client)."""
+
+
+def parse_batch(payload):
+    """Retourne la liste `[(receiver, content)]` décrite par `payload`. Lève `BatchError`."""
+    if not isinstance(payload, dict):
+        raise BatchError('Request body must be a JSON object.')
+    if payload.get('receivers') is not None:
+        receivers = payload.get('receivers')
+        if not isinstance(receivers, list):
+            raise BatchError("'receivers' must be a list.")
+        items = [(receiver, payload.get('content')) for receiver in receivers]
+    else:
+        raw = payload.get('items')
+        if not isinstance(raw, list):
+            raise BatchError("'items' must be a list.")
+        items = [(item.get('receiver'), item.get('content')) if isinstance(item, dict) else (None, None) for item in raw]
+    if not items:
+        raise BatchError('Batch is empty.')
+    if len(items) > MAX_BATCH_SIZE:
+        raise BatchError(f'Batch exceeds {MAX_BATCH_SIZE} items.')
+    return items
+
+
+def receiver_ids(items):
+    """Identifiants de destinataires valides (entiers) présents dans `items`."""
+    ids = set()
+    for receiver, _ in items:
+        try:
+            ids.add(int(receiver))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def create_batch(sender_id, items, online_ids=()):
+    """Crée les messages valides de `items` et retourne `(messages, results)`.
+
+    `results` suit l'ordre de `items`: `{index, id, receiver, status}` ou `{index, receiver, error}`.
+    Les messages destinés à un utilisateur de `online_ids` sont créés directement à l'état `delivered`.
+    """
+    existing = set(get_user_model().objects.filter(id__in=receiver_ids(items), is_active=True).values_list('id', flat=True))
+    online_ids = set(online_ids)
+    now = timezone.now()
+    results = []
+    messages = []
+    for index, (receiver, content) in enumerate(items):
+        try:
+            receiver_id = int(receiver)
+        except (TypeError, ValueError):
+            results.append({'index': index, 'receiver': receiver, 'error': 'Invalid receiver.'})
+            continue
+        if receiver_id not in existing:
+            results.append({'index': index, 'receiver': receiver_id, 'error': 'Unknown receiver.'})
+        elif not isinstance(content, str) or not content.strip() or len(content) > MAX_CONTENT_LENGTH:
+            results.append({'index': index, 'receiver': receiver_id, 'error': 'Invalid content.'})
+        else:
+            delivered = receiver_id in online_ids
+            messages.append(Message(
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                content=content,
+                conversation_key=Message.conversation_key_for(sender_id, receiver_id),
+                status='delivered' if delivered else 'sent',
+                delivered_at=now if delivered else None,
+            ))
+            results.append({'index': index, 'receiver': receiver_id})
+    if messages:
+        with transaction.atomic():
+            # bulk_create ne déclenche pas post_save: résumés mis à jour explicitement
+            Message.objects.bulk_create(messages)
+            record_messages(messages)
+            get_search_backend().index_messages(messages)
+        created = iter(messages)
+        for result in results:
+            if 'error' not in result:
+                message = next(created)
+                result.update(id=message.id, status=message.status)
+    return messages, results
+
+
+def message_event_data(message):
+    """Données d'un événement `message_created` (encodeur partagé)."""
+    return get_message_encoder().event(MessageRow.from_message(message))
+
+
+def batch_events(sender_id, messages):
+    """Événements à publier: un par destinataire et un seul pour l'émetteur.
+
+    Un destinataire qui reçoit un seul message reçoit `message_created`, sinon
+    `messages_created` `{messages: [...]}`; l'émetteur reçoit `messages_created`.
+    """
+    if not messages:
+        return []
+    per_receiver = {}
+    for message in messages:
+        per_receiver.setdefault(message.receiver_id, []).append(message_event_data(message))
+    entries = []
+    for receiver_id, data in per_receiver.items():
+        if receiver_id == sender_id:
+            continue
+        entries.append((receiver_id, 'message_created', data[0]) if len(data) == 1
+                       else (receiver_id, 'messages_created', {'messages': data}))
+    entries.append((sender_id, 'messages_created', {'messages': [message_event_data(m) for m in messages]}))
+    return entries
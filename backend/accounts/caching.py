@@ -0,0 +1,44 @@
+"""Petits caches en mémoire de processus."""
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU borné dont les entrées expirent après `ttl` secondes.
+
+    Non partagé entre processus: à utiliser comme premier niveau devant Redis/la base.
+    """
+
+    def __init__(self, maxsize=10_000, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key, default=MISSING):
+        """Renvoie la valeur si présente et non expirée, sinon `default` (`MISSING` par défaut)."""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires, value = item
+        if expires <= time.monotonic():
+            self._data.pop(key, None)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -1,28 +1,57 @@
+import asyncio
 import json
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
-from django.contrib.auth import get_user_model
 from django.utils import timezone
 from urllib.parse import parse_qs
 from django.conf import settings
 import jwt
 
+from .batchsend import BatchError, batch_events, create_batch, parse_batch, receiver_ids
+from .dbexecutor import run_db
+from .encoders import MessageRow, get_message_encoder, status_event
+from .eventlog import apublish, apublish_many, get_event_log
 from .models import Message
+from .presence import get_batch_window, get_presence_aggregator, get_presence_backend, presence_group
+from .receipts import mark_delivered_on_connect, mark_read_up_to
+from .revocation import get_revocation_backend
+from .tokenauthentications import aget_cached_user
+from .typingstate import get_typing_tracker
+from .wire import JSON_CODEC, negotiate
+from .writebehind import get_status_buffer
 
 # Consommateur WebSocket gérant:
 # - l'authentification par jeton (JWT) passé en query string
-# - la présence (utilisateurs en ligne / hors ligne)
-# - la diffusion des messages en temps réel et des accusés (delivered/read)
+# - la présence (utilisateurs en ligne / hors ligne), partagée entre workers via `accounts.presence`
+#   et diffusée uniquement aux connexions abonnées (`presence_subscribe`), par lots (`presence_batch`)
+# - les accès base via un pool de threads dédié et borné (`accounts.dbexecutor`), pas le thread
+#   unique partagé de `sync_to_async`
+# - la diffusion des messages en temps réel et des accusés (delivered/read), numérotés par `seq`
+#   et rejouables après reconnexion via la commande `sync` (voir `accounts.eventlog`)
+# - le format des trames: JSON par défaut, MessagePack binaire si le client le négocie par
+#   sous-protocole (`gmsg.msgpack.v1`, voir `accounts.wire`)
+# - les indicateurs de saisie (`typing`): état éphémère en mémoire, limité et regroupé,
+#   envoyé à l'interlocuteur hors journal et hors base (voir `accounts.typingstate`)
 class ChatConsumer(AsyncJsonWebsocketConsumer):
-    ONLINE_USERS = set()
+    # Nombre maximal d'utilisateurs dont une connexion peut suivre la présence
+    MAX_PRESENCE_SUBSCRIPTIONS = 200
+    # Nombre d'événements lus par requête au journal lors d'un `sync`
+    SYNC_BATCH_SIZE = 200
+    # Délai (secondes) laissé à un événement en retard avant de combler le trou de `seq` depuis le journal
+    SEQ_GAP_DELAY = 0.5
+    # Format des trames, négocié à la connexion (voir `accounts.wire`)
+    codec = JSON_CODEC
 
     async def connect(self):
         """Établit la connexion WebSocket.
         Étapes:
         1) Récupérer le token JWT depuis la query string et authentifier l'utilisateur
-        2) Ajouter la socket aux groupes (groupe utilisateur et groupe présence)
-        3) Envoyer un instantané des utilisateurs en ligne et notifier la présence en ligne
+        2) Ajouter la socket au groupe utilisateur
+        3) Enregistrer la présence et notifier les abonnés si l'utilisateur passe en ligne
+        4) Au passage en ligne, marquer comme remis les messages reçus hors ligne
         """
-        # Authenticate via token query param
+        # Authenticate via token query param: les claims signés suffisent pour la durée de la
+        # socket, la révocation est vérifiée via `accounts.revocation` et `is_active` via le
+        # cache d'authentification (`get_cached_user`: pas de requête en base s'il est chaud)
         query = parse_qs(self.scope.get('query_string', b'').decode())
         token = (query.get('token') or [None])[0]
         if not token:
@@ -30,64 +59,147 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             return
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user_id = payload.get('user_id')
-            User = get_user_model()
-            self.user = await self._get_user(User, user_id)
-            if not self.user:
+            self.user_id = int(payload['user_id'])
+            if await get_revocation_backend().is_revoked(payload):
+                await self.close()
+                return
+            # Comme l'API REST: compte désactivé refusé (cache local puis partagé, base en dernier recours)
+            if not (await aget_cached_user(self.user_id)).is_active:
                 await self.close()
                 return
         except Exception:
             await self.close()
             return
 
-        self.user_group = f"user_{self.user.id}"
-        self.presence_group = "presence"
+        self.user_group = f"user_{self.user_id}"
+        self.presence_subscriptions = set()
+        self.presence_pending = {}
+        self.presence_flush_task = None
+        # Watermark du dernier `sync`: tout `seq` <= `replayed_seq` a été transmis (None avant le premier `sync`),
+        # `delivered_seqs` retient les `seq` transmis au-delà, en attente des numéros manquants
+        self.replayed_seq = None
+        self.delivered_seqs = set()
+        self.seq_gap_task = None
+        self.typing_peers = set()
         await self.channel_layer.group_add(self.user_group, self.channel_name)
-        await self.channel_layer.group_add(self.presence_group, self.channel_name)
-        await self.accept()
-        # L'utilisateur vient de se connecter: on le marque comme en ligne (mémoire locale du processus)
-        ChatConsumer.ONLINE_USERS.add(self.user.id)
-        # Envoyer au client la liste courante des utilisateurs en ligne
-        try:
-            await self.send_json({
-                'type': 'presence_snapshot',
-                'online_user_ids': list(ChatConsumer.ONLINE_USERS),
-            })
-        except Exception:
-            pass
-        await self.channel_layer.group_send(
-            self.presence_group,
-            {"type": "presence.update", "user_id": self.user.id, "online": True, "last_seen": None}
-        )
+        # Sous-protocole: JSON par défaut, MessagePack si le client propose `gmsg.msgpack.v1`
+        self.codec = negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=self.codec.subprotocol)
+        # Enregistrer cette connexion dans le registre de présence partagé (compteur par connexion)
+        came_online = await get_presence_backend().connect(self.user_id, self.channel_name)
+        self.heartbeat_task = asyncio.ensure_future(self._presence_heartbeat())
+        # Diffuser uniquement la transition hors-ligne -> en ligne (pas à chaque onglet ouvert),
+        # et seulement aux connexions qui suivent cet utilisateur
+        if came_online:
+            await get_presence_aggregator().record(self.user_id, True)
+            # Messages reçus hors ligne: un seul UPDATE, un `messages_delivered` par émetteur
+            for delivered in await run_db(mark_delivered_on_connect, self.user_id):
+                await apublish([delivered['from']], 'messages_delivered', delivered)
 
     async def disconnect(self, code):
         """Nettoie la connexion: quitte les groupes et diffuse l'événement hors-ligne.
 
-        Met à jour ON/OFF et envoie un `presence_update` avec `last_seen`.
+        Met à jour ON/OFF et signale la transition hors-ligne (avec `last_seen`) à l'agrégateur.
         """
         if hasattr(self, 'user_group'):
             await self.channel_layer.group_discard(self.user_group, self.channel_name)
-        if hasattr(self, 'presence_group'):
-            await self.channel_layer.group_discard(self.presence_group, self.channel_name)
-        # Marquer l'utilisateur comme hors-ligne avec l'horodatage
-        if hasattr(self, 'user'):
-            ChatConsumer.ONLINE_USERS.discard(self.user.id)
-            await self.channel_layer.group_send(
-                "presence",
-                {"type": "presence.update", "user_id": self.user.id, "online": False, "last_seen": timezone.now().isoformat()}
-            )
+        for watched_id in getattr(self, 'presence_subscriptions', ()):
+            await self.channel_layer.group_discard(presence_group(watched_id), self.channel_name)
+        if hasattr(self, 'heartbeat_task'):
+            self.heartbeat_task.cancel()
+        if getattr(self, 'presence_flush_task', None):
+            self.presence_flush_task.cancel()
+        if getattr(self, 'seq_gap_task', None):
+            self.seq_gap_task.cancel()
+        # Fin des saisies en cours de cette connexion (sinon expirées au bout du TTL)
+        for peer_id in getattr(self, 'typing_peers', ()):
+            await get_typing_tracker().record(self.user_id, peer_id, False)
+        # Marquer l'utilisateur comme hors-ligne avec l'horodatage (si c'était sa dernière connexion)
+        if hasattr(self, 'user_group'):
+            went_offline = await get_presence_backend().disconnect(self.user_id, self.channel_name)
+            if went_offline:
+                await get_presence_aggregator().record(self.user_id, False, timezone.now().isoformat())
+
+    async def _presence_heartbeat(self):
+        """Rafraîchit périodiquement l'entrée de présence de cette connexion."""
+        presence = get_presence_backend()
+        while True:
+            await asyncio.sleep(presence.heartbeat_interval)
+            try:
+                await presence.heartbeat(self.user_id, self.channel_name)
+            except Exception:
+                pass
+
+    async def send_json(self, content, close=False):
+        """Envoie `content` dans le format négocié (trame texte JSON ou binaire MessagePack)."""
+        frame = self.codec.encode(content)
+        if self.codec.binary:
+            await self.send(bytes_data=frame, close=close)
+        else:
+            await self.send(text_data=frame, close=close)
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        """Décode une trame entrante: texte JSON (toujours accepté) ou binaire du format négocié."""
+        try:
+            if text_data:
+                content = json.loads(text_data)
+            elif bytes_data and self.codec.binary:
+                content = self.codec.decode(bytes_data)
+            else:
+                return
+        except ValueError:
+            return
+        if isinstance(content, dict):
+            await self.receive_json(content, **kwargs)
 
     async def receive_json(self, content, **kwargs):
         """Router des messages entrants envoyés par le client.
 
         - `send_message`: envoyer un message au destinataire
         - `read_ack`: accusé de lecture pour un message
+        - `read_up_to`: accusé de lecture groupé jusqu'à un message
+        - `presence_subscribe`: définit les utilisateurs dont on suit la présence
+        - `sync`: rejoue les événements manqués depuis un `seq` (reconnexion)
+        - `send_batch`: envoi groupé de messages texte
+        - `typing`: début / fin de saisie vers un interlocuteur
         """
         msg_type = content.get('type')
         if msg_type == 'send_message':
             await self._handle_send_message(content)
         elif msg_type == 'read_ack':
             await self._handle_read_ack(content)
+        elif msg_type == 'read_up_to':
+            await self._handle_read_up_to(content)
+        elif msg_type == 'presence_subscribe':
+            await self._handle_presence_subscribe(content)
+        elif msg_type == 'sync':
+            await self._handle_sync(content)
+        elif msg_type == 'send_batch':
+            await self._handle_send_batch(content)
+        elif msg_type == 'typing':
+            await self._handle_typing(content)
+
+    async def _handle_presence_subscribe(self, content):
+        """Remplace l'ensemble des utilisateurs suivis par `user_ids` et renvoie leur état.
+
+        Seuls les groupes ajoutés/retirés sont modifiés; la réponse est un
+        `presence_snapshot` limité aux utilisateurs suivis.
+        """
+        try:
+            wanted = {int(uid) for uid in content.get('user_ids') or []}
+        except (TypeError, ValueError):
+            return
+        wanted.discard(self.user_id)
+        wanted = set(sorted(wanted)[:self.MAX_PRESENCE_SUBSCRIPTIONS])
+        for watched_id in self.presence_subscriptions - wanted:
+            await self.channel_layer.group_discard(presence_group(watched_id), self.channel_name)
+        for watched_id in wanted - self.presence_subscriptions:
+            await self.channel_layer.group_add(presence_group(watched_id), self.channel_name)
+        self.presence_subscriptions = wanted
+        await self.send_json({
+            'type': 'presence_snapshot',
+            'online_user_ids': await get_presence_backend().online_among(sorted(wanted)),
+        })
 
     async def _handle_send_message(self, content):
         """Persiste le message et le diffuse aux deux utilisateurs (émetteur et destinataire).
@@ -99,71 +211,228 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         if not to or not text:
             return
         # Persist message
-        message = await self._create_message(self.user.id, to, text)
-        data = {
-            'id': message.id,
-            'from': message.sender_id,
-            'to': message.receiver_id,
-            'content': message.content,
-            'created_at': message.created_at.isoformat(),
-            'status': message.status,
-        }
-        # Notifier l'émetteur (moi)
-        await self.channel_layer.group_send(f"user_{self.user.id}", {"type": "chat.message", "event": "message_created", "data": data})
-        # Notifier le destinataire
-        await self.channel_layer.group_send(f"user_{message.receiver_id}", {"type": "chat.message", "event": "message_created", "data": data})
+        message = await self._create_message(self.user_id, to, text)
+        # Le message envoyé termine la saisie en cours vers ce destinataire
+        if int(to) in self.typing_peers:
+            self.typing_peers.discard(int(to))
+            await get_typing_tracker().record(self.user_id, int(to), False)
+        # Notifier l'émetteur (moi) et le destinataire
+        data = get_message_encoder().event(MessageRow.from_message(message))
+        await apublish([self.user_id, message.receiver_id], 'message_created', data)
 
         # Si le destinataire est en ligne, passer le message à l'état "delivered"
-        if int(to) in ChatConsumer.ONLINE_USERS:
-            from asgiref.sync import sync_to_async
+        # (événement immédiat, persistance différée via le tampon write-behind)
+        if await get_presence_backend().is_online(int(to)):
             message.delivered_at = timezone.now()
             message.status = 'delivered'
-            await sync_to_async(message.save)()
-            delivered = {'id': message.id, 'delivered_at': message.delivered_at.isoformat(), 'status': message.status}
-            await self.channel_layer.group_send(f"user_{message.sender_id}", {"type": "chat.message", "event": "message_delivered", "data": delivered})
-            await self.channel_layer.group_send(f"user_{message.receiver_id}", {"type": "chat.message", "event": "message_delivered", "data": delivered})
+            await get_status_buffer().record(message.id, 'delivered', message.delivered_at)
+            delivered = status_event(message.id, 'delivered', message.delivered_at)
+            await apublish([message.sender_id, message.receiver_id], 'message_delivered', delivered)
+
+    async def _handle_send_batch(self, content):
+        """Envoi groupé: `{items: [{receiver, content}]}` ou `{receivers, content}`, `ref` facultatif.
+
+        Un seul `bulk_create`, un seul événement par utilisateur concerné; la socket reçoit
+        `batch_sent` `{ref, results}` (résultat de chaque élément, voir `accounts.batchsend`).
+        """
+        try:
+            items = parse_batch(content)
+        except BatchError as exc:
+            await self.send_json({'type': 'batch_sent', 'ref': content.get('ref'), 'error': str(exc)})
+            return
+        online_ids = await get_presence_backend().online_among(sorted(receiver_ids(items)))
+        messages, results = await run_db(create_batch, self.user_id, items, online_ids)
+        await apublish_many(batch_events(self.user_id, messages))
+        await self.send_json({'type': 'batch_sent', 'ref': content.get('ref'), 'results': results})
+
+    async def _handle_typing(self, content):
+        """Indicateur de saisie: `{to: <peer_id>, typing: true|false}` (`true` par défaut).
+
+        Peut être envoyé à chaque frappe: le suivi (`accounts.typingstate`) limite et
+        regroupe les `typing_batch` transmis à l'interlocuteur.
+        """
+        try:
+            peer_id = int(content.get('to'))
+        except (TypeError, ValueError):
+            return
+        if peer_id == self.user_id:
+            return
+        typing = bool(content.get('typing', True))
+        if await get_typing_tracker().record(self.user_id, peer_id, typing) and typing:
+            self.typing_peers.add(peer_id)
+        elif not typing:
+            self.typing_peers.discard(peer_id)
 
     async def _handle_read_ack(self, content):
-        """Gère l'accusé de lecture: marque comme lu si le récepteur est l'utilisateur courant."""
+        """Gère l'accusé de lecture: marque comme lu si le récepteur est l'utilisateur courant.
+
+        L'événement `message_read` part immédiatement; l'écriture en base passe par le tampon write-behind.
+        """
         msg_id = content.get('id')
         if not msg_id:
             return
         
         try:
             msg = await self._get_message(msg_id)
-            if msg and msg.receiver_id == self.user.id and msg.read_at is None:
+            if msg and msg.receiver_id == self.user_id and msg.read_at is None:
                 msg.read_at = timezone.now()
                 msg.status = 'read'
-                await self._save_message(msg)
-                data = {'id': msg.id, 'read_at': msg.read_at.isoformat(), 'status': msg.status}
-                await self.channel_layer.group_send(f"user_{msg.sender_id}", {"type": "chat.message", "event": "message_read", "data": data})
-                await self.channel_layer.group_send(f"user_{msg.receiver_id}", {"type": "chat.message", "event": "message_read", "data": data})
+                await get_status_buffer().record(msg.id, 'read', msg.read_at)
+                data = status_event(msg.id, 'read', msg.read_at)
+                await apublish([msg.sender_id, msg.receiver_id], 'message_read', data)
         except Exception:
             pass
 
+    async def _handle_read_up_to(self, content):
+        """Accusé de lecture groupé: `{with: <peer_id>, up_to: <message_id>}`.
+
+        Un seul UPDATE marque la plage et un seul événement `messages_read` est envoyé
+        à chacun des deux utilisateurs.
+        """
+        try:
+            peer_id = int(content.get('with'))
+            up_to_id = int(content.get('up_to'))
+        except (TypeError, ValueError):
+            return
+        data = await run_db(mark_read_up_to, self.user_id, peer_id, up_to_id)
+        if data:
+            await apublish([peer_id, self.user_id], 'messages_read', data)
+
+    async def _handle_sync(self, content):
+        """Reprise après reconnexion: `{after: <dernier seq reçu>}`.
+
+        Rejoue les événements manqués depuis le journal (`accounts.eventlog`), par lots,
+        puis répond `sync_done`. Sans `after`, répond `sync_state` avec le `seq` courant;
+        si le journal ne couvre plus `after`, répond `sync_reset` (historique à recharger en REST).
+        Le `seq` atteint devient le watermark `replayed_seq`: les événements en direct déjà rejoués
+        sont ignorés ensuite.
+        """
+        log = get_event_log()
+        after = content.get('after')
+        if after is None:
+            self._reset_replayed_seq(await log.alast_seq(self.user_id))
+            await self.send_json({'type': 'sync_state', 'seq': self.replayed_seq})
+            return
+        try:
+            after = int(after)
+        except (TypeError, ValueError):
+            return
+        while True:
+            events = await log.aread_after(self.user_id, after, self.SYNC_BATCH_SIZE)
+            if events is None:
+                self._reset_replayed_seq(await log.alast_seq(self.user_id))
+                await self.send_json({'type': 'sync_reset', 'seq': self.replayed_seq})
+                return
+            for seq, event, data in events:
+                await self.send_json({'type': event, 'seq': seq, **data})
+            if events:
+                after = events[-1][0]
+            if len(events) < self.SYNC_BATCH_SIZE:
+                break
+        self._advance_replayed_seq(after)
+        await self.send_json({'type': 'sync_done', 'seq': self.replayed_seq})
+
+    def _reset_replayed_seq(self, seq):
+        """Repart du watermark `seq` (état courant du journal), sans numéro en attente."""
+        self.replayed_seq = seq
+        self.delivered_seqs.clear()
+
+    def _advance_replayed_seq(self, seq):
+        """Avance le watermark jusqu'à `seq`, puis sur les `seq` déjà transmis qui le suivent sans trou."""
+        self.replayed_seq = max(self.replayed_seq or 0, seq)
+        self.delivered_seqs = {s for s in self.delivered_seqs if s > self.replayed_seq}
+        while self.replayed_seq + 1 in self.delivered_seqs:
+            self.replayed_seq += 1
+            self.delivered_seqs.discard(self.replayed_seq)
+
+    def _claim_seq(self, seq):
+        """Réserve `seq` pour l'envoi; False s'il a déjà été transmis (rejoué ou reçu en direct).
+
+        Avant le premier `sync`, aucun watermark: tout est transmis.
+        """
+        if self.replayed_seq is None:
+            return True
+        if seq <= self.replayed_seq or seq in self.delivered_seqs:
+            return False
+        self.delivered_seqs.add(seq)
+        self._advance_replayed_seq(self.replayed_seq)
+        return True
+
+    async def _fill_seq_gap(self, delay=0):
+        """Comble un trou de `seq` (événement `N` pas encore reçu alors que `N+1` l'a été).
+
+        Deux workers peuvent livrer `N+1` avant `N`: on laisse `delay` à l'événement en retard,
+        puis on rejoue depuis le journal les numéros toujours manquants. Si le journal ne couvre
+        plus le trou, répond `sync_reset` comme `sync`.
+        """
+        if delay:
+            await asyncio.sleep(delay)
+        log = get_event_log()
+        while self.delivered_seqs:
+            limit = min(max(self.delivered_seqs) - self.replayed_seq, self.SYNC_BATCH_SIZE)
+            events = await log.aread_after(self.user_id, self.replayed_seq, limit)
+            if events is None:
+                self._reset_replayed_seq(await log.alast_seq(self.user_id))
+                await self.send_json({'type': 'sync_reset', 'seq': self.replayed_seq})
+                return
+            for seq, event, data in events:
+                if self._claim_seq(seq):
+                    await self.send_json({'type': event, 'seq': seq, **data})
+            if len(events) < limit:
+                # Numéros absents du journal: ne plus les attendre
+                if self.delivered_seqs:
+                    self._advance_replayed_seq(max(self.delivered_seqs))
+                return
+
     async def chat_message(self, event):
-        """Transmet un événement de chat (créé/delivered/read) au client WebSocket."""
-        await self.send_json({'type': event.get('event'), **event.get('data', {})})
+        """Transmet un événement de chat (créé/delivered/read) au client WebSocket, avec son `seq`.
+
+        Seuls les événements déjà transmis (rejoués par `sync` ou reçus deux fois) sont ignorés;
+        un événement arrivé en avance est transmis et le trou qu'il révèle est comblé depuis le journal.
+        """
+        seq = event.get('seq')
+        if seq is not None and not self._claim_seq(seq):
+            return
+        await self.send_json({'type': event.get('event'), 'seq': seq, **event.get('data', {})})
+        if self.delivered_seqs and (self.seq_gap_task is None or self.seq_gap_task.done()):
+            self.seq_gap_task = asyncio.ensure_future(self._fill_seq_gap(delay=self.SEQ_GAP_DELAY))
+
+    async def presence_batch(self, event):
+        """Accumule des mises à jour de présence et les transmet au client en un seul `presence_batch`.
+
+        Les mises à jour reçues pendant la fenêtre sont fusionnées par utilisateur
+        (dernier état retenu).
+        """
+        for update in event.get('updates', []):
+            self.presence_pending[update['user_id']] = update
+        window = get_batch_window()
+        if window <= 0:
+            await self._send_presence_batch()
+        elif self.presence_flush_task is None or self.presence_flush_task.done():
+            self.presence_flush_task = asyncio.ensure_future(self._send_presence_batch(delay=window))
+
+    async def typing_batch(self, event):
+        """Transmet au client les changements de saisie de ses interlocuteurs (`{user_id, typing, ttl}`)."""
+        await self.send_json({'type': 'typing_batch', 'updates': event.get('updates', [])})
 
     async def presence_update(self, event):
-        """Transmet une mise à jour de présence (online/offline) au client."""
-        await self.send_json({'type': 'presence_update', **{k: v for k, v in event.items() if k not in ['type']}})
+        """Mise à jour de présence unitaire (ancien format), traitée comme un lot d'un élément."""
+        await self.presence_batch({'updates': [{k: v for k, v in event.items() if k not in ['type']}]})
+
+    async def _send_presence_batch(self, delay=0):
+        """Envoie au client les mises à jour de présence en attente."""
+        if delay:
+            await asyncio.sleep(delay)
+        updates, self.presence_pending = list(self.presence_pending.values()), {}
+        if updates:
+            await self.send_json({'type': 'presence_batch', 'updates': updates})
 
-    
-    @staticmethod
-    async def _get_user(User, user_id):
-        """Récupère un utilisateur par son identifiant de façon asynchrone."""
-        from asgiref.sync import sync_to_async
-        try:
-            return await sync_to_async(User.objects.get)(id=user_id)
-        except User.DoesNotExist:
-            return None
 
     @staticmethod
     async def _create_message(sender_id, receiver_id, content):
-        """Crée un objet Message en base (appel synchronisé encapsulé)."""
-        from asgiref.sync import sync_to_async
-        return await sync_to_async(Message.objects.create)(
+        """Crée un objet Message en base (exécuteur base dédié)."""
+        return await run_db(
+            Message.objects.create,
             sender_id=sender_id,
             receiver_id=receiver_id,
             content=content,
@@ -172,15 +441,8 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
 
     @staticmethod
     async def _get_message(msg_id):
-        """Charge un message par identifiant."""
-        from asgiref.sync import sync_to_async
+        """Charge un message par identifiant (exécuteur base dédié)."""
         try:
-            return await sync_to_async(Message.objects.get)(id=msg_id)
+            return await run_db(Message.objects.get, id=msg_id)
         except Message.DoesNotExist:
             return None
-
-    @staticmethod
-    async def _save_message(msg):
-        """Sauvegarde un message (wrap asynchrone)."""
-        from asgiref.sync import sync_to_async
-        await sync_to_async(msg.save)()
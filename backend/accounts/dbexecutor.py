@@ -0,0 +1,90 @@
+"""Exécuteur dédié aux accès base depuis le code asynchrone (consommateurs WebSocket).
+
+`sync_to_async` (et les méthodes `acreate`/`aget`/... de l'ORM, qui s'appuient
+dessus) exécute par défaut tous les appels « thread sensitive » sur un seul
+thread partagé par le processus: sous charge, chaque requête SQL d'une socket
+attend celles de toutes les autres. `run_db` les exécute à la place dans un
+pool borné de `MAX_WORKERS` threads (chacun avec sa connexion), en nettoyant
+les connexions comme `channels.db.database_sync_to_async`.
+
+Métriques (`get_db_executor().stats()`): appels, en cours (et pic), temps
+d'attente dans la file et temps d'exécution cumulés.
+
+Configuration via `settings.DB_EXECUTOR` (`MAX_WORKERS = 0`: thread partagé,
+comportement par défaut de `sync_to_async`).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+DEFAULT_MAX_WORKERS = 16
+
+
+class DatabaseExecutor:
+    """Pool borné de threads pour les appels ORM synchrones, avec métriques."""
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db') if max_workers else None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.wait_time = 0.0
+        self.run_time = 0.0
+
+    async def run(self, func, *args, **kwargs):
+        """Exécute `func(*args, **kwargs)` dans le pool et retourne son résultat."""
+        timing = [time.perf_counter(), None, None]
+
+        def call():
+            timing[1] = time.perf_counter()
+            close_old_connections()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                close_old_connections()
+                timing[2] = time.perf_counter()
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self._pool is None:
+                return await sync_to_async(call)()
+            return await sync_to_async(call, thread_sensitive=False, executor=self._pool)()
+        finally:
+            # Compteurs mis à jour depuis la boucle asyncio uniquement (pas de verrou nécessaire)
+            self.in_flight -= 1
+            self.calls += 1
+            if timing[1] is not None:
+                self.wait_time += timing[1] - timing[0]
+                self.run_time += (timing[2] or time.perf_counter()) - timing[1]
+
+    def stats(self):
+        calls = self.calls or 1
+        return {
+            'max_workers': self.max_workers,
+            'calls': self.calls,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'avg_wait_ms': self.wait_time / calls * 1000,
+            'avg_run_ms': self.run_time / calls * 1000,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_db_executor():
+    """Exécuteur du processus courant, configuré par `settings.DB_EXECUTOR`."""
+    config = getattr(settings, 'DB_EXECUTOR', {})
+    return DatabaseExecutor(max_workers=config.get('MAX_WORKERS', DEFAULT_MAX_WORKERS))
+
+
+async def run_db(func, *args, **kwargs):
+    """Exécute un appel ORM synchrone depuis du code asynchrone, via l'exécuteur dédié."""
+    return await get_db_executor().run(func, *args, **kwargs)
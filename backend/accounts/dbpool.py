@@ -0,0 +1,53 @@
+"""Métriques des connexions PostgreSQL (pool natif ou connexions persistantes).
+
+Deux profils sont configurés dans `settings.DATABASES` (voir `DB_POOL`):
+- `DB_POOL=1` (psycopg 3 + psycopg_pool, hors requirements.txt): pool natif de Django
+  (`OPTIONS['pool']`), dimensionné d'après `DB_EXECUTOR['MAX_WORKERS']`
+- par défaut (psycopg2): connexions persistantes (`CONN_MAX_AGE`) vérifiées avant réutilisation
+  (`CONN_HEALTH_CHECKS`); chaque thread de l'exécuteur base garde sa connexion
+
+`pool_stats()` expose l'attente et l'utilisation du pool (ou, à défaut, le nombre
+de connexions ouvertes par le processus) ainsi que les métriques de l'exécuteur base.
+"""
+from django.db import connections
+
+from .dbexecutor import get_db_executor
+
+_opened = {}
+
+
+def record_connection_created(alias):
+    """Compte les ouvertures de connexion (signal `connection_created`)."""
+    _opened[alias] = _opened.get(alias, 0) + 1
+
+
+def pool_stats(alias='default'):
+    """Métriques de connexion du processus courant pour la base `alias`."""
+    connection = connections[alias]
+    stats = {
+        'vendor': connection.vendor,
+        'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+        'connections_opened': _opened.get(alias, 0),
+        'executor': get_db_executor().stats(),
+    }
+    pool = connection.pool if connection.settings_dict.get('OPTIONS', {}).get('pool') else None
+    if pool is None:
+        stats['mode'] = 'persistent' if stats['conn_max_age'] else 'per_request'
+        return stats
+    raw = pool.get_stats()
+    requests = raw.get('requests_num', 0) or 1
+    in_use = raw.get('pool_size', 0) - raw.get('pool_available', 0)
+    stats.update({
+        'mode': 'pool',
+        'pool_min': raw.get('pool_min'),
+        'pool_max': raw.get('pool_max'),
+        'pool_size': raw.get('pool_size'),
+        'in_use': in_use,
+        'utilization': in_use / (raw.get('pool_max') or 1),
+        'requests_waiting': raw.get('requests_waiting', 0),
+        'requests': raw.get('requests_num', 0),
+        'avg_wait_ms': raw.get('requests_wait_ms', 0) / requests,
+        'connections_num': raw.get('connections_num', 0),
+        'connections_errors': raw.get('connections_errors', 0),
+    })
+    return stats
@@ -0,0 +1,176 @@
+"""Encodage rapide des messages pour l'API REST et les événements temps réel.
+
+`MessageSerializer(qs, many=True)` instancie un modèle par ligne puis traverse les
+champs DRF (`PrimaryKeyRelatedField`, `FileField`, ...) pour chacune. Ici:
+- les lignes sont lues en tuples (`message_rows`: `.values_list(*ROW_FIELDS)`) et
+  enveloppées dans des `MessageRow` à `__slots__` (accès par attribut, sans modèle)
+- `MessageEncoder` résout une fois pour toutes le stockage des médias et produit les
+  dictionnaires par littéraux: même sortie que `MessageSerializer` (`encode`), événement
+  `message_created` (`event`), `media_processed` (`media_event`)
+- `dumps` sérialise en JSON avec orjson s'il est installé (`pip install orjson`), sinon
+  avec le module `json`; utilisé par `FastJSONRenderer` (REST) et par `JsonCodec`
+  (`accounts.wire`), le format par défaut des trames de `ChatConsumer.send_json`
+
+Mesure: `python manage.py bench_message_encoding --rows 10000`.
+"""
+import json
+from functools import lru_cache
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .storage import get_message_storage
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle: repli sur json
+    orjson = None
+
+ROW_FIELDS = (
+    'id', 'sender_id', 'receiver_id', 'content', 'message_type', 'file', 'created_at', 'is_read',
+    'status', 'delivered_at', 'read_at', 'updated_at', 'conversation_key', 'media_status',
+    'duration', 'waveform', 'poster',
+)
+
+
+class MessageRow:
+    """Ligne de message légère (champs de `ROW_FIELDS`), construite depuis un tuple `.values_list()`."""
+    __slots__ = ROW_FIELDS
+
+    def __init__(self, id, sender_id, receiver_id, content, message_type, file, created_at, is_read,
+                 status, delivered_at, read_at, updated_at, conversation_key, media_status,
+                 duration, waveform, poster):
+        self.id = id
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.content = content
+        self.message_type = message_type
+        self.file = file
+        self.created_at = created_at
+        self.is_read = is_read
+        self.status = status
+        self.delivered_at = delivered_at
+        self.read_at = read_at
+        self.updated_at = updated_at
+        self.conversation_key = conversation_key
+        self.media_status = media_status
+        self.duration = duration
+        self.waveform = waveform
+        self.poster = poster
+
+    @classmethod
+    def from_message(cls, message):
+        """Ligne équivalente à une instance `Message` (fichiers réduits à leur nom)."""
+        values = [getattr(message, field) for field in ROW_FIELDS]
+        values[ROW_FIELDS.index('file')] = message.file.name if message.file else None
+        values[ROW_FIELDS.index('poster')] = message.poster.name if message.poster else None
+        return cls(*values)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in ROW_FIELDS}
+
+
+def message_rows(queryset):
+    """Lignes `MessageRow` d'un queryset de `Message` (sans instanciation de modèles)."""
+    return [MessageRow(*values) for values in queryset.values_list(*ROW_FIELDS)]
+
+
+def format_datetime(value):
+    """Horodatage ISO 8601 au format de DRF (`Z` pour UTC), `None` conservé."""
+    if value is None:
+        return None
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class MessageEncoder:
+    """Construit les représentations d'un message à partir d'une `MessageRow`."""
+
+    def __init__(self, storage=None):
+        self._url = (storage or get_message_storage()).url
+
+    def media_url(self, name):
+        return self._url(name) if name else None
+
+    def encode(self, row):
+        """Représentation REST, identique à `MessageSerializer(message).data`."""
+        return {
+            'id': row.id,
+            'sender': row.sender_id,
+            'receiver': row.receiver_id,
+            'content': row.content,
+            'message_type': row.message_type,
+            'file': self._url(row.file) if row.file else None,
+            'created_at': format_datetime(row.created_at),
+            'is_read': row.is_read,
+            'status': row.status,
+            'delivered_at': format_datetime(row.delivered_at),
+            'read_at': format_datetime(row.read_at),
+            'media_status': row.media_status,
+            'duration': row.duration,
+            'waveform': row.waveform,
+            'poster': self._url(row.poster) if row.poster else None,
+        }
+
+    def encode_many(self, rows):
+        encode = self.encode
+        return [encode(row) for row in rows]
+
+    def event(self, row):
+        """Données de l'événement `message_created`."""
+        return {
+            'id': row.id,
+            'from': row.sender_id,
+            'to': row.receiver_id,
+            'content': row.content,
+            'message_type': row.message_type,
+            'file': self._url(row.file) if row.file else None,
+            'media_status': row.media_status,
+            'created_at': format_datetime(row.created_at),
+            'status': row.status,
+        }
+
+    def media_event(self, row):
+        """Données de l'événement `media_processed`."""
+        return {
+            'id': row.id,
+            'from': row.sender_id,
+            'to': row.receiver_id,
+            'media_status': row.media_status,
+            'duration': row.duration,
+            'waveform': row.waveform,
+            'poster': self._url(row.poster) if row.poster else None,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_message_encoder():
+    """Encodeur partagé du processus (stockage des médias résolu une fois)."""
+    return MessageEncoder()
+
+
+def status_event(message_id, status, moment):
+    """Données des événements `message_delivered` / `message_read`."""
+    return {'id': message_id, f'{status}_at': format_datetime(moment), 'status': status}
+
+
+_json_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """JSON (bytes) de `data`; les types non natifs passent par l'encodeur de DRF."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_json_encoder.default)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class FastJSONRenderer(BaseRenderer):
+    """Rendu JSON des réponses REST via `dumps` (orjson si disponible)."""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
@@ -0,0 +1,356 @@
+"""Journal d'événements par utilisateur, pour la reprise après reconnexion.
+
+Chaque événement de chat destiné au groupe `user_<id>` (`message_created`,
+`message_delivered`, `message_read`, `messages_read`, `media_processed`) est
+d'abord ajouté au journal de l'utilisateur avec un numéro de séquence
+croissant (`seq`), puis diffusé avec ce numéro. Un client qui se reconnecte
+envoie la commande WebSocket `sync` avec le dernier `seq` reçu et obtient les
+événements manqués, sans recharger l'historique en REST.
+
+Rétention bornée: au plus `max_events` événements par utilisateur et aucun
+événement plus ancien que `max_age` secondes. Au-delà, `sync` répond
+`sync_reset` et le client recharge l'historique.
+
+Backends disponibles (réglage `EVENT_LOG['BACKEND']`):
+- `RedisEventLogBackend`: un flux Redis par utilisateur, partagé par tous les workers (production);
+  `seq` attribué par INCR, sans verrou ni écriture en base sur le chemin de diffusion
+- `DatabaseEventLogBackend`: tables `EventStream`/`UserEvent` (déploiements sans Redis); chaque ajout
+  verrouille la ligne `EventStream` du destinataire
+- `InMemoryEventLogBackend`: local au processus (tests, dev avec un seul worker)
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from datetime import timedelta
+from functools import lru_cache
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .dbexecutor import run_db
+from .encoders import dumps
+from .models import EventStream, UserEvent
+
+DEFAULT_MAX_EVENTS = 1000
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+
+class BaseEventLogBackend:
+    """Interface commune des journaux d'événements."""
+
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS, max_age=DEFAULT_MAX_AGE, **options):
+        self.max_events = max_events
+        self.max_age = max_age
+
+    def append(self, user_id, event, data):
+        """Ajoute un événement au journal de `user_id` et retourne son `seq`."""
+        raise NotImplementedError
+
+    def append_many(self, entries):
+        """Ajoute plusieurs événements `(user_id, event, data)` et retourne leurs `seq`, dans l'ordre."""
+        return [self.append(user_id, event, data) for user_id, event, data in entries]
+
+    def read_after(self, user_id, after, limit):
+        """Retourne au plus `limit` événements `(seq, event, data)` de `seq > after`, dans l'ordre.
+
+        Retourne `None` si le journal ne permet plus de reprendre depuis `after`
+        (événements purgés ou curseur inconnu): le client doit alors recharger l'historique.
+        """
+        raise NotImplementedError
+
+    def last_seq(self, user_id):
+        """Dernier `seq` attribué à `user_id` (0 si aucun)."""
+        raise NotImplementedError
+
+    def trim(self):
+        """Purge les événements plus anciens que `max_age` pour tous les utilisateurs. Retourne le nombre purgé."""
+        return 0
+
+    async def aappend(self, user_id, event, data):
+        return await run_db(self.append, user_id, event, data)
+
+    async def aappend_many(self, entries):
+        return await run_db(self.append_many, entries)
+
+    async def aread_after(self, user_id, after, limit):
+        return await run_db(self.read_after, user_id, after, limit)
+
+    async def alast_seq(self, user_id):
+        return await run_db(self.last_seq, user_id)
+
+
+class InMemoryEventLogBackend(BaseEventLogBackend):
+    """Journal local au processus: `max_events` derniers événements par utilisateur, `max_age` au plus."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._events = {}
+        self._seq = {}
+
+    def append(self, user_id, event, data):
+        seq = self._seq.get(user_id, 0) + 1
+        self._seq[user_id] = seq
+        events = self._events.setdefault(user_id, deque(maxlen=self.max_events))
+        events.append((seq, event, data, time.monotonic()))
+        self._expire(events)
+        return seq
+
+    def _expire(self, events):
+        cutoff = time.monotonic() - self.max_age
+        while events and events[0][3] < cutoff:
+            events.popleft()
+
+    def read_after(self, user_id, after, limit):
+        last = self._seq.get(user_id, 0)
+        events = self._events.get(user_id) or deque()
+        self._expire(events)
+        first = events[0][0] if events else last + 1
+        if after > last or after < first - 1:
+            return None
+        return [(seq, event, data) for seq, event, data, _ in events if seq > after][:limit]
+
+    def last_seq(self, user_id):
+        return self._seq.get(user_id, 0)
+
+    def trim(self):
+        before = sum(len(events) for events in self._events.values())
+        for events in self._events.values():
+            self._expire(events)
+        return before - sum(len(events) for events in self._events.values())
+
+    async def aappend(self, user_id, event, data):
+        return self.append(user_id, event, data)
+
+    async def aappend_many(self, entries):
+        return self.append_many(entries)
+
+    async def aread_after(self, user_id, after, limit):
+        return self.read_after(user_id, after, limit)
+
+    async def alast_seq(self, user_id):
+        return self.last_seq(user_id)
+
+
+class DatabaseEventLogBackend(BaseEventLogBackend):
+    """Journal en base: `UserEvent` (append-only) et `EventStream` (compteur + seuil de purge).
+
+    La purge par longueur et par âge d'un utilisateur a lieu tous les `trim_every` ajouts;
+    `trim()` (commande `trim_event_log`) purge par âge les journaux inactifs.
+    """
+
+    def __init__(self, trim_every=50, **options):
+        super().__init__(**options)
+        self.trim_every = trim_every
+
+    def append(self, user_id, event, data):
+        with transaction.atomic():
+            # Verrou de ligne sur le compteur: les seq sont attribués et validés dans l'ordre
+            stream, _ = EventStream.objects.select_for_update().get_or_create(user_id=user_id)
+            stream.last_seq += 1
+            stream.save(update_fields=['last_seq'])
+            UserEvent.objects.create(user_id=user_id, seq=stream.last_seq, event=event, data=data)
+            if stream.last_seq % self.trim_every == 0:
+                self._trim_user(stream)
+        return stream.last_seq
+
+    def append_many(self, entries):
+        # Un verrou par flux (ordre des user_id: pas d'interblocage), un bulk_update et un bulk_create
+        user_ids = sorted({int(user_id) for user_id, _, _ in entries})
+        with transaction.atomic():
+            EventStream.objects.bulk_create([EventStream(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+            streams = {
+                stream.user_id: stream
+                for stream in EventStream.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id')
+            }
+            previous = {user_id: stream.last_seq for user_id, stream in streams.items()}
+            seqs = []
+            events = []
+            for user_id, event, data in entries:
+                stream = streams[int(user_id)]
+                stream.last_seq += 1
+                seqs.append(stream.last_seq)
+                events.append(UserEvent(user_id=stream.user_id, seq=stream.last_seq, event=event, data=data))
+            EventStream.objects.bulk_update(streams.values(), ['last_seq'])
+            UserEvent.objects.bulk_create(events)
+            for user_id, stream in streams.items():
+                if stream.last_seq // self.trim_every > previous[user_id] // self.trim_every:
+                    self._trim_user(stream)
+        return seqs
+
+    def _trim_user(self, stream):
+        cutoff = timezone.now() - timedelta(seconds=self.max_age)
+        expired = UserEvent.objects.filter(user_id=stream.user_id, created_at__lt=cutoff).aggregate(seq=Max('seq'))['seq'] or 0
+        trimmed_seq = max(stream.trimmed_seq, stream.last_seq - self.max_events, expired)
+        if trimmed_seq > stream.trimmed_seq:
+            UserEvent.objects.filter(user_id=stream.user_id, seq__lte=trimmed_seq).delete()
+            stream.trimmed_seq = trimmed_seq
+            stream.save(update_fields=['trimmed_seq'])
+
+    def read_after(self, user_id, after, limit):
+        stream = EventStream.objects.filter(user_id=user_id).values('last_seq', 'trimmed_seq').first()
+        last, trimmed = (stream['last_seq'], stream['trimmed_seq']) if stream else (0, 0)
+        if after > last or after < trimmed:
+            return None
+        return list(
+            UserEvent.objects.filter(user_id=user_id, seq__gt=after)
+            .order_by('seq')
+            .values_list('seq', 'event', 'data')[:limit]
+        )
+
+    def last_seq(self, user_id):
+        return EventStream.objects.filter(user_id=user_id).values_list('last_seq', flat=True).first() or 0
+
+    def trim(self):
+        cutoff = timezone.now() - timedelta(seconds=self.max_age)
+        expired = UserEvent.objects.filter(created_at__lt=cutoff)
+        total = 0
+        for row in expired.values('user_id').annotate(seq=Max('seq')):
+            with transaction.atomic():
+                stream = EventStream.objects.select_for_update().get(user_id=row['user_id'])
+                total += UserEvent.objects.filter(user_id=row['user_id'], seq__lte=row['seq']).delete()[0]
+                if row['seq'] > stream.trimmed_seq:
+                    stream.trimmed_seq = row['seq']
+                    stream.save(update_fields=['trimmed_seq'])
+        return total
+
+
+class RedisEventLogBackend(BaseEventLogBackend):
+    """Journal dans Redis: compteur `<prefix>:seq:<user_id>` et flux `<prefix>:log:<user_id>`.
+
+    Un script Lua incrémente le compteur et ajoute l'événement au flux sous l'identifiant
+    `<seq>-0`: les `seq` d'un utilisateur sont contigus et visibles dans l'ordre. Le flux est
+    borné à ~`max_events` entrées à chaque ajout et les deux clés expirent après `max_age`
+    secondes d'inactivité. Une reprise depuis un `seq` purgé ou plus ancien que `max_age`
+    retourne `None` (le client recharge l'historique).
+    """
+
+    # KEYS: compteur, flux; ARGV: max_events, event, data (JSON), maintenant (epoch), max_age
+    APPEND_SCRIPT = """
+        local seq = redis.call('INCR', KEYS[1])
+        redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[1], seq .. '-0', 'event', ARGV[2], 'data', ARGV[3], 'at', ARGV[4])
+        redis.call('EXPIRE', KEYS[1], ARGV[5])
+        redis.call('EXPIRE', KEYS[2], ARGV[5])
+        return seq
+    """
+
+    def __init__(self, url='redis://127.0.0.1:6379/0', prefix='events', **options):
+        super().__init__(**options)
+        import redis
+        import redis.asyncio as aioredis
+        self.redis = redis.Redis.from_url(url)
+        self.aredis = aioredis.from_url(url)
+        self.prefix = prefix
+        self._append = self.redis.register_script(self.APPEND_SCRIPT)
+        self._aappend = self.aredis.register_script(self.APPEND_SCRIPT)
+
+    def _keys(self, user_id):
+        return [f"{self.prefix}:seq:{user_id}", f"{self.prefix}:log:{user_id}"]
+
+    def _args(self, event, data):
+        return [self.max_events, event, dumps(data), time.time(), self.max_age]
+
+    def append(self, user_id, event, data):
+        return self._append(keys=self._keys(user_id), args=self._args(event, data))
+
+    def append_many(self, entries):
+        # Un seul aller-retour: les scripts sont pipelinés (exécutés dans l'ordre des entrées)
+        with self.redis.pipeline(transaction=False) as pipe:
+            for user_id, event, data in entries:
+                self._append(keys=self._keys(user_id), args=self._args(event, data), client=pipe)
+            return pipe.execute()
+
+    def _parse(self, after, last, entries):
+        last = int(last or 0)
+        if after > last:
+            return None
+        if after == last:
+            return []
+        events = [(int(entry_id.split(b'-')[0]), fields) for entry_id, fields in entries]
+        # `after + 1` absent (MAXLEN, expiration) ou trop ancien: reprise impossible
+        if not events or events[0][0] != after + 1 or float(events[0][1][b'at']) < time.time() - self.max_age:
+            return None
+        return [(seq, fields[b'event'].decode(), json.loads(fields[b'data'])) for seq, fields in events]
+
+    def read_after(self, user_id, after, limit):
+        seq_key, log_key = self._keys(user_id)
+        with self.redis.pipeline(transaction=True) as pipe:
+            pipe.get(seq_key)
+            pipe.xrange(log_key, min=after + 1, max='+', count=limit)
+            last, entries = pipe.execute()
+        return self._parse(after, last, entries)
+
+    def last_seq(self, user_id):
+        return int(self.redis.get(self._keys(user_id)[0]) or 0)
+
+    async def aappend(self, user_id, event, data):
+        return await self._aappend(keys=self._keys(user_id), args=self._args(event, data))
+
+    async def aappend_many(self, entries):
+        async with self.aredis.pipeline(transaction=False) as pipe:
+            for user_id, event, data in entries:
+                await self._aappend(keys=self._keys(user_id), args=self._args(event, data), client=pipe)
+            return await pipe.execute()
+
+    async def aread_after(self, user_id, after, limit):
+        seq_key, log_key = self._keys(user_id)
+        async with self.aredis.pipeline(transaction=True) as pipe:
+            pipe.get(seq_key)
+            pipe.xrange(log_key, min=after + 1, max='+', count=limit)
+            last, entries = await pipe.execute()
+        return self._parse(after, last, entries)
+
+    async def alast_seq(self, user_id):
+        return int(await self.aredis.get(self._keys(user_id)[0]) or 0)
+
+
+@lru_cache(maxsize=None)
+def get_event_log():
+    """Instancie (une fois par processus) le backend configuré dans `settings.EVENT_LOG`."""
+    config = getattr(settings, 'EVENT_LOG', {})
+    backend_cls = import_string(config.get('BACKEND', 'accounts.eventlog.InMemoryEventLogBackend'))
+    return backend_cls(**config.get('OPTIONS', {}))
+
+
+async def _broadcast(entries, seqs):
+    """Diffuse chaque entrée `(user_id, event, data)` avec son `seq`, envois lancés en parallèle."""
+    channel_layer = get_channel_layer()
+    await asyncio.gather(*(
+        channel_layer.group_send(f"user_{user_id}", {'type': 'chat.message', 'event': event, 'data': data, 'seq': seq})
+        for (user_id, event, data), seq in zip(entries, seqs)
+    ))
+
+
+def _fan_out(user_ids, event, data):
+    return [(user_id, event, data) for user_id in dict.fromkeys(int(uid) for uid in user_ids)]
+
+
+async def apublish(user_ids, event, data):
+    """Journalise puis diffuse `event` à chacun des utilisateurs `user_ids` (groupe `user_<id>`)."""
+    await apublish_many(_fan_out(user_ids, event, data))
+
+
+def publish(user_ids, event, data):
+    """Version synchrone de `apublish` (vues REST, worker de médias)."""
+    publish_many(_fan_out(user_ids, event, data))
+
+
+async def apublish_many(entries):
+    """Journalise `entries` (`(user_id, event, data)`) en un seul ajout groupé puis les diffuse.
+
+    Les envois au channel layer sont lancés en parallèle (commandes Redis pipelinées sur le pool
+    de connexions de `channels_redis`): un seul `group_send` par entrée.
+    """
+    if entries:
+        await _broadcast(entries, await get_event_log().aappend_many(entries))
+
+
+def publish_many(entries):
+    """Version synchrone de `apublish_many`: l'ajout au journal passe par le client synchrone du backend."""
+    if entries:
+        async_to_sync(_broadcast)(entries, get_event_log().append_many(entries))
@@ -0,0 +1,30 @@
+"""Archive les messages des mois sortis de la fenêtre chaude (voir `accounts.archive`).
+
+À planifier après `partition_messages` (ex: cron mensuel): `python manage.py archive_messages`.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.archive import archivable_months, archive_month, archive_setting
+
+
+class Command(BaseCommand):
+    help = "Déplace les messages des mois anciens vers le stockage froid (tranches compressées par conversation)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hot-months', type=int, default=None, help='Mois conservés dans la table chaude.')
+        parser.add_argument('--segment-size', type=int, default=None, help='Messages par tranche archivée.')
+        parser.add_argument('--dry-run', action='store_true', help='Affiche les mois concernés sans archiver.')
+
+    def handle(self, *args, **options):
+        hot_months = archive_setting('HOT_MONTHS') if options['hot_months'] is None else options['hot_months']
+        months = archivable_months(timezone.now(), hot_months)
+        total = 0
+        for month in months:
+            if options['dry_run']:
+                self.stdout.write(f'{month:%Y-%m}: à archiver')
+                continue
+            count = archive_month(month, options['segment_size'])
+            total += count
+            self.stdout.write(f'{month:%Y-%m}: {count} message(s) archivé(s)')
+        self.stdout.write(self.style.SUCCESS(f'{total} message(s) archivé(s) sur {len(months)} mois.'))
@@ -0,0 +1,42 @@
+"""Remplit `Message.conversation_key` pour les messages antérieurs à la migration 0006.
+
+La migration 0015 fait le même travail; sur une grande table, lancer cette commande
+avant le déploiement (tranches espacées par `--sleep`) rend la migration instantanée.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import CharField, Max, Min, Value
+from django.db.models.functions import Cast, Concat, Greatest, Least
+
+from accounts.models import Message
+
+
+class Command(BaseCommand):
+    help = "Remplit la clé canonique de conversation des messages existants, par tranches d'identifiants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Nombre d'identifiants traités par UPDATE.")
+        parser.add_argument('--sleep', type=float, default=0.0, help='Pause (secondes) entre deux tranches.')
+
+    def handle(self, *args, **options):
+        chunk = max(1, options['chunk_size'])
+        pending = Message.objects.filter(conversation_key__isnull=True)
+        bounds = pending.aggregate(lo=Min('id'), hi=Max('id'))
+        if bounds['lo'] is None:
+            self.stdout.write('Aucun message à traiter.')
+            return
+
+        # Chaque tranche est un UPDATE court en autocommit: aucun verrou long sur la table
+        key = Concat(
+            Cast(Least('sender_id', 'receiver_id'), CharField()),
+            Value(':'),
+            Cast(Greatest('sender_id', 'receiver_id'), CharField()),
+            output_field=CharField(),
+        )
+        total = 0
+        for start in range(bounds['lo'], bounds['hi'] + 1, chunk):
+            total += pending.filter(id__gte=start, id__lt=start + chunk).update(conversation_key=key)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'{total} message(s) mis à jour.'))
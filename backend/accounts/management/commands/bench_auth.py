@@ -0,0 +1,50 @@
+"""Mesure le coût de `JWTAuthentication.authenticate` avec et sans cache utilisateur."""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from accounts.tokenauthentications import JWTAuthentication, invalidate_cached_user
+
+
+class Command(BaseCommand):
+    help = "Benchmark de l'authentification JWT par requête (base vs caches local/partagé)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='Nombre de requêtes authentifiées.')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(is_active=True).order_by('id').first()
+        if user is None:
+            self.stderr.write('Aucun utilisateur en base.')
+            return
+        token = JWTAuthentication.generate_token(user)
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        auth = JWTAuthentication()
+        n = options['requests']
+
+        # Sans cache: chaque requête repart de la base
+        cold = self._measure(n, lambda: (invalidate_cached_user(user.id), auth.authenticate(request)))
+        # Avec cache: seule la première requête touche la base
+        invalidate_cached_user(user.id)
+        warm = self._measure(n, lambda: auth.authenticate(request))
+
+        for label, (elapsed, queries) in (('sans cache', cold), ('avec cache', warm)):
+            self.stdout.write(f'{label:<11} {elapsed / n * 1e6:>9.1f} µs/requête  {queries} requête(s) SQL')
+
+    @staticmethod
+    def _measure(n, call):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            for _ in range(n):
+                call()
+            elapsed = time.perf_counter() - start
+        return elapsed, len(queries)
@@ -0,0 +1,76 @@
+"""Compare l'envoi d'un même message à N destinataires: un par un vs envoi groupé."""
+import time
+
+from channels.layers import InMemoryChannelLayer, channel_layers
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from accounts.batchsend import batch_events, create_batch
+from accounts.eventlog import publish, publish_many
+from accounts.models import Message
+
+
+class Command(BaseCommand):
+    help = "Benchmark d'une annonce à N destinataires: send_message un par un vs send_message_batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=500, help='Nombre de destinataires.')
+        parser.add_argument('--rounds', type=int, default=3, help="Nombre d'annonces par méthode.")
+        parser.add_argument('--in-memory-layer', action='store_true', help='Utilise une couche channels en mémoire.')
+
+    def handle(self, *args, **options):
+        users = list(get_user_model().objects.filter(is_active=True).order_by('id')[:options['recipients'] + 1])
+        if len(users) < 2:
+            self.stderr.write('Au moins deux utilisateurs sont nécessaires.')
+            return
+        if options['in_memory_layer']:
+            channel_layers.set('default', InMemoryChannelLayer(capacity=100_000))
+        sender, recipients = users[0], users[1:]
+        items = [(user.id, 'Annonce') for user in recipients]
+
+        def one_by_one():
+            for receiver_id, content in items:
+                message = Message.objects.create(sender_id=sender.id, receiver_id=receiver_id, content=content)
+                publish([sender.id, receiver_id], 'message_created', {
+                    'id': message.id, 'from': sender.id, 'to': receiver_id, 'content': content,
+                    'created_at': message.created_at.isoformat(), 'status': message.status,
+                })
+
+        def batched():
+            messages, _ = create_batch(sender.id, items)
+            publish_many(batch_events(sender.id, messages))
+
+        for label, send in (('un par un', one_by_one), ('groupé', batched)):
+            elapsed, queries = self._measure(options['rounds'], send)
+            total = options['rounds'] * len(items)
+            self.stdout.write(
+                f'{label:<10} {total} messages en {elapsed:.2f} s ({total / elapsed:.0f} msg/s), '
+                f'{queries / options["rounds"]:.0f} requête(s) SQL par annonce'
+            )
+
+    @staticmethod
+    def _measure(rounds, send):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def instrument(sender, connection, **kwargs):
+            # Un même objet connexion (par thread) peut se reconnecter plusieurs fois
+            if count not in connection.execute_wrappers:
+                connection.execute_wrappers.append(count)
+
+        # Le journal d'événements écrit depuis les threads de l'exécuteur base: leurs connexions sont aussi comptées
+        connection_created.connect(instrument)
+        try:
+            with connection.execute_wrapper(count):
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    send()
+                elapsed = time.perf_counter() - start
+        finally:
+            connection_created.disconnect(instrument)
+        return elapsed, len(queries)
@@ -0,0 +1,73 @@
+"""Compare les octets transférés pour des lectures partielles (Range) et des téléchargements complets."""
+import os
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from accounts.models import Message, User
+from accounts.storage import get_message_storage
+from accounts.tokenauthentications import JWTAuthentication
+from accounts.views import serve_media
+
+MIB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = "Benchmark du service des médias: avances rapides par requêtes Range vs téléchargements complets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=64, help='Taille du média de test (Mio).')
+        parser.add_argument('--seeks', type=int, default=20, help="Nombre d'avances rapides simulées.")
+        parser.add_argument('--range', type=int, default=1, help='Taille de chaque plage lue (Mio).')
+
+    def handle(self, *args, **options):
+        size = options['size'] * MIB
+        span = options['range'] * MIB
+        seeks = options['seeks']
+        storage = get_message_storage()
+        name = storage.save('messages/bench.bin', ContentFile(os.urandom(size)))
+        # Accès réservé aux participants: message de test portant le fichier, requêtes authentifiées
+        sender, _ = User.objects.get_or_create(email='bench-media@example.com', defaults={'username': 'bench-media'})
+        message = Message.objects.create(sender=sender, receiver=sender, message_type='video', file=name, media_status='ready')
+        factory = RequestFactory(HTTP_AUTHORIZATION=f'Bearer {JWTAuthentication.generate_token(sender)}')
+        try:
+            # Sans Range: chaque avance rapide retélécharge le fichier depuis le début
+            full = self._measure(seeks, lambda i: factory.get(f'/media/{name}'), name)
+            # Avec Range: seule la plage demandée est lue et envoyée
+            step = max((size - span) // max(seeks, 1), 1)
+            ranged = self._measure(
+                seeks,
+                lambda i: factory.get(f'/media/{name}', HTTP_RANGE=f'bytes={i * step}-{i * step + span - 1}'),
+                name,
+            )
+            # Revalidation: le client a déjà le fichier en cache (ETag)
+            etag = serve_media(factory.get(f'/media/{name}'), name)['ETag']
+            revalidated = self._measure(seeks, lambda i: factory.get(f'/media/{name}', HTTP_IF_NONE_MATCH=etag), name)
+        finally:
+            message.delete()
+            storage.delete(name)
+
+        for label, (elapsed, sent, statuses) in (
+            ('complet', full), ('Range', ranged), ('If-None-Match', revalidated),
+        ):
+            self.stdout.write(
+                f'{label:<14} {sent / MIB:>9.1f} Mio envoyés  {elapsed * 1e3:>8.1f} ms  statuts {sorted(statuses)}'
+            )
+
+    @staticmethod
+    def _measure(n, make_request, name):
+        sent = 0
+        statuses = set()
+        start = time.perf_counter()
+        for i in range(n):
+            response = serve_media(make_request(i), name)
+            statuses.add(response.status_code)
+            if response.streaming:
+                for block in response.streaming_content:
+                    sent += len(block)
+                response.close()
+            else:
+                sent += len(response.content)
+        return time.perf_counter() - start, sent, statuses
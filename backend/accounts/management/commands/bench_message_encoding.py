@@ -0,0 +1,77 @@
+"""Microbenchmark: `MessageSerializer` + `JSONRenderer` contre l'encodeur partagé (`accounts.encoders`).
+
+Par défaut sur des messages construits en mémoire (10 % de médias); avec `--db`, sur les
+`--rows` premiers messages de la base, lecture comprise (instances de modèle contre
+tuples `.values_list()`). Chaque étape est mesurée `--repeat` fois, le meilleur temps est retenu.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from accounts.encoders import MessageRow, dumps, get_message_encoder, message_rows, orjson
+from accounts.models import Message
+from accounts.serializers import MessageSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare MessageSerializer et l'encodeur rapide des messages (encodage + rendu JSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help='Nombre de messages encodés.')
+        parser.add_argument('--repeat', type=int, default=5, help='Répétitions par mesure.')
+        parser.add_argument('--db', action='store_true', help='Lit les messages en base (lecture incluse).')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if options['db']:
+            queryset = Message.objects.order_by('id')[:rows]
+            load_instances = lambda: list(queryset)
+            load_rows = lambda: message_rows(queryset)
+        else:
+            messages = self._messages(rows)
+            load_instances = lambda: messages
+            load_rows = lambda: [MessageRow.from_message(m) for m in messages]
+        encoder = get_message_encoder()
+        instances, fast_rows = load_instances(), load_rows()
+        if not instances:
+            self.stderr.write('Aucun message à encoder.')
+            return
+        same = MessageSerializer(instances, many=True).data == encoder.encode_many(fast_rows)
+
+        serializer = self._best(repeat, lambda: JSONRenderer().render(MessageSerializer(load_instances(), many=True).data))
+        fast = self._best(repeat, lambda: dumps(encoder.encode_many(load_rows())))
+        self.stdout.write(f"{len(instances)} messages, JSON: {'orjson' if orjson else 'json'}, sorties identiques: {'oui' if same else 'NON'}")
+        self.stdout.write(f'MessageSerializer + JSONRenderer: {serializer * 1000:8.1f} ms ({len(instances) / serializer:,.0f} messages/s)')
+        self.stdout.write(f'encodeur partagé + dumps:         {fast * 1000:8.1f} ms ({len(instances) / fast:,.0f} messages/s)')
+        self.stdout.write(self.style.SUCCESS(f'gain: x{serializer / fast:.1f}'))
+
+    @staticmethod
+    def _best(repeat, func):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    @staticmethod
+    def _messages(count):
+        now = timezone.now()
+        messages = []
+        for i in range(count):
+            media = i % 10 == 0
+            messages.append(Message(
+                id=i + 1, sender_id=1 + i % 2, receiver_id=2 - i % 2,
+                content='' if media else f'message {i} ' + 'lorem ipsum ' * (i % 8),
+                message_type='audio' if media else 'text',
+                file=f'messages/ab/{i:064x}.webm' if media else None,
+                created_at=now - timedelta(seconds=count - i), updated_at=now,
+                status='read', delivered_at=now, read_at=now, conversation_key='1:2',
+                media_status='ready' if media else None, duration=3.5 if media else None,
+                waveform=[0.1, 0.5, 0.9] if media else None,
+            ))
+        return messages
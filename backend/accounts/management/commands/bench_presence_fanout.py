@@ -0,0 +1,63 @@
+"""Mesure le coût de diffusion de la présence sur une couche channels en mémoire.
+
+Compare l'ancien groupe global `presence` (chaque connexion reçoit chaque
+événement) aux groupes ciblés `presence_<user_id>` (seuls les abonnés le reçoivent).
+"""
+import asyncio
+import random
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from accounts.presence import presence_group
+
+
+class Command(BaseCommand):
+    help = "Benchmark de la diffusion de présence: groupe global vs groupes par utilisateur."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10_000, help='Nombre de connexions simulées.')
+        parser.add_argument('--watched', type=int, default=20, help="Utilisateurs suivis par connexion (mode ciblé).")
+        parser.add_argument('--events', type=int, default=200, help='Événements de présence mesurés.')
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options['connections'], options['watched'], options['events']))
+
+    async def _run(self, connections, watched, events):
+        rng = random.Random(0)
+        users = list(range(1, connections + 1))
+        emitters = rng.sample(users, min(events, connections))
+
+        broadcast = InMemoryChannelLayer(capacity=10)
+        for uid in users:
+            await broadcast.group_add('presence', f'chan.{uid}')
+        broadcast_stats = await self._measure(broadcast, ['presence'] * len(emitters))
+
+        targeted = InMemoryChannelLayer(capacity=10)
+        for uid in users:
+            for peer in rng.sample(users, min(watched, connections)):
+                await targeted.group_add(presence_group(peer), f'chan.{uid}')
+        targeted_stats = await self._measure(targeted, [presence_group(uid) for uid in emitters])
+
+        self.stdout.write(f'{connections} connexions, {len(emitters)} événements mesurés')
+        for label, (deliveries, elapsed) in (('global', broadcast_stats), ('ciblé', targeted_stats)):
+            per_event = deliveries / len(emitters)
+            self.stdout.write(
+                f'  {label:<7} {per_event:>10.1f} envois/événement  '
+                f'{elapsed / len(emitters) * 1000:>8.3f} ms/événement  '
+                f'tempête de reconnexion ({connections} événements): ~{per_event * connections:,.0f} envois'
+            )
+
+    @staticmethod
+    async def _measure(layer, groups):
+        """Envoie un événement par groupe et renvoie (nombre d'envois, durée totale)."""
+        deliveries = 0
+        elapsed = 0.0
+        for group in groups:
+            deliveries += len(layer.groups.get(group, {}))
+            start = time.perf_counter()
+            await layer.group_send(group, {'type': 'presence.update', 'online': True})
+            elapsed += time.perf_counter() - start
+            layer.channels.clear()
+        return deliveries, elapsed
@@ -0,0 +1,95 @@
+"""Compare les formats de trame WebSocket (`accounts.wire`): JSON et MessagePack (`gmsg.msgpack.v1`).
+
+Sur un flux représentatif d'événements de chat (créations, accusés, présence,
+lots), rapporte pour 1000 événements: le temps CPU d'encodage (serveur) et de
+décodage (client), la taille sur le fil brute et avec permessage-deflate, simulée
+avec et sans « context takeover » (fenêtre de compression conservée entre trames).
+"""
+import time
+import zlib
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.encoders import MessageRow, get_message_encoder, orjson, status_event
+from accounts.models import Message
+from accounts.wire import CODECS, JSON_CODEC
+
+
+class Command(BaseCommand):
+    help = "Bande passante et CPU par 1000 événements WebSocket: JSON contre MessagePack."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000, help="Nombre d'événements du flux.")
+        parser.add_argument('--repeat', type=int, default=5, help='Répétitions par mesure (meilleur temps retenu).')
+
+    def handle(self, *args, **options):
+        events = self._events(options['events'])
+        per = 1000 / len(events)
+        self.stdout.write(f"{len(events)} événements (résultats ramenés à 1000 événements)")
+        self.stdout.write(f"{'format':<18}{'encodage':>12}{'décodage':>12}{'brut':>12}{'deflate':>12}{'deflate ctx':>14}")
+        json_name = 'json (orjson)' if orjson else 'json'
+        for name, codec in ((json_name, JSON_CODEC), ('gmsg.msgpack.v1', CODECS['gmsg.msgpack.v1'])):
+            frames = [codec.encode(event) for event in events]
+            frames = [frame if isinstance(frame, bytes) else frame.encode() for frame in frames]
+            assert all(codec.decode(frame) == event for frame, event in zip(frames, events))
+            encode = self._best(options['repeat'], lambda: [codec.encode(event) for event in events])
+            decode = self._best(options['repeat'], lambda: [codec.decode(frame) for frame in frames])
+            raw = sum(len(frame) for frame in frames)
+            self.stdout.write(
+                f"{name:<18}{encode * per * 1000:>9.2f} ms{decode * per * 1000:>9.2f} ms"
+                f"{raw * per / 1024:>9.1f} Ko{self._deflate(frames, False) * per / 1024:>9.1f} Ko"
+                f"{self._deflate(frames, True) * per / 1024:>11.1f} Ko"
+            )
+
+    @staticmethod
+    def _deflate(frames, takeover):
+        # permessage-deflate (RFC 7692): deflate brut, vidage synchronisé, 4 octets de fin retirés
+        total = 0
+        compressor = zlib.compressobj(wbits=-15)
+        for frame in frames:
+            if not takeover:
+                compressor = zlib.compressobj(wbits=-15)
+            total += len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+        return total
+
+    @staticmethod
+    def _best(repeat, func):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    @staticmethod
+    def _events(count):
+        encoder = get_message_encoder()
+        now = timezone.now()
+        events = []
+        for i in range(count):
+            kind = i % 20
+            message = Message(
+                id=10_000 + i, sender_id=1 + i % 7, receiver_id=8 + i % 5, content=f'message {i} ' + 'salut ' * (i % 6),
+                message_type='text', created_at=now - timedelta(seconds=count - i), updated_at=now,
+                status='sent', conversation_key=Message.conversation_key_for(1 + i % 7, 8 + i % 5),
+            )
+            if kind < 10:
+                event, data = 'message_created', encoder.event(MessageRow.from_message(message))
+            elif kind < 14:
+                event, data = 'message_delivered', status_event(message.id, 'delivered', now)
+            elif kind < 17:
+                event, data = 'message_read', status_event(message.id, 'read', now)
+            elif kind < 19:
+                event, data = 'presence_batch', {'updates': [
+                    {'user_id': 20 + j, 'online': bool(j % 2), 'last_seen': now.isoformat()} for j in range(3)
+                ]}
+            else:
+                event, data = 'messages_read', {
+                    'from': message.sender_id, 'to': message.receiver_id, 'first_id': message.id - 5,
+                    'up_to_id': message.id, 'count': 5, 'read_at': now.isoformat(), 'status': 'read',
+                }
+            events.append({'type': event, 'seq': i + 1, **data})
+        return events
@@ -0,0 +1,73 @@
+"""Simule une vague de reconnexions WebSocket et mesure latence de connexion et requêtes SQL.
+
+Les clients sont connectés en mémoire (sans serveur) sur `ChatConsumer`, avec
+les backends configurés (couche channels, présence, révocation).
+"""
+import asyncio
+import statistics
+import time
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+
+from accounts.consumers import ChatConsumer
+from accounts.tokenauthentications import JWTAuthentication
+
+
+class Command(BaseCommand):
+    help = "Benchmark d'une tempête de reconnexions WebSocket (latence de connect, requêtes SQL/s)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=5000, help='Nombre de connexions simulées.')
+        parser.add_argument('--concurrency', type=int, default=200, help='Connexions ouvertes en parallèle.')
+
+    def handle(self, *args, **options):
+        users = list(get_user_model().objects.order_by('id')[:options['clients']])
+        if not users:
+            self.stderr.write('Aucun utilisateur en base.')
+            return
+        tokens = [JWTAuthentication.generate_token(users[i % len(users)]) for i in range(options['clients'])]
+        asyncio.run(self._run(tokens, options['concurrency']))
+
+    async def _run(self, tokens, concurrency):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def instrument(sender, connection, **kwargs):
+            connection.execute_wrappers.append(count)
+
+        # Chaque thread du pool sync_to_async ouvre sa propre connexion: on les instrumente toutes
+        connection_created.connect(instrument)
+
+        app = ChatConsumer.as_asgi()
+        latencies = []
+        communicators = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def connect(token):
+            async with semaphore:
+                communicator = WebsocketCommunicator(app, f'/ws/chat?token={token}')
+                start = time.perf_counter()
+                connected, _ = await communicator.connect()
+                latencies.append(time.perf_counter() - start)
+                if connected:
+                    communicators.append(communicator)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(connect(token) for token in tokens))
+        elapsed = time.perf_counter() - start
+        connection_created.disconnect(instrument)
+
+        for communicator in communicators:
+            await communicator.disconnect()
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        self.stdout.write(f'{len(communicators)}/{len(tokens)} connexions acceptées en {elapsed:.2f} s')
+        self.stdout.write(f'  latence connect: p50 {statistics.median(latencies) * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms')
+        self.stdout.write(f'  requêtes SQL: {len(queries)} ({len(queries) / elapsed:.1f}/s)')
@@ -0,0 +1,92 @@
+"""Test de charge de `ChatConsumer`: messages/s par worker selon l'exécuteur base.
+
+Les sockets sont connectées en mémoire (sans serveur) sur une couche channels
+en mémoire; chaque client envoie des messages texte (`send_message`) à un autre
+client, et la mesure s'arrête quand tous les `message_created` sont reçus.
+Chaque configuration d'exécuteur (`--workers 0,16`: thread partagé de
+`sync_to_async`, puis pool dédié de 16 threads) est mesurée tour à tour.
+"""
+import asyncio
+import time
+
+from channels.layers import InMemoryChannelLayer, channel_layers
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from accounts.consumers import ChatConsumer
+from accounts.dbexecutor import get_db_executor
+from accounts.dbpool import pool_stats
+from accounts.tokenauthentications import JWTAuthentication
+
+
+class Command(BaseCommand):
+    help = "Charge WebSocket: débit de messages par worker, thread partagé vs exécuteur base dédié."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000, help='Nombre de sockets connectées.')
+        parser.add_argument('--messages', type=int, default=5, help='Messages envoyés par socket.')
+        parser.add_argument('--workers', default='0,16', help="Tailles d'exécuteur à comparer (0: thread partagé).")
+
+    def handle(self, *args, **options):
+        users = list(get_user_model().objects.filter(is_active=True).order_by('id')[:options['clients']])
+        if len(users) < 2:
+            self.stderr.write('Au moins deux utilisateurs sont nécessaires.')
+            return
+        for workers in [int(w) for w in options['workers'].split(',')]:
+            channel_layers.set('default', InMemoryChannelLayer(capacity=100_000))
+            with override_settings(DB_EXECUTOR={'MAX_WORKERS': workers}):
+                get_db_executor.cache_clear()
+                opened = pool_stats()['connections_opened']
+                elapsed, sent, received = asyncio.run(self._run(users, options['clients'], options['messages']))
+                stats = get_db_executor().stats()
+                opened = pool_stats()['connections_opened'] - opened
+            get_db_executor.cache_clear()
+            self.stdout.write(
+                f'exécuteur {workers or "partagé":>8}: {sent} messages en {elapsed:.2f} s '
+                f'({sent / elapsed:.0f} msg/s, {received} événements reçus)  '
+                f"attente file {stats['avg_wait_ms']:.2f} ms, exécution {stats['avg_run_ms']:.2f} ms, "
+                f"pic {stats['peak_in_flight']} appels en cours, {opened} connexion(s) ouverte(s)"
+            )
+
+    async def _run(self, users, clients, per_client):
+        app = ChatConsumer.as_asgi()
+        communicators = []
+        for i in range(clients):
+            user = users[i % len(users)]
+            communicator = WebsocketCommunicator(app, f'/ws/chat?token={JWTAuthentication.generate_token(user)}')
+            connected, _ = await communicator.connect()
+            if connected:
+                communicators.append((user.id, communicator))
+
+        async def client(index, communicator):
+            peer_id = users[(index + 1) % len(users)].id
+            for n in range(per_client):
+                await communicator.send_json_to({'type': 'send_message', 'to': peer_id, 'content': f'bench {n}'})
+
+        async def drain(communicator, expected):
+            received = 0
+            while received < expected:
+                event = await communicator.receive_json_from(timeout=60)
+                if event.get('type') == 'message_created':
+                    received += 1
+            return received
+
+        # Chaque socket reçoit tous les événements de son utilisateur: ses envois et ceux qui lui sont destinés
+        expected = {}
+        for index, (user_id, _) in enumerate(communicators):
+            peer_id = users[(index + 1) % len(users)].id
+            expected[user_id] = expected.get(user_id, 0) + per_client
+            if peer_id != user_id:
+                expected[peer_id] = expected.get(peer_id, 0) + per_client
+
+        start = time.perf_counter()
+        drains = [asyncio.ensure_future(drain(c, expected.get(uid, 0))) for uid, c in communicators]
+        await asyncio.gather(*(client(i, c) for i, (_, c) in enumerate(communicators)))
+        received = sum(await asyncio.gather(*drains))
+        elapsed = time.perf_counter() - start
+
+        for _, communicator in communicators:
+            await communicator.disconnect()
+        return elapsed, len(communicators) * per_client, received
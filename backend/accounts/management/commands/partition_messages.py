@@ -0,0 +1,36 @@
+"""Partitionnement mensuel de `accounts_message` (PostgreSQL, voir `accounts.partitions`).
+
+À planifier (ex: cron quotidien) pour que les partitions des mois à venir existent
+toujours: `python manage.py partition_messages --ahead 3`. La conversion initiale
+de la table existante se fait une fois avec `--convert` (verrou exclusif bref).
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts import partitions
+from accounts.archive import archive_setting
+
+
+class Command(BaseCommand):
+    help = "Crée les partitions mensuelles de accounts_message (et convertit la table avec --convert)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Convertit la table existante en table partitionnée.')
+        parser.add_argument('--ahead', type=int, default=None, help='Nombre de mois à venir à préparer.')
+
+    def handle(self, *args, **options):
+        if not partitions.is_supported():
+            self.stdout.write('Partitionnement disponible uniquement avec PostgreSQL: rien à faire.')
+            return
+        ahead = archive_setting('PARTITIONS_AHEAD') if options['ahead'] is None else options['ahead']
+        now = timezone.now()
+        if not partitions.is_partitioned():
+            if not options['convert']:
+                raise CommandError("accounts_message n'est pas partitionnée: lancer d'abord avec --convert.")
+            created = partitions.convert_to_partitioned(now, ahead)
+            self.stdout.write(f'Table convertie; lignes existantes dans {partitions.LEGACY_PARTITION}.')
+        else:
+            created = partitions.ensure_partitions(now, ahead)
+        for name in created:
+            self.stdout.write(f'Partition créée: {name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(partitions.month_partitions())} partition(s) mensuelle(s).'))
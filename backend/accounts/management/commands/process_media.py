@@ -0,0 +1,28 @@
+"""Worker de traitement des médias (poster, forme d'onde, durée)."""
+from django.core.management.base import BaseCommand
+
+from accounts.mediajobs import enqueue_media_job, run_worker
+from accounts.models import Message
+
+
+class Command(BaseCommand):
+    help = "Traite la file `MediaJob` dans un pool de processus (voir settings.MEDIA_PROCESSING)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Nombre de processus de traitement.')
+        parser.add_argument('--once', action='store_true', help="S'arrête quand la file est vide.")
+        parser.add_argument('--backfill', action='store_true', help='Crée les tâches des médias existants non traités.')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            missing = Message.objects.exclude(message_type='text').exclude(file='').filter(
+                file__isnull=False, media_job__isnull=True,
+            )
+            count = 0
+            for message in missing.iterator():
+                Message.objects.filter(id=message.id).update(media_status='pending')
+                enqueue_media_job(message)
+                count += 1
+            self.stdout.write(f'{count} tâche(s) créée(s).')
+        total = run_worker(workers=options['workers'], once=options['once'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'{total} tâche(s) traitée(s).'))
@@ -0,0 +1,12 @@
+"""Reconstruit la table `ConversationSummary` à partir des messages existants."""
+from django.core.management.base import BaseCommand
+
+from accounts.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Recalcule les résumés de conversation (non lus, dernier message) pour tous les utilisateurs."
+
+    def handle(self, *args, **options):
+        total = rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS(f'{total} résumé(s) de conversation reconstruit(s).'))
@@ -0,0 +1,15 @@
+"""Indexe pour la recherche plein texte les messages existants (voir `accounts.search`)."""
+from django.core.management.base import BaseCommand
+
+from accounts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Indexe les messages antérieurs à l'index de recherche (par tranches d'identifiants)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10_000, help="Taille d'une tranche d'identifiants.")
+
+    def handle(self, *args, **options):
+        total = get_search_backend().rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{total} message(s) indexé(s).'))
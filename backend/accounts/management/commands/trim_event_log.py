@@ -0,0 +1,12 @@
+"""Purge les événements trop anciens du journal par utilisateur (`EVENT_LOG['OPTIONS']['max_age']`)."""
+from django.core.management.base import BaseCommand
+
+from accounts.eventlog import get_event_log
+
+
+class Command(BaseCommand):
+    help = "Supprime du journal d'événements les entrées plus anciennes que la rétention configurée."
+
+    def handle(self, *args, **options):
+        total = get_event_log().trim()
+        self.stdout.write(self.style.SUCCESS(f'{total} événement(s) purgé(s).'))
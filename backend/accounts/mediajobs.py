@@ -0,0 +1,168 @@
+"""File de traitement des médias en arrière-plan (table `MediaJob`).
+
+- `enqueue_media_job`: appelé à la création d'un message audio/vidéo (signal)
+- `claim_jobs`: réserve des tâches (`SELECT ... FOR UPDATE SKIP LOCKED` sur PostgreSQL),
+  reprend celles dont le verrou a expiré; le résultat d'un worker dont la tâche a été
+  reprise entre-temps est ignoré (`complete_job`/`fail_job` vérifient `locked_at`)
+- `run_worker`: boucle du worker (`python manage.py process_media`): les fichiers sont
+  traités dans un pool de processus (`accounts.mediaprocessors`), les résultats écrits
+  sur le `Message` puis publiés (`media_processed`) à l'émetteur et au destinataire
+
+Configuration via `settings.MEDIA_PROCESSING`.
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .encoders import get_message_encoder, message_rows
+from .eventlog import publish
+from .mediaprocessors import run_processor
+from .models import MediaJob, Message
+from .storage import get_message_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'PROCESSOR': 'accounts.mediaprocessors.FFmpegMediaProcessor',
+    'OPTIONS': {},
+    'WORKERS': 2,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 3,
+    'LOCK_TIMEOUT': 600,
+    'RETRY_DELAY': 30,
+    'TIMEOUT': 120,
+}
+
+
+def processing_setting(name):
+    return getattr(settings, 'MEDIA_PROCESSING', {}).get(name, DEFAULTS[name])
+
+
+def enqueue_media_job(message):
+    """Crée la tâche de traitement d'un message média (sans effet si elle existe déjà)."""
+    MediaJob.objects.get_or_create(message=message)
+
+
+def claim_jobs(limit):
+    """Réserve jusqu'à `limit` tâches disponibles et retourne leurs identifiants."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=processing_setting('LOCK_TIMEOUT'))
+    with transaction.atomic():
+        ids = list(
+            MediaJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending', available_at__lte=now) | Q(status='running', locked_at__lt=stale))
+            .order_by('available_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        MediaJob.objects.filter(id__in=ids).update(status='running', locked_at=now, attempts=F('attempts') + 1)
+    return ids
+
+
+def _owned(job):
+    """Tâche encore réservée par ce worker (verrou non repris entre-temps), verrouillée jusqu'au commit.
+
+    `locked_at`, fixé à la réservation, sert de jeton: une reprise après expiration le remplace.
+    """
+    return MediaJob.objects.select_for_update().filter(id=job.id, status='running', locked_at=job.locked_at).exists()
+
+
+def complete_job(job, result):
+    """Enregistre le résultat d'un traitement sur le message et diffuse `media_processed`.
+
+    Retourne `False` (résultat ignoré) si la tâche a été reprise par un autre worker.
+    """
+    with transaction.atomic():
+        if not _owned(job):
+            logger.warning('Media job %s: lock lost (reclaimed), result dropped', job.id)
+            return False
+        poster = result.get('poster')
+        poster_name = None
+        if poster:
+            content, ext = poster
+            poster_name = get_message_storage().save(f'messages/poster{ext}', ContentFile(content))
+        # update() plutôt que save(): pas de signal post_save (résumés inchangés), updated_at pour la synchro delta
+        Message.objects.filter(id=job.message_id).update(
+            media_status='ready',
+            duration=result.get('duration'),
+            waveform=result.get('waveform'),
+            poster=poster_name,
+            updated_at=timezone.now(),
+        )
+        MediaJob.objects.filter(id=job.id).update(status='done', locked_at=None, error='')
+    _notify_media_processed(job.message_id)
+    return True
+
+
+def fail_job(job, error):
+    """Replanifie la tâche avec un délai croissant, ou la marque en échec après `MAX_ATTEMPTS`.
+
+    Sans effet (retourne `False`) si la tâche a été reprise par un autre worker.
+    """
+    logger.warning('Media job %s failed (attempt %s): %s', job.id, job.attempts, error)
+    with transaction.atomic():
+        if not _owned(job):
+            logger.warning('Media job %s: lock lost (reclaimed), failure dropped', job.id)
+            return False
+        if job.attempts < processing_setting('MAX_ATTEMPTS'):
+            MediaJob.objects.filter(id=job.id).update(
+                status='pending',
+                locked_at=None,
+                error=str(error)[:1000],
+                available_at=timezone.now() + timedelta(seconds=processing_setting('RETRY_DELAY') * job.attempts),
+            )
+            return True
+        MediaJob.objects.filter(id=job.id).update(status='failed', locked_at=None, error=str(error)[:1000])
+        Message.objects.filter(id=job.message_id).update(media_status='failed', updated_at=timezone.now())
+    _notify_media_processed(job.message_id)
+    return True
+
+
+def _notify_media_processed(message_id):
+    row = message_rows(Message.objects.filter(id=message_id))[0]
+    publish([row.sender_id, row.receiver_id], 'media_processed', get_message_encoder().media_event(row))
+
+
+def run_worker(workers=None, once=False, stdout=None):
+    """Boucle du worker: réserve des tâches, les traite dans le pool, écrit les résultats.
+
+    Avec `once=True`, s'arrête dès que la file est vide. Retourne le nombre de tâches traitées.
+    """
+    workers = workers or processing_setting('WORKERS')
+    processor = processing_setting('PROCESSOR')
+    options = {'timeout': processing_setting('TIMEOUT'), **processing_setting('OPTIONS')}
+    storage = get_message_storage()
+    running = {}
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            free = workers - len(running)
+            if free > 0:
+                for job in MediaJob.objects.filter(id__in=claim_jobs(free)).select_related('message'):
+                    message = job.message
+                    if not message.file:
+                        fail_job(job, 'Message has no file.')
+                        continue
+                    future = pool.submit(run_processor, processor, options, storage.path(message.file.name), message.message_type)
+                    running[future] = job
+            if not running:
+                if once:
+                    return processed
+                time.sleep(processing_setting('POLL_INTERVAL'))
+                continue
+            done, _ = wait(running, timeout=processing_setting('POLL_INTERVAL'), return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    complete_job(job, future.result())
+                except Exception as exc:
+                    fail_job(job, exc)
+                processed += 1
+                if stdout is not None:
+                    stdout.write(f'job {job.id} (message {job.message_id}): {MediaJob.objects.get(id=job.id).status}')
@@ -0,0 +1,173 @@
+"""Processeurs de médias: durée, forme d'onde (audio) et image d'aperçu (vidéo).
+
+Exécutés dans les processus du pool de `process_media`: ce module n'accède
+pas à la base et ne dépend pas de Django. Un processeur reçoit le chemin du
+fichier et retourne un dictionnaire `{duration, waveform, poster}` où
+`poster` vaut `(octets, extension)` ou `None`. Chaque appel externe est borné par
+`timeout` secondes (`MEDIA_PROCESSING['TIMEOUT']`): au-delà, le processus est tué et
+`subprocess.TimeoutExpired` remonte au worker, qui replanifie puis fait échouer la tâche.
+
+- `FFmpegMediaProcessor`: ffprobe/ffmpeg (production)
+- `StubMediaProcessor`: valeurs déterministes calculées sur les octets du fichier, sans ffmpeg (dev, CI)
+"""
+import hashlib
+import importlib
+import os
+import struct
+import subprocess
+import threading
+import zlib
+from array import array
+
+READ_BLOCK = 64 * 1024
+
+
+class BaseMediaProcessor:
+    """Interface des processeurs de médias."""
+
+    def __init__(self, waveform_points=64, poster_width=480, timeout=120):
+        self.waveform_points = waveform_points
+        self.poster_width = poster_width
+        self.timeout = timeout
+
+    def process(self, path, message_type):
+        raise NotImplementedError
+
+
+class StubMediaProcessor(BaseMediaProcessor):
+    """Processeur sans ffmpeg: durée estimée d'après la taille, forme d'onde et aperçu dérivés des octets."""
+
+    BYTES_PER_SECOND = {'audio': 16 * 1024, 'video': 128 * 1024}
+
+    def process(self, path, message_type):
+        size = os.path.getsize(path)
+        result = {
+            'duration': round(size / self.BYTES_PER_SECOND.get(message_type, 16 * 1024), 3),
+            'waveform': None,
+            'poster': None,
+        }
+        if message_type == 'audio':
+            result['waveform'] = self._waveform(path, size)
+        elif message_type == 'video':
+            with open(path, 'rb') as fh:
+                digest = hashlib.sha256(fh.read(READ_BLOCK)).digest()
+            result['poster'] = (_solid_png(16, 9, digest[:3]), '.png')
+        return result
+
+    def _waveform(self, path, size):
+        # Écart moyen des octets à 128 sur chaque tranche du fichier
+        points = max(min(self.waveform_points, size), 1)
+        bucket = -(-size // points)
+        peaks = []
+        with open(path, 'rb') as fh:
+            while len(peaks) < points:
+                data = fh.read(bucket)
+                if not data:
+                    break
+                peaks.append(round(sum(abs(b - 128) for b in data[::16]) / (128 * len(data[::16])), 3))
+        return peaks
+
+
+class FFmpegMediaProcessor(BaseMediaProcessor):
+    """Processeur basé sur ffprobe/ffmpeg (binaires requis sur le worker)."""
+
+    SAMPLE_RATE = 8000
+
+    def __init__(self, ffmpeg='ffmpeg', ffprobe='ffprobe', **kwargs):
+        super().__init__(**kwargs)
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+
+    def process(self, path, message_type):
+        duration = self._duration(path)
+        result = {'duration': duration, 'waveform': None, 'poster': None}
+        if message_type == 'audio':
+            result['waveform'] = self._waveform(path, duration)
+        elif message_type == 'video':
+            result['poster'] = (self._poster(path, duration), '.jpg')
+        return result
+
+    def _duration(self, path):
+        out = subprocess.run(
+            [self.ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=nw=1:nk=1', path],
+            capture_output=True, check=True, timeout=self.timeout,
+        ).stdout
+        return round(float(out.strip()), 3)
+
+    def _waveform(self, path, duration):
+        # Décodage en PCM 16 bits mono lu en flux: pic absolu par tranche, sans charger tout le signal
+        total = max(int(duration * self.SAMPLE_RATE), 1)
+        per_point = max(-(-total // self.waveform_points), 1)
+        peaks = [0] * self.waveform_points
+        index = 0
+        args = [self.ffmpeg, '-v', 'error', '-i', path, '-ac', '1', '-ar', str(self.SAMPLE_RATE), '-f', 's16le', '-']
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+        # Échéance: ffmpeg bloqué ou trop lent est tué, la lecture ci-dessous reçoit alors EOF
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            proc.kill()
+
+        deadline = threading.Timer(self.timeout, expire)
+        deadline.start()
+        try:
+            pending = b''
+            while True:
+                data = proc.stdout.read(READ_BLOCK)
+                if not data:
+                    break
+                data = pending + data
+                usable = len(data) - len(data) % 2
+                pending = data[usable:]
+                samples = array('h', data[:usable])
+                pos = 0
+                while pos < len(samples):
+                    point = min(index // per_point, self.waveform_points - 1)
+                    take = per_point - index % per_point if point < self.waveform_points - 1 else len(samples) - pos
+                    segment = samples[pos:pos + take]
+                    peaks[point] = max(peaks[point], max(segment), -min(segment))
+                    pos += len(segment)
+                    index += len(segment)
+        finally:
+            deadline.cancel()
+            proc.stdout.close()
+            returncode = proc.wait(timeout=self.timeout)
+        if expired.is_set():
+            raise subprocess.TimeoutExpired(args, self.timeout)
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, self.ffmpeg)
+        return [round(peak / 32768, 3) for peak in peaks]
+
+    def _poster(self, path, duration):
+        return subprocess.run(
+            [
+                self.ffmpeg, '-v', 'error', '-ss', str(min(1.0, duration / 2)), '-i', path,
+                '-frames:v', '1', '-vf', f'scale={self.poster_width}:-2', '-f', 'image2', '-c:v', 'mjpeg', 'pipe:1',
+            ],
+            capture_output=True, check=True, timeout=self.timeout,
+        ).stdout
+
+
+def _solid_png(width, height, rgb):
+    """Image PNG unie minimale (aperçu du processeur de test)."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    rows = b''.join(b'\x00' + bytes(rgb) * width for _ in range(height))
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(rows))
+        + chunk(b'IEND', b'')
+    )
+
+
+def load_processor(dotted_path, options):
+    module_name, class_name = dotted_path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)(**options)
+
+
+def run_processor(dotted_path, options, path, message_type):
+    """Point d'entrée exécuté dans un processus du pool."""
+    return load_processor(dotted_path, options).process(path, message_type)
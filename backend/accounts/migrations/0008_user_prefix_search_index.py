@@ -0,0 +1,36 @@
+# Index de recherche par préfixe pour l'annuaire (`list_users?q=`).
+#
+# PostgreSQL: index GIN trigramme sur UPPER(col), utilisable par les filtres
+# `__istartswith` de Django (UPPER(col::text) LIKE UPPER('q%')).
+# Autres moteurs (SQLite en tests): aucun index spécifique, la recherche reste fonctionnelle.
+
+from django.db import migrations
+
+CREATE_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS accounts_user_prefix_trgm_idx ON accounts_user USING gin ('
+    '(UPPER("first_name"::text)) gin_trgm_ops, '
+    '(UPPER("last_name"::text)) gin_trgm_ops, '
+    '(UPPER("email"::text)) gin_trgm_ops)',
+]
+DROP_SQL = ['DROP INDEX IF EXISTS accounts_user_prefix_trgm_idx']
+
+
+def run_on_postgres(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_conversationsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(CREATE_SQL), run_on_postgres(DROP_SQL)),
+    ]
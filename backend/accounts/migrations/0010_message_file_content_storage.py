@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:33
+
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_mediaupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=accounts.storage.get_message_storage, upload_to='messages/'),
+        ),
+    ]
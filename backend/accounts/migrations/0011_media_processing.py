@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:35
+
+import accounts.storage
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_message_file_content_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='media_status',
+            field=models.CharField(blank=True, choices=[('pending', 'pending'), ('ready', 'ready'), ('failed', 'failed')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='poster',
+            field=models.FileField(blank=True, null=True, storage=accounts.storage.get_message_storage, upload_to='messages/'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='waveform',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='MediaJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='media_job', to='accounts.message')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'available_at'], name='media_job_queue_idx')],
+            },
+        ),
+    ]
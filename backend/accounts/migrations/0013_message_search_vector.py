@@ -0,0 +1,54 @@
+# Recherche plein texte des messages (`accounts.search.PostgresSearchBackend`).
+#
+# PostgreSQL: colonne `search_vector` (tsvector, configuration 'simple') remplie par
+# un trigger à l'insertion et à la modification du contenu, index GIN créé sans
+# bloquer les écritures (CONCURRENTLY, d'où `atomic = False`). La colonne est ajoutée
+# nulle (instantané même sur une grande table): les messages existants sont indexés
+# ensuite par `python manage.py rebuild_search_index`.
+# Autres moteurs (SQLite en tests): rien à créer, `InMemorySearchBackend` est utilisé.
+
+from django.db import migrations
+
+CREATE_SQL = [
+    'ALTER TABLE accounts_message ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    """
+    CREATE OR REPLACE FUNCTION accounts_message_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := to_tsvector('simple'::regconfig, coalesce(NEW.content, ''));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    'DROP TRIGGER IF EXISTS accounts_message_search_vector_trg ON accounts_message',
+    'CREATE TRIGGER accounts_message_search_vector_trg BEFORE INSERT OR UPDATE OF content ON accounts_message '
+    'FOR EACH ROW EXECUTE FUNCTION accounts_message_search_vector_update()',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS accounts_message_search_idx ON accounts_message USING gin (search_vector)',
+]
+DROP_SQL = [
+    'DROP INDEX CONCURRENTLY IF EXISTS accounts_message_search_idx',
+    'DROP TRIGGER IF EXISTS accounts_message_search_vector_trg ON accounts_message',
+    'DROP FUNCTION IF EXISTS accounts_message_search_vector_update()',
+    'ALTER TABLE accounts_message DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run_on_postgres(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0012_user_event_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(CREATE_SQL), run_on_postgres(DROP_SQL)),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_message_search_vector'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversationsummary',
+            name='last_message',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.message'),
+        ),
+        migrations.AlterField(
+            model_name='mediajob',
+            name='message',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='media_job', to='accounts.message'),
+        ),
+        migrations.AlterField(
+            model_name='mediaupload',
+            name='message',
+            field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.message'),
+        ),
+        migrations.CreateModel(
+            name='MessageArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('conversation_key', models.CharField(max_length=41)),
+                ('month', models.DateField()),
+                ('first_created_at', models.DateTimeField()),
+                ('first_id', models.BigIntegerField()),
+                ('last_created_at', models.DateTimeField()),
+                ('last_id', models.BigIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['conversation_key', 'first_created_at', 'first_id'], name='archive_conv_first_idx'), models.Index(fields=['conversation_key', 'last_created_at', 'last_id'], name='archive_conv_last_idx'), models.Index(fields=['month'], name='archive_month_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Clé canonique de conversation des messages antérieurs à la migration 0006.
+#
+# L'historique (`list_messages`) et les accusés groupés filtrent sur `conversation_key`:
+# une ligne restée à NULL y serait invisible. Les lignes sont remplies ici, par tranches
+# d'identifiants en autocommit (`atomic = False`: pas de verrou long sur la table), avant
+# que le code qui filtre sur la clé ne serve des requêtes. Sur une grande table,
+# `python manage.py backfill_conversation_keys` peut être lancé avant le déploiement:
+# cette migration n'a alors plus rien à faire.
+
+from django.db import migrations
+from django.db.models import CharField, Max, Min, Value
+from django.db.models.functions import Cast, Concat, Greatest, Least
+
+CHUNK_SIZE = 5000
+
+
+def backfill_conversation_keys(apps, schema_editor):
+    Message = apps.get_model('accounts', 'Message')
+    pending = Message.objects.using(schema_editor.connection.alias).filter(conversation_key__isnull=True)
+    bounds = pending.aggregate(lo=Min('id'), hi=Max('id'))
+    if bounds['lo'] is None:
+        return
+    key = Concat(
+        Cast(Least('sender_id', 'receiver_id'), CharField()),
+        Value(':'),
+        Cast(Greatest('sender_id', 'receiver_id'), CharField()),
+        output_field=CharField(),
+    )
+    for start in range(bounds['lo'], bounds['hi'] + 1, CHUNK_SIZE):
+        pending.filter(id__gte=start, id__lt=start + CHUNK_SIZE).update(conversation_key=key)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0014_message_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_conversation_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_backfill_conversation_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('file', ''), _negated=True), fields=['file'], name='message_file_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('poster', ''), _negated=True), fields=['poster'], name='message_poster_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Index de recherche plein texte par participant (`accounts.search.PostgresSearchBackend`).
+#
+# PostgreSQL: l'index GIN de la migration 0013 ne porte que sur `search_vector`: un terme
+# fréquent y sélectionne les messages de tous les utilisateurs, filtrés ensuite ligne à ligne.
+# Il est remplacé par deux index GIN composites (extension btree_gin) `(sender_id, search_vector)`
+# et `(receiver_id, search_vector)`, parcourus uniquement pour l'utilisateur qui cherche.
+# Créés sans bloquer les écritures (CONCURRENTLY, d'où `atomic = False`), sauf si la table a
+# déjà été partitionnée (`partition_messages`): CONCURRENTLY n'est pas possible sur la table mère.
+# Autres moteurs (SQLite en tests): rien à créer, `InMemorySearchBackend` est utilisé.
+
+from django.db import migrations
+
+CREATE_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS btree_gin',
+    'CREATE INDEX {concurrently} IF NOT EXISTS accounts_message_sender_search_idx '
+    'ON accounts_message USING gin (sender_id, search_vector)',
+    'CREATE INDEX {concurrently} IF NOT EXISTS accounts_message_receiver_search_idx '
+    'ON accounts_message USING gin (receiver_id, search_vector)',
+    'DROP INDEX {concurrently} IF EXISTS accounts_message_search_idx',
+]
+DROP_SQL = [
+    'CREATE INDEX {concurrently} IF NOT EXISTS accounts_message_search_idx ON accounts_message USING gin (search_vector)',
+    'DROP INDEX {concurrently} IF EXISTS accounts_message_sender_search_idx',
+    'DROP INDEX {concurrently} IF EXISTS accounts_message_receiver_search_idx',
+]
+
+
+def run_on_postgres(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'accounts_message'::regclass")
+            concurrently = '' if cursor.fetchone()[0] == 'p' else 'CONCURRENTLY'
+        for sql in statements:
+            schema_editor.execute(sql.format(concurrently=concurrently))
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0016_message_media_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(CREATE_SQL), run_on_postgres(DROP_SQL)),
+    ]
@@ -0,0 +1,55 @@
+# Participants des médias de messages archivés (`ArchivedMedia`).
+#
+# `serve_media` n'autorisait que les fichiers référencés par une ligne de `accounts_message`:
+# les médias des messages archivés (`accounts.archive`) répondaient 404 alors que l'historique
+# renvoie toujours leur URL. `archive_month` renseigne désormais cette table avant de supprimer
+# les messages; les tranches déjà archivées sont relues ici (JSON Lines zlib) pour la remplir.
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_archived_media(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    MessageArchiveSegment = apps.get_model('accounts', 'MessageArchiveSegment')
+    ArchivedMedia = apps.get_model('accounts', 'ArchivedMedia')
+    batch = []
+    for payload in MessageArchiveSegment.objects.using(alias).values_list('payload', flat=True).iterator(chunk_size=50):
+        for line in zlib.decompress(bytes(payload)).decode().splitlines():
+            row = json.loads(line)
+            for name in (row.get('file'), row.get('poster')):
+                if name:
+                    batch.append(ArchivedMedia(name=name, sender_id=row['sender_id'], receiver_id=row['receiver_id']))
+        if len(batch) >= BATCH_SIZE:
+            ArchivedMedia.objects.using(alias).bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ArchivedMedia.objects.using(alias).bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_message_participant_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('receiver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'sender', 'receiver'), name='archived_media_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_archived_media, migrations.RunPython.noop),
+    ]
@@ -3,10 +3,21 @@
 Ce module définit:
 - `UserManager` et `User`: modèle utilisateur personnalisé (authentification par email)
 - `Message`: stockage des messages (texte, audio, vidéo) et de leurs statuts
+- `ConversationSummary`: résumé dénormalisé par conversation (non lus, dernier message)
+- `MediaUpload`: envoi de média par morceaux en cours (voir `accounts.uploads`)
+- `MediaJob`: file de traitement des médias en arrière-plan (voir `accounts.mediajobs`)
+- `EventStream` / `UserEvent`: journal d'événements par utilisateur (voir `accounts.eventlog`)
+- `MessageArchiveSegment`: messages archivés, compressés par conversation (voir `accounts.archive`)
+- `ArchivedMedia`: participants des médias de messages archivés (autorisation de `serve_media`)
 """
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager, PermissionsMixin
 
+from .storage import get_message_storage
+
 class UserManager(BaseUserManager):
     """Gestionnaire personnalisé pour le modèle `User`.
 
@@ -57,6 +68,9 @@ class Message(models.Model):
 
     Supporte différents types via `message_type` et un fichier associé pour audio/vidéo.
     Des champs de statut simplifiés sont fournis pour suivi (sent/delivered/read).
+    `conversation_key` identifie la paire d'utilisateurs indépendamment du sens
+    (`"<min_id>:<max_id>"`), ce qui permet de lire une conversation par un seul
+    parcours d'index.
     """
     sender = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='received_messages')
@@ -66,7 +80,8 @@ class Message(models.Model):
         ('audio', 'audio'),
         ('video', 'video'),
     ), default='text')
-    file = models.FileField(upload_to='messages/', null=True, blank=True)  # Fichier media associé
+    # Fichier media associé, stocké par empreinte de contenu (dédupliqué, voir `accounts.storage`)
+    file = models.FileField(upload_to='messages/', storage=get_message_storage, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
     status = models.CharField(max_length=16, choices=(
@@ -76,11 +91,203 @@ class Message(models.Model):
     ), default='sent')
     delivered_at = models.DateTimeField(null=True, blank=True)
     read_at = models.DateTimeField(null=True, blank=True)
+    # Horodatage de dernière modification (création ou changement de statut), utilisé pour la synchro delta
+    updated_at = models.DateTimeField(auto_now=True)
+    # Clé canonique de la conversation (remplie à la création; lignes antérieures: migration 0015)
+    conversation_key = models.CharField(max_length=41, null=True, blank=True)
+    # Métadonnées dérivées des médias, produites en arrière-plan (voir `accounts.mediajobs`)
+    media_status = models.CharField(max_length=10, choices=(
+        ('pending', 'pending'),
+        ('ready', 'ready'),
+        ('failed', 'failed'),
+    ), null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)  # En secondes
+    waveform = models.JSONField(null=True, blank=True)  # Pics normalisés (0..1), audio uniquement
+    poster = models.FileField(upload_to='messages/', storage=get_message_storage, null=True, blank=True)  # Vidéo uniquement
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation_key', 'created_at', 'id'], name='message_conv_created_idx'),
+            models.Index(fields=['conversation_key', 'updated_at', 'id'], name='message_conv_updated_idx'),
+            models.Index(fields=['receiver', 'status'], name='message_receiver_status_idx'),
+            # Contrôle d'accès aux médias (`serve_media`): message(s) portant un fichier donné
+            models.Index(fields=['file'], name='message_file_idx', condition=~models.Q(file='')),
+            models.Index(fields=['poster'], name='message_poster_idx', condition=~models.Q(poster='')),
+        ]
+
+    @staticmethod
+    def conversation_key_for(user_a_id, user_b_id):
+        """Retourne la clé canonique de la conversation entre deux utilisateurs."""
+        low, high = sorted((int(user_a_id), int(user_b_id)))
+        return f"{low}:{high}"
+
+    def save(self, *args, **kwargs):
+        if not self.conversation_key and self.sender_id and self.receiver_id:
+            self.conversation_key = self.conversation_key_for(self.sender_id, self.receiver_id)
+        if self._state.adding and self.message_type != 'text' and self.file and not self.media_status:
+            self.media_status = 'pending'
+        super().save(*args, **kwargs)
 
     def __str__(self):
         preview = self.content[:20] if self.content else self.message_type
         return f"{self.sender_id} -> {self.receiver_id}: {preview}"
 
+
+
+class ConversationSummary(models.Model):
+    """Résumé d'une conversation vu par `user`: nombre de non lus et aperçu du dernier message.
+
+    Maintenu incrémentalement (voir `accounts.summaries`) à la création des messages
+    et aux accusés de lecture; jamais recalculé par `COUNT(*)` à la lecture.
+    """
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='conversation_summaries')
+    peer = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='+')
+    unread_count = models.PositiveIntegerField(default=0)
+    # Sans contrainte en base: `accounts_message` peut être partitionnée (voir `accounts.partitions`)
+    last_message = models.ForeignKey('accounts.Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False)
+    last_message_preview = models.CharField(max_length=100, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'peer'], name='conversation_summary_unique_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-last_message_at', '-id'], name='conv_summary_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} <-> {self.peer_id} ({self.unread_count} non lus)"
+
+
+class MediaUpload(models.Model):
+    """Envoi de fichier média par morceaux (init / ajout de morceaux / finalisation).
+
+    Les octets reçus sont écrits au fil de l'eau dans un fichier partiel; le `Message`
+    n'est créé qu'à la finalisation, une fois `received_size == size`.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    sender = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='media_uploads')
+    receiver = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='+')
+    message_type = models.CharField(max_length=10, choices=(
+        ('audio', 'audio'),
+        ('video', 'video'),
+    ))
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField()
+    received_size = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    message = models.OneToOneField('accounts.Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_size}/{self.size})"
+
+
+class MediaJob(models.Model):
+    """Tâche de traitement d'un média (poster, forme d'onde, durée), consommée par `process_media`.
+
+    Les tâches `running` dont le verrou a expiré (worker arrêté) sont reprises;
+    un échec est retenté avec un délai croissant jusqu'à `MAX_ATTEMPTS`.
+    """
+    message = models.OneToOneField('accounts.Message', on_delete=models.CASCADE, related_name='media_job', db_constraint=False)
+    status = models.CharField(max_length=10, choices=(
+        ('pending', 'pending'),
+        ('running', 'running'),
+        ('done', 'done'),
+        ('failed', 'failed'),
+    ), default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='media_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"job {self.id} (message {self.message_id}, {self.status})"
+
+
+class EventStream(models.Model):
+    """Compteur de séquence du journal d'événements d'un utilisateur.
+
+    `last_seq` est incrémenté sous verrou de ligne à chaque ajout, ce qui garantit des
+    numéros croissants dans l'ordre de validation; `trimmed_seq` est le plus grand
+    `seq` purgé (un client dont le curseur est antérieur doit recharger l'historique).
+    """
+    user = models.OneToOneField('accounts.User', on_delete=models.CASCADE, primary_key=True, related_name='event_stream')
+    last_seq = models.BigIntegerField(default=0)
+    trimmed_seq = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"stream {self.user_id} ({self.trimmed_seq}..{self.last_seq})"
+
+
+class UserEvent(models.Model):
+    """Événement de chat journalisé pour un utilisateur (`seq` croissant par utilisateur)."""
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='+')
+    seq = models.BigIntegerField()
+    event = models.CharField(max_length=32)
+    data = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'seq'], name='user_event_seq_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}#{self.seq} {self.event}"
+
+
+class MessageArchiveSegment(models.Model):
+    """Tranche de messages archivés d'une conversation (stockage froid, voir `accounts.archive`).
+
+    `payload` contient les lignes des messages en JSON Lines compressé (zlib), dans
+    l'ordre `(created_at, id)`; les bornes permettent à l'historique paginé de ne
+    décompresser que les tranches utiles.
+    """
+    conversation_key = models.CharField(max_length=41)
+    month = models.DateField()  # Premier jour du mois archivé
+    first_created_at = models.DateTimeField()
+    first_id = models.BigIntegerField()
+    last_created_at = models.DateTimeField()
+    last_id = models.BigIntegerField()
+    count = models.PositiveIntegerField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation_key', 'first_created_at', 'first_id'], name='archive_conv_first_idx'),
+            models.Index(fields=['conversation_key', 'last_created_at', 'last_id'], name='archive_conv_last_idx'),
+            models.Index(fields=['month'], name='archive_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.conversation_key} {self.month:%Y-%m} ({self.count} messages)"
+
+
+class ArchivedMedia(models.Model):
+    """Fichier (ou poster) d'un message archivé et ses participants.
+
+    Renseigné par `accounts.archive.archive_month` avant la suppression des messages:
+    `serve_media` continue d'autoriser l'émetteur et le destinataire une fois le
+    message sorti de `accounts_message` (les fichiers restent dans le stockage).
+    """
+    name = models.CharField(max_length=255)
+    sender = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='+')
+    receiver = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'sender', 'receiver'], name='archived_media_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.sender_id} -> {self.receiver_id})"
@@ -0,0 +1,78 @@
+"""Pagination par curseur (keyset) pour l'historique des messages.
+
+Un curseur encode un couple `(horodatage, id)` sous forme opaque. Les requêtes
+filtrent sur ce couple plutôt qu'avec OFFSET, ce qui garde un coût constant
+quelle que soit la longueur de la conversation. Les résultats classés (recherche)
+utilisent de même un couple `(score, id)`.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Le jeton de synchro delta (`since`) ne dépasse jamais `now - SYNC_SAFETY_WINDOW`: `updated_at`
+# est fixé avant le commit, une ligne validée après une autre plus récemment horodatée doit être relue
+SYNC_SAFETY_WINDOW = timedelta(seconds=5)
+
+
+def encode_cursor(moment, pk):
+    """Encode `(moment, pk)` en chaîne `<microsecondes epoch>_<id>`."""
+    micros = (moment - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}_{pk}"
+
+
+def decode_cursor(value):
+    """Décode un curseur produit par `encode_cursor`.
+
+    Lève `ValueError` si la valeur est mal formée.
+    """
+    micros, _, pk = str(value).partition('_')
+    moment = EPOCH + timedelta(microseconds=int(micros))
+    return moment, int(pk)
+
+
+def sync_position(position, horizon, floor=None):
+    """Position `(updated_at, id)` retenue pour le jeton de synchro: bornée à `horizon`, jamais avant `floor`."""
+    if position[0] <= horizon:
+        return position
+    return max(floor, (horizon, 0)) if floor else (horizon, 0)
+
+
+def parse_limit(value):
+    """Borne la taille de page demandée à `[1, MAX_PAGE_SIZE]`."""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def keyset_before(field, cursor):
+    """Filtre `Q` des lignes strictement antérieures au curseur sur `(field, id)`."""
+    moment, pk = cursor
+    return Q(**{f'{field}__lt': moment}) | Q(**{field: moment, 'id__lt': pk})
+
+
+def keyset_after(field, cursor):
+    """Filtre `Q` des lignes strictement postérieures au curseur sur `(field, id)`."""
+    moment, pk = cursor
+    return Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk})
+
+
+def encode_rank_cursor(rank, pk, max_id):
+    """Encode `(score, pk)` d'un résultat classé (recherche) et la borne `max_id` de la première page
+    en chaîne `<score>_<id>_<max_id>`."""
+    return f"{float(rank)!r}_{pk}_{max_id}"
+
+
+def decode_rank_cursor(value):
+    """Décode un curseur produit par `encode_rank_cursor` en `((score, pk), max_id)`.
+
+    Lève `ValueError` si la valeur est mal formée.
+    """
+    rank, pk, max_id = str(value).split('_')
+    rank = float(rank)
+    if not math.isfinite(rank):
+        raise ValueError(value)
+    return (rank, int(pk)), int(max_id)
@@ -0,0 +1,199 @@
+"""Partitionnement mensuel de `accounts_message` (PostgreSQL, partitions déclaratives).
+
+La table est partitionnée par intervalle sur `created_at`, une partition par mois
+(`accounts_message_pYYYYMM`): index et VACUUM ne portent que sur des partitions de
+taille bornée, les requêtes de l'historique (tri `created_at` décroissant + LIMIT)
+s'arrêtent aux partitions récentes, et l'archivage d'un mois (`accounts.archive`)
+supprime sa partition d'un bloc au lieu d'effacer des millions de lignes.
+
+- `convert_to_partitioned`: conversion unique de la table existante; ses lignes
+  restent dans la partition `accounts_message_legacy` (jusqu'au mois courant inclus),
+  rattachée sans copie grâce à une contrainte CHECK validée au préalable
+- `ensure_partitions`: crée les partitions du mois courant et des mois suivants
+  (commande `partition_messages`, à planifier: une insertion hors partition échoue)
+- `drop_month_partition`: détache et supprime la partition d'un mois archivé
+
+Sans effet sur les autres moteurs (SQLite en tests): l'archivage supprime alors les lignes.
+La clé primaire d'une table partitionnée doit inclure `created_at`: les clés étrangères
+vers `Message` sont donc déclarées sans contrainte en base (`db_constraint=False`).
+"""
+from datetime import datetime, timezone
+
+from django.db import connection, transaction
+
+from .models import Message
+
+TABLE = Message._meta.db_table
+LEGACY_PARTITION = f'{TABLE}_legacy'
+ID_SEQUENCE = f'{TABLE}_id_seq'
+SEARCH_TRIGGER = 'accounts_message_search_vector_trg'
+
+
+def month_start(moment):
+    """Premier instant (UTC) du mois de `moment`."""
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(moment, months):
+    """Premier instant du mois situé `months` mois après celui de `moment`."""
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    """`True` si `accounts_message` est déjà une table partitionnée."""
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def month_partitions():
+    """Partitions mensuelles existantes: `{premier instant du mois: nom}`."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)',
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f'{TABLE}_p'
+    return {
+        datetime(int(name[-6:-2]), int(name[-2:]), 1, tzinfo=timezone.utc): name
+        for name in names if name.startswith(prefix) and name[len(prefix):].isdigit()
+    }
+
+
+def ensure_partitions(now, ahead):
+    """Crée les partitions manquantes du mois de `now` aux `ahead` mois suivants. Retourne leurs noms."""
+    existing = month_partitions()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_get_expr(relpartbound, oid) FROM pg_class WHERE oid = to_regclass(%s)', [LEGACY_PARTITION],
+        )
+        row = cursor.fetchone()
+    # Les mois couverts par la partition héritée ne peuvent pas avoir leur propre partition
+    legacy_end = _legacy_upper_bound(row[0]) if row else None
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(month_start(now), offset)
+        if month in existing or (legacy_end and month < legacy_end):
+            continue
+        name = partition_name(month)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)],
+            )
+        created.append(name)
+    return created
+
+
+def _legacy_upper_bound(bound):
+    # "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00+00')"
+    upper = bound.rsplit('TO (', 1)[-1].strip(")' ")
+    return datetime.fromisoformat(upper).astimezone(timezone.utc)
+
+
+def convert_to_partitioned(now, ahead):
+    """Convertit `accounts_message` en table partitionnée par mois (opération unique, relançable).
+
+    Étapes sans verrou bloquant d'abord (index unique `(id, created_at)` créé en
+    CONCURRENTLY, contrainte CHECK validée en ligne), puis, dans une transaction
+    courte sous verrou exclusif: renommage de la table en partition héritée, création
+    de la table mère (index, clés étrangères et trigger de recherche recréés sur la
+    mère et rattachés aux objets existants de la partition), rattachement, partitions à venir.
+    Une exécution interrompue avant la transaction peut être relancée; sur une table déjà
+    partitionnée, seules les partitions manquantes sont créées.
+    """
+    if is_partitioned():
+        return ensure_partitions(now, ahead)
+    boundary = add_months(month_start(now), 1)
+    with connection.cursor() as cursor:
+        # Reprise après une exécution interrompue: index CONCURRENTLY resté invalide (IF NOT EXISTS
+        # le conserverait) et contrainte CHECK d'une borne antérieure, recréés
+        cursor.execute(
+            'SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(%s) AND NOT indisvalid', [f'{TABLE}_id_created_uniq'],
+        )
+        if cursor.fetchone():
+            cursor.execute(f'DROP INDEX CONCURRENTLY {TABLE}_id_created_uniq')
+        cursor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {TABLE}_id_created_uniq ON {TABLE} (id, created_at)')
+        cursor.execute(f'ALTER TABLE {TABLE} DROP CONSTRAINT IF EXISTS {TABLE}_legacy_range')
+        cursor.execute(
+            f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_legacy_range CHECK (created_at < %s) NOT VALID', [boundary],
+        )
+        cursor.execute(f'ALTER TABLE {TABLE} VALIDATE CONSTRAINT {TABLE}_legacy_range')
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s '
+            'AND indexname NOT IN (%s, %s)',
+            [TABLE, f'{TABLE}_pkey', f'{TABLE}_id_created_uniq'],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute('SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(%s) AND tgname = %s', [TABLE, SEARCH_TRIGGER])
+        has_search_trigger = cursor.fetchone() is not None
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {TABLE}')
+        max_id = cursor.fetchone()[0]
+
+        # La table existante devient la partition héritée; ses index gardent leur définition sous un autre nom
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {LEGACY_PARTITION}')
+        cursor.execute(f'ALTER TABLE {LEGACY_PARTITION} RENAME CONSTRAINT {TABLE}_pkey TO {LEGACY_PARTITION}_pkey')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX {name} RENAME TO {f"legacy_{name}"[:63]}')
+        if has_search_trigger:
+            cursor.execute(f'DROP TRIGGER {SEARCH_TRIGGER} ON {LEGACY_PARTITION}')
+
+        # Identifiants: séquence autonome rattachée à la table mère (identity/serial retirés de la partition)
+        cursor.execute(f'ALTER TABLE {LEGACY_PARTITION} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        cursor.execute(f'ALTER TABLE {LEGACY_PARTITION} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {ID_SEQUENCE} AS bigint')
+        cursor.execute('SELECT setval(%s, %s, %s)', [ID_SEQUENCE, max(max_id, 1), max_id > 0])
+
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {LEGACY_PARTITION} INCLUDING DEFAULTS INCLUDING STORAGE) PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{ID_SEQUENCE}')")
+        cursor.execute(f'ALTER SEQUENCE {ID_SEQUENCE} OWNED BY {TABLE}.id')
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, created_at)')
+        cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_PARTITION} FOR VALUES FROM (MINVALUE) TO (%s)', [boundary])
+
+        # Définitions capturées avant le renommage: elles visent déjà la table mère
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+        if has_search_trigger:
+            cursor.execute(
+                f'CREATE TRIGGER {SEARCH_TRIGGER} BEFORE INSERT OR UPDATE OF content ON {TABLE} '
+                'FOR EACH ROW EXECUTE FUNCTION accounts_message_search_vector_update()'
+            )
+        return ensure_partitions(boundary, ahead - 1) if ahead > 0 else []
+
+
+def drop_month_partition(month):
+    """Détache et supprime la partition du mois `month`. Retourne `False` si elle n'existe pas."""
+    name = month_partitions().get(month)
+    if name is None:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+        cursor.execute(f'DROP TABLE {name}')
+    return True
@@ -0,0 +1,264 @@
+"""Registre de présence partagé entre les workers ASGI.
+
+Chaque connexion WebSocket est comptée individuellement (multi-onglets) avec
+une date d'expiration rafraîchie par heartbeat: une connexion dont le worker
+a planté disparaît d'elle-même au bout de `ttl` secondes.
+
+Backends disponibles (réglage `PRESENCE['BACKEND']`):
+- `RedisPresenceBackend`: partagé par tous les workers (production)
+- `InMemoryPresenceBackend`: local au processus (tests, dev sans Redis)
+
+`PresenceAggregator` regroupe les transitions sur une courte fenêtre
+(`PRESENCE['BATCH_WINDOW']`) avant diffusion, et ignore les allers-retours
+en ligne -> hors ligne -> en ligne survenus dans la fenêtre.
+"""
+import asyncio
+import time
+from functools import lru_cache
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_TTL = 60
+DEFAULT_BATCH_WINDOW = 0.25
+
+
+def presence_group(user_id):
+    """Nom du groupe channels des abonnés à la présence de `user_id`."""
+    return f"presence_{user_id}"
+
+
+class BasePresenceBackend:
+    """Interface commune des registres de présence.
+
+    `connect` et `disconnect` renvoient `True` lorsque l'utilisateur change
+    réellement d'état (première connexion / dernière déconnexion).
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, **options):
+        self.ttl = ttl
+
+    @property
+    def heartbeat_interval(self):
+        """Période de rafraîchissement conseillée pour une connexion."""
+        return max(1, self.ttl // 3)
+
+    async def connect(self, user_id, channel_name):
+        raise NotImplementedError
+
+    async def heartbeat(self, user_id, channel_name):
+        raise NotImplementedError
+
+    async def disconnect(self, user_id, channel_name):
+        raise NotImplementedError
+
+    async def is_online(self, user_id):
+        raise NotImplementedError
+
+    async def online_user_ids(self):
+        raise NotImplementedError
+
+    async def online_among(self, user_ids):
+        """Sous-ensemble de `user_ids` actuellement en ligne."""
+        return [uid for uid in user_ids if await self.is_online(uid)]
+
+    def online_among_sync(self, user_ids):
+        """Version synchrone de `online_among` (vues REST, hors boucle asyncio)."""
+        raise NotImplementedError
+
+
+class InMemoryPresenceBackend(BasePresenceBackend):
+    """Registre local au processus, sans dépendance externe."""
+
+    def __init__(self, ttl=DEFAULT_TTL, **options):
+        super().__init__(ttl=ttl, **options)
+        self._connections = {}
+
+    def _alive(self, user_id, now=None):
+        now = now if now is not None else time.time()
+        conns = self._connections.get(user_id)
+        if not conns:
+            return {}
+        for channel, expires in list(conns.items()):
+            if expires <= now:
+                del conns[channel]
+        if not conns:
+            self._connections.pop(user_id, None)
+        return conns
+
+    async def connect(self, user_id, channel_name):
+        was_online = bool(self._alive(user_id))
+        self._connections.setdefault(user_id, {})[channel_name] = time.time() + self.ttl
+        return not was_online
+
+    async def heartbeat(self, user_id, channel_name):
+        self._connections.setdefault(user_id, {})[channel_name] = time.time() + self.ttl
+
+    async def disconnect(self, user_id, channel_name):
+        conns = self._connections.get(user_id, {})
+        removed = conns.pop(channel_name, None) is not None
+        return removed and not self._alive(user_id)
+
+    async def is_online(self, user_id):
+        return bool(self._alive(user_id))
+
+    async def online_user_ids(self):
+        now = time.time()
+        return [uid for uid in list(self._connections) if self._alive(uid, now)]
+
+    def online_among_sync(self, user_ids):
+        now = time.time()
+        return [uid for uid in user_ids if self._alive(uid, now)]
+
+
+class RedisPresenceBackend(BasePresenceBackend):
+    """Registre partagé dans Redis.
+
+    Structures:
+    - `<prefix>:conn:<user_id>`: ZSET channel_name -> expiration (epoch)
+    - `<prefix>:users`: ZSET user_id -> expiration la plus lointaine
+
+    La déconnexion est un script Lua (atomique côté Redis): l'utilisateur ne quitte
+    `<prefix>:users` que s'il n'a plus aucune connexion vivante, même si une autre
+    connexion s'ouvre au même moment sur un autre worker.
+    """
+
+    # KEYS: ZSET des connexions, ZSET des utilisateurs; ARGV: channel_name, maintenant, user_id
+    DISCONNECT_SCRIPT = """
+        local removed = redis.call('ZREM', KEYS[1], ARGV[1])
+        redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+        if redis.call('ZCARD', KEYS[1]) > 0 then
+            return 0
+        end
+        redis.call('ZREM', KEYS[2], ARGV[3])
+        return removed
+    """
+
+    def __init__(self, url='redis://127.0.0.1:6379/0', ttl=DEFAULT_TTL, prefix='presence', **options):
+        super().__init__(ttl=ttl, **options)
+        import redis
+        import redis.asyncio as aioredis
+        self.redis = aioredis.from_url(url)
+        # Client synchrone pour les vues REST: le client asyncio est lié à la boucle qui l'utilise
+        self.sync_redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._disconnect = self.redis.register_script(self.DISCONNECT_SCRIPT)
+
+    def _conn_key(self, user_id):
+        return f"{self.prefix}:conn:{user_id}"
+
+    @property
+    def _users_key(self):
+        return f"{self.prefix}:users"
+
+    async def _touch(self, user_id, channel_name):
+        now = time.time()
+        expires = now + self.ttl
+        key = self._conn_key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, '-inf', now)
+            pipe.zcard(key)
+            pipe.zadd(key, {channel_name: expires})
+            pipe.expire(key, self.ttl)
+            pipe.zadd(self._users_key, {str(user_id): expires}, gt=True)
+            results = await pipe.execute()
+        return results[1]
+
+    async def connect(self, user_id, channel_name):
+        previous = await self._touch(user_id, channel_name)
+        return previous == 0
+
+    async def heartbeat(self, user_id, channel_name):
+        await self._touch(user_id, channel_name)
+
+    async def disconnect(self, user_id, channel_name):
+        removed = await self._disconnect(
+            keys=[self._conn_key(user_id), self._users_key], args=[channel_name, time.time(), str(user_id)],
+        )
+        return bool(removed)
+
+    async def is_online(self, user_id):
+        return await self.redis.zcount(self._conn_key(user_id), time.time(), '+inf') > 0
+
+    @staticmethod
+    def _online(user_ids, scores):
+        now = time.time()
+        return [uid for uid, score in zip(user_ids, scores) if score is not None and score > now]
+
+    async def online_among(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        return self._online(user_ids, await self.redis.zmscore(self._users_key, [str(uid) for uid in user_ids]))
+
+    def online_among_sync(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        return self._online(user_ids, self.sync_redis.zmscore(self._users_key, [str(uid) for uid in user_ids]))
+
+    async def online_user_ids(self):
+        now = time.time()
+        await self.redis.zremrangebyscore(self._users_key, '-inf', now)
+        return [int(uid) for uid in await self.redis.zrangebyscore(self._users_key, now, '+inf')]
+
+
+@lru_cache(maxsize=None)
+def get_presence_backend():
+    """Instancie (une fois par processus) le backend configuré dans `settings.PRESENCE`."""
+    config = getattr(settings, 'PRESENCE', {})
+    backend_cls = import_string(config.get('BACKEND', 'accounts.presence.InMemoryPresenceBackend'))
+    return backend_cls(**config.get('OPTIONS', {}))
+
+
+class PresenceAggregator:
+    """Coalesce les transitions de présence d'un processus avant diffusion.
+
+    Pour chaque utilisateur, seul l'état net à la fin de la fenêtre est envoyé
+    (événement `presence.batch` au groupe `presence_<user_id>`); un utilisateur
+    revenu à son état initial n'émet rien.
+    """
+
+    def __init__(self, window=DEFAULT_BATCH_WINDOW, channel_layer=None):
+        self.window = window
+        self.channel_layer = channel_layer
+        self._pending = {}
+        self._flush_task = None
+
+    async def record(self, user_id, online, last_seen=None):
+        """Enregistre une transition; elle sera diffusée au prochain flush."""
+        entry = self._pending.get(user_id)
+        if entry is None:
+            self._pending[user_id] = {'initial': not online, 'online': online, 'last_seen': last_seen}
+        else:
+            entry.update(online=online, last_seen=last_seen)
+        if self.window <= 0:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def flush(self):
+        """Diffuse les deltas nets accumulés depuis le dernier flush."""
+        pending, self._pending = self._pending, {}
+        layer = self.channel_layer or get_channel_layer()
+        for user_id, entry in pending.items():
+            if entry['online'] == entry['initial']:
+                continue
+            update = {'user_id': user_id, 'online': entry['online'], 'last_seen': entry['last_seen']}
+            await layer.group_send(presence_group(user_id), {'type': 'presence.batch', 'updates': [update]})
+
+
+def get_batch_window():
+    """Fenêtre de regroupement (secondes) des événements de présence."""
+    return getattr(settings, 'PRESENCE', {}).get('BATCH_WINDOW', DEFAULT_BATCH_WINDOW)
+
+
+@lru_cache(maxsize=None)
+def get_presence_aggregator():
+    """Agrégateur de présence du processus courant."""
+    return PresenceAggregator(window=get_batch_window())
@@ -0,0 +1,95 @@
+"""Accusés groupés (lecture et remise).
+
+`mark_read_up_to` marque en une seule requête UPDATE (sous verrou de ligne) tous les messages non lus
+reçus d'un interlocuteur jusqu'à un identifiant donné. Utilisé par la commande
+WebSocket `read_up_to` et par l'endpoint REST `messages/read/`.
+
+`mark_delivered_on_connect` marque en une seule requête UPDATE (sous verrou de ligne)
+tous les messages reçus hors ligne (`sent`) comme remis, à la connexion du destinataire.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Message
+from .summaries import record_read
+
+
+def mark_read_up_to(reader_id, peer_id, up_to_id):
+    """Marque comme lus les messages de `peer_id` vers `reader_id` dont l'id est <= `up_to_id`.
+
+    Retourne les données de l'événement `messages_read`
+    (`{from, to, first_id, up_to_id, count, read_at, status}`), ou `None` si rien n'était à marquer.
+    Les lignes sont verrouillées avant l'UPDATE et le résumé décrémenté dans la même transaction:
+    une lecture concurrente (autre socket, flush de `accounts.writebehind`) ne les recompte pas.
+    """
+    with transaction.atomic():
+        ids = list(
+            Message.objects.select_for_update()
+            .filter(
+                conversation_key=Message.conversation_key_for(reader_id, peer_id),
+                sender_id=peer_id,
+                receiver_id=reader_id,
+                read_at__isnull=True,
+                id__lte=up_to_id,
+            )
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        if not ids:
+            return None
+        now = timezone.now()
+        count = Message.objects.filter(id__in=ids, read_at__isnull=True).update(
+            read_at=now, status='read', is_read=True, updated_at=now,
+        )
+        if not count:
+            return None
+        record_read(reader_id, peer_id, count)
+    return {
+        'from': int(peer_id),
+        'to': int(reader_id),
+        'first_id': ids[0],
+        'up_to_id': ids[-1],
+        'count': count,
+        'read_at': now.isoformat(),
+        'status': 'read',
+    }
+
+
+def mark_delivered_on_connect(receiver_id):
+    """Marque comme remis tous les messages `sent` destinés à `receiver_id`.
+
+    Retourne une liste d'événements `messages_delivered`, un par émetteur
+    (`{from, to, first_id, up_to_id, count, delivered_at, status}`).
+    Les bornes et comptes sont calculés sur les lignes verrouillées puis mises à jour dans la
+    même transaction: une remise concurrente (autre connexion) attend le verrou et ne les revoit pas.
+    """
+    with transaction.atomic():
+        rows = list(
+            Message.objects.select_for_update()
+            .filter(receiver_id=receiver_id, status='sent')
+            .order_by('id')
+            .values_list('id', 'sender_id')
+        )
+        if not rows:
+            return []
+        now = timezone.now()
+        Message.objects.filter(id__in=[message_id for message_id, _ in rows]).update(
+            status='delivered', delivered_at=now, updated_at=now,
+        )
+    per_sender = {}
+    for message_id, sender_id in rows:
+        bounds = per_sender.setdefault(sender_id, {'first_id': message_id, 'last_id': message_id, 'total': 0})
+        bounds['last_id'] = message_id
+        bounds['total'] += 1
+    return [
+        {
+            'from': sender_id,
+            'to': int(receiver_id),
+            'first_id': bounds['first_id'],
+            'up_to_id': bounds['last_id'],
+            'count': bounds['total'],
+            'delivered_at': now.isoformat(),
+            'status': 'delivered',
+        }
+        for sender_id, bounds in per_sender.items()
+    ]
@@ -0,0 +1,98 @@
+"""Liste de révocation des JWT, consultée sans requête en base.
+
+Révoquer un utilisateur enregistre l'instant de révocation: tout jeton dont
+`iat` est antérieur ou égal est refusé, à la seconde près (`iat` est en secondes
+entières: un jeton émis dans la seconde de la révocation est refusé aussi). Les vérifications passent par un
+cache LRU local (`local_ttl` secondes), ce qui borne le délai de prise en
+compte d'une révocation émise par un autre processus.
+
+Backends disponibles (réglage `AUTH_REVOCATION['BACKEND']`):
+- `RedisRevocationBackend`: partagé par tous les workers (production)
+- `InMemoryRevocationBackend`: local au processus (tests, dev sans Redis)
+"""
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .caching import MISSING, TTLCache
+
+DEFAULT_LOCAL_TTL = 30
+# Durée de conservation d'une révocation: au-delà, les jetons concernés ont expiré
+DEFAULT_RETENTION = 60 * 60
+
+
+class BaseRevocationBackend:
+    """Interface commune des listes de révocation."""
+
+    def __init__(self, local_ttl=DEFAULT_LOCAL_TTL, local_maxsize=50_000, retention=DEFAULT_RETENTION, **options):
+        self.local = TTLCache(maxsize=local_maxsize, ttl=local_ttl)
+        self.retention = retention
+
+    def revoke_user(self, user_id):
+        """Révoque (synchrone) tous les jetons émis jusqu'à maintenant pour `user_id`."""
+        self.local.delete(user_id)
+        self._store(user_id, time.time())
+
+    async def is_revoked(self, payload):
+        """Indique si le jeton décodé `payload` a été révoqué."""
+        user_id = payload.get('user_id')
+        revoked_at = self.local.get(user_id)
+        if revoked_at is MISSING:
+            revoked_at = await self._fetch(user_id)
+            self.local.set(user_id, revoked_at)
+        return revoked_at is not None and int(revoked_at) >= int(payload.get('iat', 0))
+
+    def _store(self, user_id, revoked_at):
+        raise NotImplementedError
+
+    async def _fetch(self, user_id):
+        raise NotImplementedError
+
+
+class InMemoryRevocationBackend(BaseRevocationBackend):
+    """Liste de révocation locale au processus."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._revoked = {}
+
+    def _store(self, user_id, revoked_at):
+        self._revoked[user_id] = revoked_at
+
+    async def _fetch(self, user_id):
+        revoked_at = self._revoked.get(user_id)
+        if revoked_at is not None and revoked_at + self.retention < time.time():
+            return None
+        return revoked_at
+
+
+class RedisRevocationBackend(BaseRevocationBackend):
+    """Liste de révocation partagée dans Redis (`<prefix>:<user_id>` -> epoch, avec TTL)."""
+
+    def __init__(self, url='redis://127.0.0.1:6379/0', prefix='revoked', **options):
+        super().__init__(**options)
+        import redis
+        import redis.asyncio as aioredis
+        self.redis = redis.Redis.from_url(url)
+        self.aredis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, user_id):
+        return f"{self.prefix}:{user_id}"
+
+    def _store(self, user_id, revoked_at):
+        self.redis.set(self._key(user_id), revoked_at, ex=self.retention)
+
+    async def _fetch(self, user_id):
+        value = await self.aredis.get(self._key(user_id))
+        return float(value) if value is not None else None
+
+
+@lru_cache(maxsize=None)
+def get_revocation_backend():
+    """Instancie (une fois par processus) le backend configuré dans `settings.AUTH_REVOCATION`."""
+    config = getattr(settings, 'AUTH_REVOCATION', {})
+    backend_cls = import_string(config.get('BACKEND', 'accounts.revocation.InMemoryRevocationBackend'))
+    return backend_cls(**config.get('OPTIONS', {}))
@@ -0,0 +1,284 @@
+"""Recherche plein texte dans les messages d'un utilisateur.
+
+Les résultats sont classés par pertinence puis par identifiant décroissant,
+paginés par curseur `(score, id)` et surlignés (`highlight`: extrait du message,
+échappé HTML, termes trouvés entre `<mark>` et `</mark>`). Seuls les messages
+dont l'utilisateur est émetteur ou destinataire sont cherchés (option: une seule
+conversation).
+
+Backends disponibles (réglage `MESSAGE_SEARCH['BACKEND']`):
+- `PostgresSearchBackend`: colonne `tsvector` de `accounts_message` tenue à jour par
+  un trigger à chaque insertion (y compris `bulk_create`, migration 0013) et index GIN
+  composites `(sender_id, search_vector)` / `(receiver_id, search_vector)` (btree_gin, migration 0017);
+  les lignes antérieures sont indexées par la commande `rebuild_search_index`
+- `InMemorySearchBackend`: index inversé en Python, local au processus, construit
+  depuis la base à la première recherche puis maintenu à chaque nouveau message (tests, SQLite)
+
+Le classement porte sur les `max_candidates` correspondances les plus récentes:
+le coût d'une recherche reste borné quel que soit le volume de l'historique.
+Les pages suivantes reprennent la borne `max_id` de la première (dans le curseur):
+les messages arrivés entre-temps ne décalent pas cette fenêtre, aucun résultat n'est
+répété ni sauté d'une page à l'autre.
+"""
+import html
+import math
+import re
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Message
+
+DEFAULT_MAX_CANDIDATES = 10_000
+# Configuration de recherche PostgreSQL utilisée par le trigger (migration 0013): sans racinisation
+# ni mots vides, les conversations mélangeant plusieurs langues
+SEARCH_CONFIG = 'simple'
+HIGHLIGHT_WORDS = 20
+HIGHLIGHT_OPTIONS = f'StartSel=<mark>, StopSel=</mark>, MaxWords={HIGHLIGHT_WORDS}, MinWords=5, MaxFragments=2'
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Termes normalisés (minuscules) d'un texte."""
+    return WORD_RE.findall((text or '').lower())
+
+
+def _hit(message_id, sender_id, receiver_id, created_at, rank, highlight):
+    return {
+        'id': message_id,
+        'from': sender_id,
+        'to': receiver_id,
+        'created_at': created_at,
+        'rank': rank,
+        'highlight': highlight,
+    }
+
+
+class BaseSearchBackend:
+    """Interface commune des index de recherche de messages."""
+
+    def __init__(self, max_candidates=DEFAULT_MAX_CANDIDATES, **options):
+        self.max_candidates = max_candidates
+
+    def index_messages(self, messages):
+        """Indexe de nouveaux messages (signal `post_save` ou envoi groupé)."""
+
+    def search(self, user_id, query, limit, cursor=None, peer_id=None, max_id=None):
+        """Retourne au plus `limit` résultats `{id, from, to, created_at, rank, highlight}`.
+
+        `cursor` est le couple `(rank, id)` du dernier résultat de la page précédente;
+        `peer_id` restreint la recherche à la conversation avec cet utilisateur;
+        `max_id` ignore les messages plus récents (borne fixée à la première page).
+        """
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=10_000):
+        """(Ré)indexe les messages existants. Retourne le nombre de messages traités."""
+        return 0
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Recherche via `accounts_message.search_vector` (`tsvector`, index GIN par participant, trigger d'insertion)."""
+
+    def search(self, user_id, query, limit, cursor=None, peer_id=None, max_id=None):
+        table = Message._meta.db_table
+        params = {
+            'config': SEARCH_CONFIG,
+            'query': query,
+            'user': user_id,
+            'candidates': self.max_candidates,
+            'limit': limit,
+            'options': HIGHLIGHT_OPTIONS,
+        }
+        conditions = ['m.search_vector @@ q.query']
+        if peer_id is not None:
+            conditions.append('m.conversation_key = %(key)s')
+            params['key'] = Message.conversation_key_for(user_id, peer_id)
+        if max_id is not None:
+            conditions.append('m.id <= %(max_id)s')
+            params['max_id'] = max_id
+        conditions = ' AND '.join(conditions)
+        page_filter = ''
+        if cursor is not None:
+            page_filter = 'WHERE rank < %(rank)s OR (rank = %(rank)s AND id < %(id)s)'
+            params['rank'], params['id'] = cursor
+        # Correspondances les plus récentes de l'utilisateur: une branche par index composite
+        # (émetteur, destinataire; les messages à soi-même dans la première seulement), classées,
+        # puis extrait surligné pour la page seulement.
+        # Le contenu est échappé avant ts_headline: seules les balises <mark> sont du HTML.
+        sql = f"""
+            WITH q AS (SELECT websearch_to_tsquery(%(config)s::regconfig, %(query)s) AS query),
+            matches AS (
+                SELECT id FROM (
+                    SELECT m.id FROM {table} m, q
+                    WHERE m.sender_id = %(user)s AND {conditions}
+                    UNION ALL
+                    SELECT m.id FROM {table} m, q
+                    WHERE m.receiver_id = %(user)s AND m.sender_id <> %(user)s AND {conditions}
+                ) participant
+                ORDER BY id DESC
+                LIMIT %(candidates)s
+            ),
+            ranked AS (
+                SELECT m.id, ts_rank_cd(m.search_vector, q.query)::float8 AS rank
+                FROM matches JOIN {table} m ON m.id = matches.id, q
+            ),
+            page AS (
+                SELECT id, rank FROM ranked {page_filter}
+                ORDER BY rank DESC, id DESC
+                LIMIT %(limit)s
+            )
+            SELECT m.id, m.sender_id, m.receiver_id, m.created_at, page.rank,
+                   ts_headline(%(config)s::regconfig,
+                               replace(replace(replace(m.content, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+                               q.query, %(options)s)
+            FROM page JOIN {table} m ON m.id = page.id, q
+            ORDER BY page.rank DESC, page.id DESC
+        """
+        with connection.cursor() as cursor_:
+            cursor_.execute(sql, params)
+            return [_hit(*row) for row in cursor_.fetchall()]
+
+    def rebuild(self, batch_size=10_000):
+        # Lignes antérieures au trigger, par tranches d'identifiants (transactions courtes)
+        table = Message._meta.db_table
+        total = 0
+        last_id = 0
+        max_id = Message.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        while last_id < max_id:
+            with connection.cursor() as cursor_:
+                cursor_.execute(
+                    f"UPDATE {table} SET search_vector = to_tsvector(%s::regconfig, coalesce(content, '')) "
+                    "WHERE id > %s AND id <= %s AND search_vector IS NULL",
+                    [SEARCH_CONFIG, last_id, last_id + batch_size],
+                )
+                total += cursor_.rowcount
+            last_id += batch_size
+        return total
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """Index inversé local au processus: terme -> {id du message: occurrences}.
+
+    Score d'un message: somme des `tf * idf` des termes cherchés, normalisée par la
+    longueur du message. Requête: tous les termes doivent apparaître (ET implicite).
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._postings = {}
+        self._docs = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _add(self, message_id, sender_id, receiver_id, conversation_key, created_at, content):
+        terms = tokenize(content)
+        if not terms:
+            return
+        self._docs[message_id] = (sender_id, receiver_id, conversation_key, created_at, content, len(terms))
+        for term in terms:
+            postings = self._postings.setdefault(term, {})
+            postings[message_id] = postings.get(message_id, 0) + 1
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        rows = (
+            Message.objects.exclude(content='')
+            .values_list('id', 'sender_id', 'receiver_id', 'conversation_key', 'created_at', 'content')
+            .iterator(chunk_size=2000)
+        )
+        for row in rows:
+            self._add(*row)
+        self._loaded = True
+
+    def index_messages(self, messages):
+        with self._lock:
+            # Avant le premier chargement, les messages seront lus depuis la base
+            if not self._loaded:
+                return
+            for message in messages:
+                self._add(
+                    message.id, message.sender_id, message.receiver_id,
+                    message.conversation_key, message.created_at, message.content,
+                )
+
+    def search(self, user_id, query, limit, cursor=None, peer_id=None, max_id=None):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            postings = [self._postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return []
+            smallest = min(postings, key=len)
+            key = Message.conversation_key_for(user_id, peer_id) if peer_id is not None else None
+            matches = []
+            for message_id in smallest:
+                doc = self._docs[message_id]
+                if user_id not in (doc[0], doc[1]) or (key is not None and doc[2] != key):
+                    continue
+                if max_id is not None and message_id > max_id:
+                    continue
+                if all(message_id in p for p in postings):
+                    matches.append(message_id)
+            matches = sorted(matches, reverse=True)[:self.max_candidates]
+            total = len(self._docs)
+            idf = [math.log(1 + total / len(p)) for p in postings]
+            scored = []
+            for message_id in matches:
+                length = self._docs[message_id][5]
+                rank = sum(p[message_id] * w for p, w in zip(postings, idf)) / (1 + math.log(length))
+                if cursor is None or (rank, message_id) < cursor:
+                    scored.append((rank, message_id))
+            scored.sort(reverse=True)
+            hits = []
+            for rank, message_id in scored[:limit]:
+                sender_id, receiver_id, _, created_at, content, _ = self._docs[message_id]
+                hits.append(_hit(message_id, sender_id, receiver_id, created_at, rank, highlight(content, terms)))
+        return hits
+
+    def rebuild(self, batch_size=10_000):
+        with self._lock:
+            self._postings = {}
+            self._docs = {}
+            self._loaded = False
+            self._ensure_loaded()
+            return len(self._docs)
+
+
+def highlight(content, terms, words=HIGHLIGHT_WORDS):
+    """Extrait de `content` autour du premier terme trouvé, échappé HTML, termes entre `<mark>`."""
+    terms = set(terms)
+    tokens = list(WORD_RE.finditer(content))
+    first = next((i for i, m in enumerate(tokens) if m.group().lower() in terms), 0)
+    start = max(0, min(first - words // 3, len(tokens) - words))
+    window = tokens[start:start + words]
+    if not window:
+        return html.escape(content)
+    begin = 0 if start == 0 else window[0].start()
+    end = len(content) if start + words >= len(tokens) else window[-1].end()
+    parts = ['…'] if begin else []
+    position = begin
+    for match in window:
+        parts.append(html.escape(content[position:match.start()]))
+        word = html.escape(match.group())
+        parts.append(f'<mark>{word}</mark>' if match.group().lower() in terms else word)
+        position = match.end()
+    parts.append(html.escape(content[position:end]))
+    if end < len(content):
+        parts.append('…')
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """Instancie (une fois par processus) le backend configuré dans `settings.MESSAGE_SEARCH`."""
+    config = getattr(settings, 'MESSAGE_SEARCH', {})
+    backend_cls = import_string(config.get('BACKEND', 'accounts.search.InMemorySearchBackend'))
+    return backend_cls(**config.get('OPTIONS', {}))
@@ -61,8 +61,11 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'receiver', 'content', 'message_type', 'file', 'created_at', 'is_read']
-        read_only_fields = ['id', 'created_at', 'is_read']
+        fields = [
+            'id', 'sender', 'receiver', 'content', 'message_type', 'file', 'created_at', 'is_read', 'status', 'delivered_at', 'read_at',
+            'media_status', 'duration', 'waveform', 'poster',
+        ]
+        read_only_fields = ['id', 'created_at', 'is_read', 'status', 'delivered_at', 'read_at', 'media_status', 'duration', 'waveform', 'poster']
 
     def validate(self, attrs):
         """Valide la cohérence type/contenu.
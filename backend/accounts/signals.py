@@ -0,0 +1,49 @@
+"""Signaux de l'application Accounts.
+
+- Met à jour les résumés de conversation à la création d'un message.
+- Indexe les nouveaux messages pour la recherche plein texte.
+- Planifie le traitement des médias (poster, forme d'onde, durée) d'un message audio/vidéo.
+- Invalide le cache d'authentification REST à chaque modification d'utilisateur.
+- Compte les ouvertures de connexion à la base (métriques `accounts.dbpool`).
+- Révoque les jetons d'un utilisateur désactivé ou supprimé, pour que les
+  sockets authentifiées uniquement par leurs claims JWT soient refusées.
+"""
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .dbpool import record_connection_created
+from .mediajobs import enqueue_media_job
+from .models import Message
+from .revocation import get_revocation_backend
+from .search import get_search_backend
+from .summaries import record_message
+from .tokenauthentications import invalidate_cached_user
+
+
+@receiver(post_save, sender=get_user_model())
+def on_user_saved(sender, instance, created, **kwargs):
+    invalidate_cached_user(instance.id)
+    if not created and not instance.is_active:
+        get_revocation_backend().revoke_user(instance.id)
+
+
+@receiver(post_delete, sender=get_user_model())
+def on_user_deleted(sender, instance, **kwargs):
+    invalidate_cached_user(instance.id)
+    get_revocation_backend().revoke_user(instance.id)
+
+
+@receiver(post_save, sender=Message)
+def on_message_saved(sender, instance, created, **kwargs):
+    if created:
+        record_message(instance)
+        get_search_backend().index_messages([instance])
+        if instance.media_status == 'pending':
+            enqueue_media_job(instance)
+
+
+@receiver(connection_created)
+def on_connection_created(sender, connection, **kwargs):
+    record_connection_created(connection.alias)
@@ -0,0 +1,67 @@
+"""Stockage adressé par contenu des médias de messages.
+
+Le nom d'un fichier stocké est dérivé de l'empreinte SHA-256 de son contenu
+(`messages/<2 premiers caractères>/<sha256><extension>`): un média transféré ou
+renvoyé plusieurs fois n'est écrit qu'une seule fois sur disque, et son nom
+sert d'ETag fort (voir `accounts.views.serve_media`).
+"""
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_BLOCK = 1024 * 1024
+CONTENT_NAME_RE = re.compile(r'^messages/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(\.[\w]+)?$')
+
+
+def content_digest(name):
+    """Empreinte SHA-256 contenue dans un nom de fichier adressé par contenu, sinon `None`."""
+    match = CONTENT_NAME_RE.match(name or '')
+    return match.group('digest') if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """`FileSystemStorage` qui nomme les fichiers d'après leur contenu et déduplique."""
+
+    def get_available_name(self, name, max_length=None):
+        # Le nom définitif est calculé dans `_save` à partir du contenu. `FileSystemStorage._save`
+        # rappelle cette méthode quand la cible existe déjà (deux envois identiques en concurrence):
+        # pas d'autre nom possible pour un contenu donné, l'erreur remonte jusqu'à `_save`
+        if content_digest(name) and self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for block in content.chunks(HASH_BLOCK):
+            digest.update(block)
+        content.seek(0)
+        ext = os.path.splitext(name)[1].lower()[:10]
+        hexdigest = digest.hexdigest()
+        target = f"messages/{hexdigest[:2]}/{hexdigest}{ext}"
+        if self.exists(target):
+            # Déjà stocké: on ne réécrit rien
+            self._discard_source(content)
+            return target
+        try:
+            return super()._save(target, content)
+        except FileExistsError:
+            # Écrit entre-temps par un envoi concurrent du même contenu: même résultat que ci-dessus
+            self._discard_source(content)
+            return target
+
+    @staticmethod
+    def _discard_source(content):
+        """Abandonne le fichier temporaire source d'un contenu déjà stocké."""
+        if hasattr(content, 'temporary_file_path') and os.path.exists(content.temporary_file_path()):
+            os.remove(content.temporary_file_path())
+
+
+_message_storage = ContentAddressedStorage()
+
+
+def get_message_storage():
+    """Stockage utilisé par `Message.file` (callable, pour des migrations stables)."""
+    return _message_storage
@@ -0,0 +1,119 @@
+"""Maintenance incrémentale de `ConversationSummary`.
+
+- `record_message`: appelé à la création d'un message (dernier message + non lus du destinataire)
+- `record_messages`: version groupée pour les envois par lots (`bulk_create` ne déclenche pas `post_save`)
+- `record_read`: appelé après un accusé de lecture (décrémente les non lus)
+- `rebuild_summaries`: recalcul complet (commande `rebuild_conversation_summaries`)
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DateTimeField, F, IntegerField, Max, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import ConversationSummary, Message
+
+PREVIEW_LENGTH = 100
+
+
+def message_preview(message):
+    """Aperçu court d'un message (texte tronqué, ou son type pour un média)."""
+    return (message.content or '')[:PREVIEW_LENGTH] or message.message_type
+
+
+def _upsert(user_id, peer_id, message, unread_increment):
+    fields = {
+        'last_message': message,
+        'last_message_preview': message_preview(message),
+        'last_message_at': message.created_at,
+    }
+    summaries = ConversationSummary.objects.filter(user_id=user_id, peer_id=peer_id)
+    if summaries.update(unread_count=F('unread_count') + unread_increment, **fields):
+        return
+    try:
+        with transaction.atomic():
+            ConversationSummary.objects.create(user_id=user_id, peer_id=peer_id, unread_count=unread_increment, **fields)
+    except IntegrityError:
+        # Créé entre-temps par une autre requête: on applique la mise à jour
+        summaries.update(unread_count=F('unread_count') + unread_increment, **fields)
+
+
+def record_message(message):
+    """Met à jour les résumés de l'émetteur et du destinataire pour un nouveau message."""
+    _upsert(message.sender_id, message.receiver_id, message, 0)
+    if message.receiver_id != message.sender_id:
+        _upsert(message.receiver_id, message.sender_id, message, 1 if message.read_at is None else 0)
+
+
+def record_messages(messages):
+    """Met à jour les résumés pour une liste de nouveaux messages en un nombre constant de requêtes."""
+    entries = {}
+    for message in sorted(messages, key=lambda m: m.id):
+        sides = [(message.sender_id, message.receiver_id, 0)]
+        if message.receiver_id != message.sender_id:
+            sides.append((message.receiver_id, message.sender_id, 1 if message.read_at is None else 0))
+        for user_id, peer_id, unread in sides:
+            entry = entries.setdefault((user_id, peer_id), [message, 0])
+            entry[0] = message
+            entry[1] += unread
+    if not entries:
+        return
+    with transaction.atomic():
+        # Résumés manquants créés vides, puis un seul UPDATE (CASE WHEN) pour tous les résumés concernés
+        ConversationSummary.objects.bulk_create(
+            [ConversationSummary(user_id=user_id, peer_id=peer_id) for user_id, peer_id in entries],
+            ignore_conflicts=True,
+        )
+        rows = ConversationSummary.objects.filter(
+            user_id__in={user_id for user_id, _ in entries}, peer_id__in={peer_id for _, peer_id in entries},
+        ).values_list('id', 'user_id', 'peer_id')
+        ids = {pk: entries[(user_id, peer_id)] for pk, user_id, peer_id in rows if (user_id, peer_id) in entries}
+        ConversationSummary.objects.filter(id__in=ids).update(
+            unread_count=F('unread_count') + Case(
+                *[When(id=pk, then=Value(unread)) for pk, (_, unread) in ids.items()], output_field=IntegerField(),
+            ),
+            last_message_id=Case(*[When(id=pk, then=Value(m.id)) for pk, (m, _) in ids.items()]),
+            last_message_preview=Case(*[When(id=pk, then=Value(message_preview(m))) for pk, (m, _) in ids.items()]),
+            last_message_at=Case(
+                *[When(id=pk, then=Value(m.created_at)) for pk, (m, _) in ids.items()], output_field=DateTimeField(),
+            ),
+        )
+
+
+def record_read(reader_id, peer_id, count):
+    """Retire `count` non lus du résumé de `reader_id` pour la conversation avec `peer_id`."""
+    if count:
+        ConversationSummary.objects.filter(user_id=reader_id, peer_id=peer_id).update(
+            unread_count=Greatest(F('unread_count') - count, Value(0)),
+        )
+
+
+def rebuild_summaries():
+    """Reconstruit tous les résumés à partir de la table des messages. Retourne le nombre de résumés."""
+    pairs = {}
+    for direction in ('sender', 'receiver'):
+        other = 'receiver' if direction == 'sender' else 'sender'
+        rows = (
+            Message.objects.values(f'{direction}_id', f'{other}_id')
+            .annotate(last_id=Max('id'), unread=Count('id', filter=Q(read_at__isnull=True)))
+        )
+        for row in rows:
+            key = (row[f'{direction}_id'], row[f'{other}_id'])
+            entry = pairs.setdefault(key, {'last_id': 0, 'unread': 0})
+            entry['last_id'] = max(entry['last_id'], row['last_id'])
+            if direction == 'receiver':
+                entry['unread'] = row['unread']
+    last_messages = Message.objects.in_bulk([entry['last_id'] for entry in pairs.values()])
+    summaries = []
+    for (user_id, peer_id), entry in pairs.items():
+        message = last_messages[entry['last_id']]
+        summaries.append(ConversationSummary(
+            user_id=user_id,
+            peer_id=peer_id,
+            unread_count=entry['unread'],
+            last_message=message,
+            last_message_preview=message_preview(message),
+            last_message_at=message.created_at,
+        ))
+    with transaction.atomic():
+        ConversationSummary.objects.all().delete()
+        ConversationSummary.objects.bulk_create(summaries, batch_size=1000)
+    return len(summaries)
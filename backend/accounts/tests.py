@@ -1,3 +1,1517 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+from rest_framework.test import APIClient
+
+from .consumers import ChatConsumer
+from .dbexecutor import get_db_executor
+from .encoders import ROW_FIELDS, MessageEncoder, MessageRow, message_rows
+from .eventlog import RedisEventLogBackend, apublish_many, get_event_log
+from .mediaprocessors import FFmpegMediaProcessor
+from .archive import archive_month, pack, unpack
+from .models import ArchivedMedia, ConversationSummary, MediaJob, MediaUpload, Message, MessageArchiveSegment, User
+from .pagination import decode_cursor, encode_cursor
+from .presence import InMemoryPresenceBackend, PresenceAggregator, get_presence_backend
+from .receipts import mark_delivered_on_connect, mark_read_up_to
+from .revocation import InMemoryRevocationBackend, get_revocation_backend
+from .search import get_search_backend
+from .serializers import MessageSerializer
+from .storage import ContentAddressedStorage
+from . import mediajobs, partitions, summaries, tokenauthentications
+from .tokenauthentications import JWTAuthentication, get_cached_user, invalidate_cached_user
+from .typingstate import TypingTracker
+from .wire import JSON_CODEC, KEY_CODES, TYPE_CODES, MsgpackCodec, negotiate
+from .writebehind import StatusWriteBuffer, get_status_buffer, lifespan
+
+
+def make_user(name):
+    return User.objects.create_user(email=f'{name}@example.com', username=name, password='secret')
+
+
+def api_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {JWTAuthentication.generate_token(user)}')
+    return client
+
+
+async def connect_chat(user):
+    communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f'/ws/chat/?token={JWTAuthentication.generate_token(user)}')
+    connected, _ = await communicator.connect()
+    assert connected
+    return communicator
+
+
+class ListMessagesTests(TestCase):
+    """Historique paginé par curseur `(created_at, id)` et synchro delta (`since`)."""
+
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.client = api_client(self.alice)
+
+    def send(self, sender, receiver, content):
+        return Message.objects.create(sender=sender, receiver=receiver, content=content)
+
+    def get(self, **params):
+        response = self.client.get('/messages/', {'with': self.bob.id, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_latest_page_in_chronological_order(self):
+        ids = [self.send(self.alice if i % 2 else self.bob, self.bob if i % 2 else self.alice, f'm{i}').id for i in range(5)]
+        page = self.get(limit=3)
+        self.assertEqual([m['id'] for m in page['results']], ids[2:])
+        self.assertTrue(page['has_more'])
+
+    def test_before_pages_split_created_at_ties(self):
+        messages = [self.send(self.alice, self.bob, f'm{i}') for i in range(7)]
+        # Horodatages identiques: seul l'id départage les lignes aux bornes de page
+        moment = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        Message.objects.filter(id__in=[m.id for m in messages[1:6]]).update(created_at=moment)
+        Message.objects.filter(id=messages[0].id).update(created_at=moment - timedelta(seconds=1))
+        Message.objects.filter(id=messages[6].id).update(created_at=moment + timedelta(seconds=1))
+
+        seen = []
+        page = self.get(limit=2)
+        while True:
+            seen = [m['id'] for m in page['results']] + seen
+            if not page['has_more']:
+                break
+            page = self.get(limit=2, before=page['before'])
+        self.assertEqual(seen, [m.id for m in messages])
+
+    def test_after_pages_split_created_at_ties(self):
+        messages = [self.send(self.bob, self.alice, f'm{i}') for i in range(5)]
+        moment = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        Message.objects.filter(id__in=[m.id for m in messages]).update(created_at=moment)
+        start = encode_cursor(moment - timedelta(seconds=1), 0)
+
+        seen = []
+        page = self.get(limit=2, after=start)
+        seen += [m['id'] for m in page['results']]
+        while page['has_more']:
+            page = self.get(limit=2, after=page['after'])
+            seen += [m['id'] for m in page['results']]
+        self.assertEqual(seen, [m.id for m in messages])
+
+    def test_other_conversations_are_excluded(self):
+        carol = make_user('carol')
+        mine = self.send(self.alice, self.bob, 'hello')
+        self.send(self.alice, carol, 'other')
+        self.send(carol, self.bob, 'other')
+        self.assertEqual([m['id'] for m in self.get()['results']], [mine.id])
+
+    def age(self, *messages, moment=datetime(2026, 1, 1, tzinfo=timezone.utc)):
+        """Horodate `updated_at` hors de la fenêtre de sécurité de la synchro delta."""
+        Message.objects.filter(id__in=[m.id for m in messages]).update(updated_at=moment)
+        return moment
+
+    def test_sync_token_round_trip(self):
+        one = self.send(self.alice, self.bob, 'one')
+        moment = self.age(one)
+        token = self.get()['sync_token']
+        self.assertEqual(decode_cursor(token), (moment, one.id))
+
+        unchanged = self.get(since=token)
+        self.assertEqual(unchanged['results'], [])
+        self.assertEqual(unchanged['sync_token'], token)
+
+        new = self.send(self.bob, self.alice, 'two')
+        delta = self.get(since=token)
+        self.assertEqual([m['id'] for m in delta['results']], [new.id])
+        # Ligne récente: le jeton s'arrête à l'horizon, elle est renvoyée au prochain appel
+        self.assertLess(decode_cursor(delta['sync_token'])[0], new.updated_at)
+        self.assertGreater(decode_cursor(delta['sync_token']), decode_cursor(token))
+        self.assertEqual([m['id'] for m in self.get(since=delta['sync_token'])['results']], [new.id])
+
+    def test_row_committed_after_a_later_stamped_row_is_synced(self):
+        first = self.send(self.bob, self.alice, 'first')
+        token = self.get()['sync_token']
+        # `updated_at` fixé avant le commit: ligne validée après `first` mais horodatée avant elle
+        late = self.send(self.bob, self.alice, 'late')
+        Message.objects.filter(id=late.id).update(updated_at=first.updated_at - timedelta(milliseconds=1))
+        self.assertIn(late.id, [m['id'] for m in self.get(since=token)['results']])
+
+    def test_since_pages_through_many_changes(self):
+        token = encode_cursor(datetime(2000, 1, 1, tzinfo=timezone.utc), 0)
+        messages = [self.send(self.alice, self.bob, f'm{i}') for i in range(5)]
+        self.age(*messages)
+        seen = []
+        while True:
+            page = self.get(since=token, limit=2)
+            seen += [m['id'] for m in page['results']]
+            token = page['sync_token']
+            if not page['has_more']:
+                break
+        self.assertEqual(sorted(seen), [m.id for m in messages])
+        self.assertEqual(self.get(since=token)['results'], [])
+
+    def test_status_change_by_queryset_update_is_synced(self):
+        received = self.send(self.bob, self.alice, 'unread')
+        moment = self.age(received)
+        token = self.get()['sync_token']
+        self.assertEqual(decode_cursor(token), (moment, received.id))
+
+        # QuerySet.update(): pas d'auto_now, updated_at est fixé explicitement par mark_read_up_to
+        data = mark_read_up_to(self.alice.id, self.bob.id, received.id)
+        self.assertEqual(data['count'], 1)
+
+        delta = self.get(since=token)
+        self.assertEqual([(m['id'], m['status']) for m in delta['results']], [(received.id, 'read')])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/messages/').status_code, 400)
+        self.assertEqual(self.client.get('/messages/', {'with': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/messages/', {'with': self.bob.id, 'before': 'nope'}).status_code, 400)
+        self.assertIn(APIClient().get('/messages/', {'with': self.bob.id}).status_code, (401, 403))
+
+
+class InMemoryPresenceBackendTests(SimpleTestCase):
+    """Registre de présence local: compteur par connexion et expiration par TTL."""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('accounts.presence.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.presence = InMemoryPresenceBackend(ttl=60)
+
+    async def test_transitions_counted_per_connection(self):
+        self.assertTrue(await self.presence.connect(1, 'tab-a'))
+        self.assertFalse(await self.presence.connect(1, 'tab-b'))
+        self.assertFalse(await self.presence.disconnect(1, 'tab-a'))
+        self.assertTrue(await self.presence.is_online(1))
+        self.assertTrue(await self.presence.disconnect(1, 'tab-b'))
+        self.assertFalse(await self.presence.is_online(1))
+
+    async def test_unknown_connection_disconnect_is_not_a_transition(self):
+        await self.presence.connect(1, 'tab-a')
+        self.assertFalse(await self.presence.disconnect(1, 'other'))
+        self.assertFalse(await self.presence.disconnect(2, 'tab-a'))
+        self.assertTrue(await self.presence.is_online(1))
+
+    async def test_connection_expires_without_heartbeat(self):
+        await self.presence.connect(1, 'tab-a')
+        await self.presence.connect(2, 'tab-b')
+        self.now += 45
+        await self.presence.heartbeat(2, 'tab-b')
+        self.now += 30
+        self.assertFalse(await self.presence.is_online(1))
+        self.assertTrue(await self.presence.is_online(2))
+        self.assertEqual(await self.presence.online_user_ids(), [2])
+        # Connexion expirée (worker planté): la reconnexion est une transition
+        self.assertTrue(await self.presence.connect(1, 'tab-c'))
+
+    async def test_online_among(self):
+        await self.presence.connect(1, 'a')
+        await self.presence.connect(3, 'c')
+        self.assertEqual(await self.presence.online_among([1, 2, 3]), [1, 3])
+        self.assertEqual(self.presence.online_among_sync([1, 2, 3]), [1, 3])
+        self.assertEqual(self.presence.heartbeat_interval, 20)
+
+
+class PresenceAggregatorTests(SimpleTestCase):
+    """Regroupement des transitions de présence sur une fenêtre."""
+
+    def setUp(self):
+        self.layer = mock.Mock(group_send=mock.AsyncMock())
+        self.aggregator = PresenceAggregator(window=60, channel_layer=self.layer)
+
+    async def test_only_net_changes_are_sent(self):
+        await self.aggregator.record(1, True)
+        await self.aggregator.record(2, True)
+        await self.aggregator.record(2, False, 'later')
+        await self.aggregator.record(3, False, 'seen')
+        await self.aggregator.flush()
+        self.aggregator._flush_task.cancel()
+        sent = {call.args[0]: call.args[1]['updates'] for call in self.layer.group_send.await_args_list}
+        self.assertEqual(sent, {
+            'presence_1': [{'user_id': 1, 'online': True, 'last_seen': None}],
+            'presence_3': [{'user_id': 3, 'online': False, 'last_seen': 'seen'}],
+        })
+
+    async def test_immediate_flush_without_window(self):
+        self.aggregator.window = 0
+        await self.aggregator.record(1, True)
+        self.layer.group_send.assert_awaited_once()
+
+
+class MarkReadUpToTests(TestCase):
+    """Accusé de lecture groupé: bornes, compte et non lus du résumé décomptés une seule fois."""
+
+    def setUp(self):
+        self.alice, self.bob = make_user('alice'), make_user('bob')
+        self.from_bob = [Message.objects.create(sender=self.bob, receiver=self.alice, content=str(n)) for n in range(4)]
+        self.mine = Message.objects.create(sender=self.alice, receiver=self.bob, content='mine')
+
+    def unread(self):
+        return ConversationSummary.objects.get(user=self.alice, peer=self.bob).unread_count
+
+    def test_marks_peer_messages_up_to_id(self):
+        self.assertEqual(self.unread(), 4)
+        data = mark_read_up_to(self.alice.id, self.bob.id, self.from_bob[2].id)
+        self.assertEqual(
+            (data['from'], data['to'], data['first_id'], data['up_to_id'], data['count'], data['status']),
+            (self.bob.id, self.alice.id, self.from_bob[0].id, self.from_bob[2].id, 3, 'read'),
+        )
+        self.assertEqual(list(Message.objects.filter(read_at__isnull=False).order_by('id').values_list('id', flat=True)),
+                         [m.id for m in self.from_bob[:3]])
+        self.assertEqual(self.unread(), 1)
+
+    def test_second_call_does_not_decrement_again(self):
+        mark_read_up_to(self.alice.id, self.bob.id, self.from_bob[1].id)
+        self.assertIsNone(mark_read_up_to(self.alice.id, self.bob.id, self.from_bob[1].id))
+        self.assertEqual(self.unread(), 2)
+        data = mark_read_up_to(self.alice.id, self.bob.id, self.from_bob[3].id)
+        self.assertEqual((data['first_id'], data['count']), (self.from_bob[2].id, 2))
+        self.assertEqual(self.unread(), 0)
+
+    def test_write_behind_flush_skips_rows_already_read(self):
+        buffer = StatusWriteBuffer(interval=60)
+        at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        buffer._pending = {m.id: {'read_at': at} for m in self.from_bob[:2]}
+        mark_read_up_to(self.alice.id, self.bob.id, self.from_bob[0].id)
+        self.assertTrue(buffer.flush_sync())
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(Message.objects.get(id=self.from_bob[1].id).read_at, at)
+
+    def test_messages_sent_by_reader_are_ignored(self):
+        self.assertIsNone(mark_read_up_to(self.bob.id, self.alice.id, self.from_bob[3].id))
+        self.assertEqual(mark_read_up_to(self.bob.id, self.alice.id, self.mine.id)['count'], 1)
+
+
+class MarkDeliveredOnConnectTests(TestCase):
+    """Remise à la connexion: un événement par émetteur, bornes et compte des lignes effectivement mises à jour."""
+
+    def test_one_event_per_sender(self):
+        alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+        from_bob = [Message.objects.create(sender=bob, receiver=alice, content=str(n)) for n in range(3)]
+        from_carol = Message.objects.create(sender=carol, receiver=alice, content='hi')
+        Message.objects.filter(id=from_bob[1].id).update(status='read')
+
+        events = sorted(mark_delivered_on_connect(alice.id), key=lambda event: event['from'])
+        self.assertEqual(
+            [(e['from'], e['to'], e['first_id'], e['up_to_id'], e['count'], e['status']) for e in events],
+            [
+                (bob.id, alice.id, from_bob[0].id, from_bob[2].id, 2, 'delivered'),
+                (carol.id, alice.id, from_carol.id, from_carol.id, 1, 'delivered'),
+            ],
+        )
+        self.assertEqual(Message.objects.filter(receiver=alice, status='delivered').count(), 3)
+        self.assertEqual(mark_delivered_on_connect(alice.id), [])
+
+
+class StatusWriteBufferTests(TestCase):
+    """Écriture différée des statuts: fusion par message et reprise après échec."""
+
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.message = Message.objects.create(sender=self.alice, receiver=self.bob, content='hi')
+        self.buffer = StatusWriteBuffer(interval=60)
+
+    async def record(self, status, at):
+        await self.buffer.record(self.message.id, status, at)
+        self.buffer._flush_task.cancel()
+
+    def test_failed_write_is_kept_and_retried(self):
+        delivered = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        read = delivered + timedelta(minutes=1)
+        async_to_sync(self.record)('delivered', delivered)
+        with mock.patch.object(StatusWriteBuffer, '_write', side_effect=RuntimeError('db down')), \
+                self.assertLogs('accounts.writebehind', 'ERROR'):
+            self.assertFalse(async_to_sync(self.buffer.flush)())
+        # Transition enregistrée pendant la panne: fusionnée avec le lot remis en attente
+        async_to_sync(self.record)('read', read)
+        async_to_sync(self.record)('delivered', read)
+        self.assertEqual(self.buffer._pending, {self.message.id: {'delivered_at': delivered, 'read_at': read}})
+
+        self.assertTrue(self.buffer.flush_sync())
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.delivered_at, self.message.read_at), ('read', delivered, read))
+        self.assertEqual(self.buffer._pending, {})
+
+    @override_settings(DB_EXECUTOR={'MAX_WORKERS': 0})
+    def test_lifespan_shutdown_flushes(self):
+        get_db_executor.cache_clear()
+        self.addCleanup(get_db_executor.cache_clear)
+        delivered = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        async def run():
+            app = ApplicationCommunicator(lifespan, {'type': 'lifespan'})
+            await app.send_input({'type': 'lifespan.startup'})
+            self.assertEqual(await app.receive_output(), {'type': 'lifespan.startup.complete'})
+            await get_status_buffer().record(self.message.id, 'delivered', delivered)
+            get_status_buffer()._flush_task.cancel()
+            await app.send_input({'type': 'lifespan.shutdown'})
+            self.assertEqual(await app.receive_output(), {'type': 'lifespan.shutdown.complete'})
+
+        with mock.patch.object(get_status_buffer(), 'interval', 60):
+            async_to_sync(run)()
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.delivered_at), ('delivered', delivered))
+
+
+class ServeMediaTests(TestCase):
+    """Médias réservés aux participants de la conversation."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.eve = make_user('eve')
+        self.message = Message(sender=self.alice, receiver=self.bob, message_type='audio')
+        self.message.file.save('voice.webm', ContentFile(b'0123456789'), save=False)
+        self.message.save()
+        self.url = f'/media/{self.message.file.name}'
+
+    def test_participants_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self.client.get(self.url, {'token': 'forged'}).status_code, 401)
+        self.assertEqual(api_client(self.eve).get(self.url).status_code, 404)
+        for user in (self.alice, self.bob):
+            response = api_client(user).get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+            self.assertTrue(response['Cache-Control'].startswith('private'))
+
+    def test_token_in_query_string_and_range(self):
+        token = JWTAuthentication.generate_token(self.bob)
+        response = self.client.get(self.url, {'token': token}, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+
+    def test_unreferenced_file_is_not_served(self):
+        name = self.message.file.storage.save('messages/other.webm', ContentFile(b'secret'))
+        self.assertEqual(api_client(self.alice).get(f'/media/{name}').status_code, 404)
+
+
+class MessageArchiveTests(TestCase):
+    """Archivage d'un mois: tranches compressées, historique continu et médias toujours servis."""
+
+    month = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.alice, self.bob, self.eve = make_user('alice'), make_user('bob'), make_user('eve')
+        self.old = [self.send(self.alice, self.bob, f'old{n}', days=n) for n in range(3)]
+        self.voice = Message(sender=self.bob, receiver=self.alice, message_type='audio')
+        self.voice.file.save('voice.webm', ContentFile(b'0123456789'), save=False)
+        self.voice.save()
+        self.age(self.voice, days=3)
+        self.old.append(self.voice)
+        self.send(self.alice, self.eve, 'other', days=1)
+        self.recent = [self.send(self.bob, self.alice, f'new{n}') for n in range(2)]
+
+    def age(self, message, days):
+        moment = self.month + timedelta(days=days)
+        Message.objects.filter(id=message.id).update(created_at=moment, updated_at=moment)
+
+    def send(self, sender, receiver, content, days=None):
+        message = Message.objects.create(sender=sender, receiver=receiver, content=content)
+        if days is not None:
+            self.age(message, days)
+        return message
+
+    def test_archive_month(self):
+        self.assertEqual(archive_month(self.month, segment_size=3), 5)
+        self.assertEqual(set(Message.objects.values_list('id', flat=True)), {m.id for m in self.recent})
+        segments = MessageArchiveSegment.objects.order_by('conversation_key', 'first_created_at')
+        self.assertEqual([s.count for s in segments], [3, 1, 1])
+        self.assertEqual([m.id for m in unpack(segments[0].payload)], [m.id for m in self.old[:3]])
+        self.assertEqual(
+            list(ArchivedMedia.objects.values_list('name', 'sender_id', 'receiver_id')),
+            [(self.voice.file.name, self.bob.id, self.alice.id)],
+        )
+        self.assertIsNone(ConversationSummary.objects.get(user=self.eve, peer=self.alice).last_message_id)
+        self.assertFalse(MediaJob.objects.filter(message_id=self.voice.id).exists())
+        # Relance: plus rien à archiver, aucun doublon
+        self.assertEqual(archive_month(self.month), 0)
+        self.assertEqual(MessageArchiveSegment.objects.count(), 3)
+
+    def test_list_messages_pages_from_live_into_archive(self):
+        archive_month(self.month, segment_size=3)
+        client = api_client(self.alice)
+        expected = [m.id for m in self.old + self.recent]
+
+        page = client.get('/messages/', {'with': self.bob.id, 'limit': 4}).json()
+        self.assertEqual([m['id'] for m in page['results']], expected[2:])
+        self.assertTrue(page['has_more'])
+        page = client.get('/messages/', {'with': self.bob.id, 'limit': 4, 'before': page['before']}).json()
+        self.assertEqual([m['id'] for m in page['results']], expected[:2])
+        self.assertFalse(page['has_more'])
+
+        page = client.get('/messages/', {'with': self.bob.id, 'limit': 3, 'after': encode_cursor(self.month, 0)}).json()
+        self.assertEqual([m['id'] for m in page['results']], expected[:3])
+        page = client.get('/messages/', {'with': self.bob.id, 'limit': 3, 'after': page['after']}).json()
+        self.assertEqual([m['id'] for m in page['results']], expected[3:])
+        self.assertFalse(page['has_more'])
+
+    def test_archived_media_still_served_to_participants(self):
+        archive_month(self.month)
+        url = f'/media/{self.voice.file.name}'
+        self.assertEqual(api_client(self.eve).get(url).status_code, 404)
+        for user in (self.alice, self.bob):
+            response = api_client(user).get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'partitionnement: PostgreSQL uniquement (TEST_DB=postgres)')
+class ConvertToPartitionedTests(TransactionTestCase):
+    """Conversion en table partitionnée, relançable après une exécution interrompue."""
+
+    def test_rerun_after_partial_conversion(self):
+        now = django_timezone.now()
+        # Exécution interrompue le mois précédent: contrainte CHECK d'une borne antérieure déjà posée
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'ALTER TABLE {partitions.TABLE} ADD CONSTRAINT {partitions.TABLE}_legacy_range '
+                'CHECK (created_at < %s) NOT VALID', [partitions.month_start(now)],
+            )
+        partitions.convert_to_partitioned(now, 1)
+        self.assertTrue(partitions.is_partitioned())
+        self.assertEqual(partitions.convert_to_partitioned(now, 1), [])
+        Message.objects.create(sender=make_user('alice'), receiver=make_user('bob'), content='after')
+        self.assertEqual(Message.objects.count(), 1)
+
+
+class MessageEncoderParityTests(TestCase):
+    """`MessageEncoder.encode` produit exactement `MessageSerializer(message).data` (texte, média, archive, nuls)."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.alice, self.bob = make_user('alice'), make_user('bob')
+        self.encoder = MessageEncoder()
+
+    def assertParity(self, message, row=None):
+        message.refresh_from_db()
+        row = row or message_rows(Message.objects.filter(id=message.id))[0]
+        self.assertEqual(self.encoder.encode(row), dict(MessageSerializer(message).data))
+        self.assertEqual(self.encoder.encode(MessageRow.from_message(message)), dict(MessageSerializer(message).data))
+
+    def media_message(self):
+        message = Message(sender=self.bob, receiver=self.alice, message_type='video')
+        message.file.save('clip.mp4', ContentFile(b'video'), save=False)
+        message.poster.save('clip.png', ContentFile(b'png'), save=False)
+        message.save()
+        moment = datetime(2026, 3, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+        Message.objects.filter(id=message.id).update(
+            media_status='ready', duration=12.5, waveform=[0, 3, 7], status='read', is_read=True,
+            delivered_at=moment, read_at=moment + timedelta(seconds=1),
+        )
+        return message
+
+    def test_text_with_null_fields(self):
+        message = Message.objects.create(sender=self.alice, receiver=self.bob, content='héllo')
+        self.assertParity(message)
+        data = self.encoder.encode(MessageRow.from_message(message))
+        self.assertEqual(
+            [data[field] for field in ('file', 'delivered_at', 'read_at', 'duration', 'waveform', 'poster')], [None] * 6,
+        )
+
+    def test_media(self):
+        message = self.media_message()
+        self.assertParity(message)
+        self.assertTrue(self.encoder.encode(MessageRow.from_message(message))['poster'].endswith('.png'))
+
+    def test_archived_row(self):
+        message = self.media_message()
+        archived = unpack(pack(Message.objects.filter(id=message.id).values(*ROW_FIELDS)))[0]
+        self.assertParity(message, archived)
+
+
+class WireCodecTests(SimpleTestCase):
+    """Codecs des trames WebSocket: aller-retour MessagePack sur toute la table v1 et négociation."""
+
+    def frame(self, event):
+        nested = {'id': 7, 'from': 1, 'to': 2, 'content': 'é', 'status': 'read', 'waveform': [1, 2]}
+        values = {
+            'messages': [nested, {'type': event, 'id': 8}],
+            'updates': [{'user_id': 3, 'online': True, 'last_seen': None, 'typing': False, 'ttl': 6}],
+            'results': [{'index': 0, 'receiver': 2, 'error': 'Unknown receiver.'}, 'raw'],
+            'online_user_ids': [1, 2],
+            'items': [{'receiver': 2, 'content': 'hi'}],
+            'receivers': [2, 3],
+            'user_ids': [4],
+            'duration': 1.5,
+            'waveform': [0, 255],
+            'online': False,
+            'typing': True,
+            'last_seen': None,
+        }
+        return {key: values.get(key, f'{key}-value') for key in KEY_CODES if key != 'type'} | {'type': event}
+
+    def test_msgpack_round_trip_every_event(self):
+        codec = MsgpackCodec()
+        for event in TYPE_CODES:
+            with self.subTest(event=event):
+                frame = self.frame(event)
+                encoded = codec.encode(frame)
+                self.assertIsInstance(encoded, bytes)
+                self.assertEqual(codec.decode(encoded), frame)
+                # Toutes les clés et le type sont codés en entiers, y compris dans les dicts imbriqués
+                compact = msgpack.unpackb(encoded, strict_map_key=False)
+                self.assertEqual(compact[KEY_CODES['type']], TYPE_CODES[event])
+                self.assertTrue(all(isinstance(key, int) for key in compact))
+                self.assertEqual(compact[KEY_CODES['messages']][1], {KEY_CODES['type']: TYPE_CODES[event], KEY_CODES['id']: 8})
+
+    def test_unknown_keys_and_types_pass_through(self):
+        codec = MsgpackCodec()
+        frame = {'type': 'future_event', 'extra': {'nested_key': 1}, 'seq': 3}
+        self.assertEqual(codec.decode(codec.encode(frame)), frame)
+        self.assertEqual(codec.decode(msgpack.packb([1, 2])), [1, 2])
+
+    def test_json_codec(self):
+        frame = self.frame('message_created')
+        self.assertEqual(JSON_CODEC.decode(JSON_CODEC.encode(frame)), frame)
+
+    def test_negotiate(self):
+        self.assertIs(negotiate(None), JSON_CODEC)
+        self.assertIs(negotiate([]), JSON_CODEC)
+        self.assertIs(negotiate(['gmsg.msgpack.v9', 'chat']), JSON_CODEC)
+        self.assertIsNone(negotiate(['gmsg.msgpack.v9']).subprotocol)
+        self.assertEqual(negotiate(['gmsg.v9', 'gmsg.msgpack.v1']).subprotocol, 'gmsg.msgpack.v1')
+        self.assertEqual(negotiate(['gmsg.json.v1', 'gmsg.msgpack.v1']).subprotocol, 'gmsg.json.v1')
+
+
+@override_settings(DB_EXECUTOR={'MAX_WORKERS': 0})
+class ChatConsumerCodecTests(TestCase):
+    """Sous-protocole négocié à la connexion WebSocket, repli sur JSON."""
+
+    def setUp(self):
+        for getter in (get_db_executor, get_event_log):
+            getter.cache_clear()
+            self.addCleanup(getter.cache_clear)
+        self.alice = make_user('alice')
+
+    def exchange(self, subprotocols, binary):
+        async def run():
+            token = JWTAuthentication.generate_token(self.alice)
+            ws = WebsocketCommunicator(ChatConsumer.as_asgi(), f'/ws/chat/?token={token}', subprotocols=subprotocols)
+            connected, subprotocol = await ws.connect()
+            self.assertTrue(connected)
+            try:
+                command = {'type': 'sync'}
+                await (ws.send_to(bytes_data=MsgpackCodec().encode(command)) if binary else ws.send_json_to(command))
+                return subprotocol, await ws.receive_output()
+            finally:
+                await ws.disconnect()
+        return async_to_sync(run)()
+
+    def test_msgpack_negotiated(self):
+        subprotocol, output = self.exchange(['gmsg.v9', 'gmsg.msgpack.v1'], binary=True)
+        self.assertEqual(subprotocol, 'gmsg.msgpack.v1')
+        self.assertEqual(MsgpackCodec().decode(output['bytes']), {'type': 'sync_state', 'seq': 0})
+
+    def test_unknown_subprotocol_falls_back_to_json(self):
+        subprotocol, output = self.exchange(['gmsg.v9'], binary=False)
+        self.assertIsNone(subprotocol)
+        self.assertEqual(json.loads(output['text']), {'type': 'sync_state', 'seq': 0})
+
+
+class RecordingLayer:
+    """Channel layer factice: retient les `group_send`."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+class TypingTrackerTests(SimpleTestCase):
+    """Indicateurs de saisie: regroupement par fenêtre, expiration, plafond d'interlocuteurs, budget d'annonces."""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('accounts.typingstate.time', mock.Mock(monotonic=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.layer = RecordingLayer()
+        self.tracker = self.make_tracker()
+
+    def make_tracker(self, **options):
+        tracker = TypingTracker(**{'ttl': 6.0, 'max_peers': 5, 'rate': 1.0, 'burst': 10, **options}, channel_layer=self.layer)
+        # Pas de boucle de fond: les tests appellent `expire` et `flush` eux-mêmes
+        tracker._task = mock.Mock(done=lambda: False)
+        return tracker
+
+    async def sent(self):
+        await self.tracker.flush()
+        sent, self.layer.sent = self.layer.sent, []
+        return [(group, sorted((u['user_id'], u['typing']) for u in message['updates'])) for group, message in sent]
+
+    async def test_window_coalesces_changes(self):
+        await self.tracker.record(1, 2, True)
+        await self.tracker.record(1, 2, False)
+        self.assertEqual(await self.sent(), [])
+        for _ in range(5):
+            await self.tracker.record(1, 2, True)
+        await self.tracker.record(3, 2, True)
+        self.assertEqual(await self.sent(), [('user_2', [(1, True), (3, True)])])
+        # Frappes continues: réannonce une fois par TTL / 2 seulement
+        self.now += 2
+        await self.tracker.record(1, 2, True)
+        self.assertEqual(await self.sent(), [])
+        self.now += 1
+        await self.tracker.record(1, 2, True)
+        self.assertEqual(await self.sent(), [('user_2', [(1, True)])])
+        await self.tracker.record(1, 2, False)
+        self.assertEqual(await self.sent(), [('user_2', [(1, False)])])
+        self.assertFalse(await self.tracker.record(1, 2, False))
+
+    async def test_ttl_expiry(self):
+        await self.tracker.record(1, 2, True)
+        await self.sent()
+        self.now += 5
+        await self.tracker.record(1, 2, True)  # Frappe: expiration repoussée
+        self.now += 5
+        self.tracker.expire()
+        self.assertTrue(self.tracker.is_typing(1, 2))
+        self.now += 1
+        self.tracker.expire()
+        self.assertFalse(self.tracker.is_typing(1, 2))
+        self.assertEqual(await self.sent(), [('user_2', [(1, False)])])
+
+    async def test_max_peers(self):
+        self.tracker = self.make_tracker(max_peers=2)
+        self.assertEqual([await self.tracker.record(1, peer, True) for peer in (10, 11, 12)], [True, True, False])
+        await self.tracker.record(1, 11, True)  # Interlocuteur déjà suivi: toujours accepté
+        await self.tracker.record(1, 10, False)
+        self.assertTrue(await self.tracker.record(1, 12, True))
+        self.assertEqual({group for group, _ in await self.sent()}, {'user_11', 'user_12'})
+
+    async def test_token_bucket(self):
+        self.tracker = self.make_tracker(max_peers=100, burst=3, rate=1.0)
+        self.assertEqual([await self.tracker.record(1, peer, True) for peer in range(10, 15)], [True] * 3 + [False] * 2)
+        self.assertTrue(await self.tracker.record(2, 10, True))  # Budget propre à chaque utilisateur
+        self.now += 1
+        self.assertEqual([await self.tracker.record(1, peer, True) for peer in (13, 14)], [True, False])
+        # Budget plein de nouveau: oublié par `expire`
+        self.now += 3
+        self.tracker.expire()
+        self.assertNotIn(1, self.tracker._budgets)
+
+    async def test_background_loop_flushes_then_stops(self):
+        tracker = TypingTracker(ttl=6.0, window=0.01, channel_layer=self.layer)
+        await tracker.record(1, 2, True)
+        await asyncio.sleep(0.05)
+        self.assertEqual([m['updates'] for _, m in self.layer.sent], [[{'user_id': 1, 'typing': True, 'ttl': 6.0}]])
+        self.now += 6
+        await asyncio.wait_for(tracker._task, 1)
+        self.assertEqual(self.layer.sent[-1][1]['updates'], [{'user_id': 1, 'typing': False, 'ttl': 6.0}])
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    """Déduplication par empreinte, y compris quand deux envois identiques se croisent."""
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=location)
+
+    def test_identical_content_is_stored_once(self):
+        first = self.storage.save('messages/a.webm', ContentFile(b'same'))
+        second = self.storage.save('messages/b.WEBM', ContentFile(b'same'))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^messages/[0-9a-f]{2}/[0-9a-f]{64}\.webm$')
+
+    def test_concurrent_identical_save_is_a_dedup_hit(self):
+        name = self.storage.save('messages/a.webm', ContentFile(b'same'))
+        # L'autre envoi a écrit le fichier après notre vérification `exists()`
+        with mock.patch.object(ContentAddressedStorage, 'exists', side_effect=[False, True]):
+            self.assertEqual(self.storage.save('messages/b.webm', ContentFile(b'same')), name)
+        with self.storage.open(name) as fh:
+            self.assertEqual(fh.read(), b'same')
+
+
+class FFmpegMediaProcessorTests(SimpleTestCase):
+    """Les appels ffmpeg sont bornés par `timeout`: un processus bloqué est tué."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def fake_ffmpeg(self, script):
+        path = os.path.join(self.dir, 'ffmpeg')
+        with open(path, 'w') as fh:
+            fh.write(f'#!/bin/sh\n{script}\n')
+        os.chmod(path, 0o755)
+        return FFmpegMediaProcessor(ffmpeg=path, waveform_points=4, timeout=0.5)
+
+    def test_hung_waveform_decoder_is_killed(self):
+        processor = self.fake_ffmpeg('exec sleep 30')
+        start = time.monotonic()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            processor._waveform('in.webm', 1.0)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_waveform_from_decoded_samples(self):
+        # 8000 échantillons 16 bits: 2000 à 0, puis 2000 à 16384, 2000 à -32768, 2000 à 0
+        processor = self.fake_ffmpeg(
+            "exec python3 -c \"import sys, array; sys.stdout.buffer.write("
+            "array.array('h', [0] * 2000 + [16384] * 2000 + [-32768] * 2000 + [0] * 2000).tobytes())\""
+        )
+        self.assertEqual(processor._waveform('in.webm', 1.0), [0.0, 0.5, 1.0, 0.0])
+
+    def test_decoder_failure(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.fake_ffmpeg('exit 1')._waveform('in.webm', 1.0)
+
+
+@override_settings(DB_EXECUTOR={'MAX_WORKERS': 0}, EVENT_LOG={'BACKEND': 'accounts.eventlog.DatabaseEventLogBackend'})
+class ChatConsumerSeqTests(TestCase):
+    """Événements en direct livrés dans le désordre: seuls les `seq` déjà transmis sont ignorés."""
+
+    def setUp(self):
+        for getter in (get_db_executor, get_event_log):
+            getter.cache_clear()
+            self.addCleanup(getter.cache_clear)
+        self.alice = make_user('alice')
+        self.log = get_event_log()
+
+    async def append(self, *ids):
+        return [await self.log.aappend(self.alice.id, 'message_created', {'id': id}) for id in ids]
+
+    async def deliver(self, seq):
+        await get_channel_layer().group_send(
+            f'user_{self.alice.id}', {'type': 'chat.message', 'event': 'message_created', 'data': {'id': seq}, 'seq': seq}
+        )
+
+    async def received_seqs(self, count):
+        return [(await self.ws.receive_json_from())['seq'] for _ in range(count)]
+
+    async def sync(self, after):
+        await self.ws.send_json_to({'type': 'sync', 'after': after})
+
+    def run_ws(self, scenario):
+        async def run():
+            self.ws = await connect_chat(self.alice)
+            try:
+                await scenario()
+            finally:
+                await self.ws.disconnect()
+        async_to_sync(run)()
+
+    def test_out_of_order_live_events_are_all_delivered(self):
+        async def scenario():
+            await self.sync(0)
+            self.assertEqual(await self.ws.receive_json_from(), {'type': 'sync_done', 'seq': 0})
+            await self.append(1, 2)
+            await self.deliver(2)
+            await self.deliver(1)
+            self.assertEqual(await self.received_seqs(2), [2, 1])
+            await self.deliver(1)
+            self.assertTrue(await self.ws.receive_nothing())
+        self.run_ws(scenario)
+
+    def test_live_events_already_replayed_are_dropped(self):
+        async def scenario():
+            await self.append(1, 2)
+            await self.sync(0)
+            self.assertEqual(await self.received_seqs(3), [1, 2, 2])
+            await self.deliver(2)
+            await self.append(3)
+            await self.deliver(3)
+            self.assertEqual(await self.received_seqs(1), [3])
+        self.run_ws(scenario)
+
+    def test_gap_is_replayed_from_log(self):
+        async def scenario():
+            await self.sync(0)
+            await self.ws.receive_json_from()
+            await self.append(1, 2, 3)
+            with mock.patch.object(ChatConsumer, 'SEQ_GAP_DELAY', 0):
+                await self.deliver(3)
+                self.assertEqual(await self.received_seqs(3), [3, 1, 2])
+            await self.deliver(1)
+            self.assertTrue(await self.ws.receive_nothing())
+        self.run_ws(scenario)
+
+    def test_no_watermark_before_sync(self):
+        async def scenario():
+            await self.append(1, 2)
+            await self.deliver(2)
+            await self.deliver(1)
+            self.assertEqual(await self.received_seqs(2), [2, 1])
+            self.assertTrue(await self.ws.receive_nothing())
+        self.run_ws(scenario)
+
+
+@override_settings(
+    DB_EXECUTOR={'MAX_WORKERS': 0},
+    EVENT_LOG={'BACKEND': 'accounts.eventlog.DatabaseEventLogBackend', 'OPTIONS': {'max_events': 3, 'trim_every': 1}},
+)
+class DatabaseEventLogTests(TestCase):
+    """Journal en base: numérotation par utilisateur, reprise après `after`, purge et diffusion groupée."""
+
+    def setUp(self):
+        for getter in (get_db_executor, get_event_log):
+            getter.cache_clear()
+            self.addCleanup(getter.cache_clear)
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.log = get_event_log()
+
+    def test_append_numbers_each_user_stream(self):
+        self.assertEqual([self.log.append(self.alice.id, 'message_created', {'id': n}) for n in (1, 2)], [1, 2])
+        self.assertEqual(self.log.append(self.bob.id, 'message_created', {'id': 3}), 1)
+        self.assertEqual(
+            self.log.append_many([(self.alice.id, 'message_read', {'id': 1}), (self.bob.id, 'message_read', {'id': 3})]),
+            [3, 2],
+        )
+        self.assertEqual((self.log.last_seq(self.alice.id), self.log.last_seq(self.bob.id)), (3, 2))
+
+    def test_read_after(self):
+        for n in (1, 2, 3):
+            self.log.append(self.alice.id, 'message_created', {'id': n})
+        self.assertEqual(self.log.read_after(self.alice.id, 1, 10), [(2, 'message_created', {'id': 2}), (3, 'message_created', {'id': 3})])
+        self.assertEqual(self.log.read_after(self.alice.id, 1, 1), [(2, 'message_created', {'id': 2})])
+        self.assertEqual(self.log.read_after(self.alice.id, 3, 10), [])
+        self.assertIsNone(self.log.read_after(self.alice.id, 4, 10))
+
+    def test_read_after_trimmed_seq_requires_reset(self):
+        for n in range(1, 6):
+            self.log.append(self.alice.id, 'message_created', {'id': n})
+        # max_events = 3: seq 1 et 2 purgés
+        self.assertIsNone(self.log.read_after(self.alice.id, 1, 10))
+        self.assertEqual([seq for seq, _, _ in self.log.read_after(self.alice.id, 2, 10)], [3, 4, 5])
+
+    def test_apublish_many_journals_then_broadcasts(self):
+        async def run():
+            layer = get_channel_layer()
+            channel = await layer.new_channel()
+            await layer.group_add(f'user_{self.alice.id}', channel)
+            await apublish_many([
+                (self.alice.id, 'message_created', {'id': 1}),
+                (self.bob.id, 'message_created', {'id': 1}),
+                (self.alice.id, 'message_read', {'id': 1}),
+            ])
+            received = [await layer.receive(channel) for _ in range(2)]
+            await layer.group_discard(f'user_{self.alice.id}', channel)
+            return received
+
+        received = async_to_sync(run)()
+        self.assertEqual(sorted((event['seq'], event['event']) for event in received), [(1, 'message_created'), (2, 'message_read')])
+        self.assertEqual(self.log.read_after(self.bob.id, 0, 10), [(1, 'message_created', {'id': 1})])
+
+    def sync(self, content, count):
+        async def run():
+            ws = await connect_chat(self.alice)
+            try:
+                await ws.send_json_to({'type': 'sync', **content})
+                return [await ws.receive_json_from() for _ in range(count)]
+            finally:
+                await ws.disconnect()
+        return async_to_sync(run)()
+
+    def test_sync_replays_in_batches(self):
+        for n in (1, 2, 3):
+            self.log.append(self.alice.id, 'message_created', {'id': n})
+        with mock.patch.object(ChatConsumer, 'SYNC_BATCH_SIZE', 2):
+            frames = self.sync({'after': 0}, 4)
+        self.assertEqual(
+            frames,
+            [{'type': 'message_created', 'seq': n, 'id': n} for n in (1, 2, 3)] + [{'type': 'sync_done', 'seq': 3}],
+        )
+
+    def test_sync_without_after_returns_state(self):
+        self.log.append(self.alice.id, 'message_created', {'id': 1})
+        self.assertEqual(self.sync({}, 1), [{'type': 'sync_state', 'seq': 1}])
+
+    def test_sync_after_trim_resets(self):
+        for n in range(1, 6):
+            self.log.append(self.alice.id, 'message_created', {'id': n})
+        self.assertEqual(self.sync({'after': 1}, 1), [{'type': 'sync_reset', 'seq': 5}])
+
+
+@unittest.skipUnless(os.getenv('TEST_REDIS_URL'), 'TEST_REDIS_URL non défini (Redis requis)')
+class RedisEventLogBackendTests(SimpleTestCase):
+    """Journal Redis: `seq` contigus par utilisateur, reprise, expiration par âge (clients synchrone et asynchrone)."""
+
+    def setUp(self):
+        self.log = RedisEventLogBackend(url=os.environ['TEST_REDIS_URL'], prefix='test-events', max_age=60)
+        self.log.redis.flushdb()
+
+    def test_append_and_read_after(self):
+        self.assertEqual([self.log.append(1, 'message_created', {'id': n}) for n in (1, 2)], [1, 2])
+        self.assertEqual(self.log.append_many([(2, 'message_read', {'id': 1}), (1, 'message_read', {'id': 2})]), [1, 3])
+        self.assertEqual((self.log.last_seq(1), self.log.last_seq(2), self.log.last_seq(3)), (3, 1, 0))
+        self.assertEqual(self.log.read_after(1, 1, 10), [(2, 'message_created', {'id': 2}), (3, 'message_read', {'id': 2})])
+        self.assertEqual(self.log.read_after(1, 1, 1), [(2, 'message_created', {'id': 2})])
+        self.assertEqual(self.log.read_after(1, 3, 10), [])
+        self.assertIsNone(self.log.read_after(1, 4, 10))
+
+    def test_async_client(self):
+        async def run():
+            seqs = await self.log.aappend_many([(1, 'message_created', {'id': 1}), (1, 'message_created', {'id': 2})])
+            return seqs, await self.log.aappend(1, 'message_read', {'id': 1}), await self.log.aread_after(1, 2, 10), await self.log.alast_seq(1)
+
+        self.assertEqual(async_to_sync(run)(), ([1, 2], 3, [(3, 'message_read', {'id': 1})], 3))
+
+    def test_read_after_expired_event_requires_reset(self):
+        with mock.patch('accounts.eventlog.time', mock.Mock(time=lambda: time.time() - 120)):
+            self.log.append(1, 'message_created', {'id': 1})
+        self.log.append(1, 'message_created', {'id': 2})
+        self.assertIsNone(self.log.read_after(1, 0, 10))
+        self.assertEqual(self.log.read_after(1, 1, 10), [(2, 'message_created', {'id': 2})])
+
+
+@override_settings(MESSAGE_SEARCH={'BACKEND': 'accounts.search.InMemorySearchBackend'})
+class InMemorySearchBackendTests(TestCase):
+    """Index de recherche local (SQLite): messages de l'utilisateur seulement, pagination `(rank, id)` bornée."""
+
+    def setUp(self):
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+        self.alice, self.bob, self.carol = make_user('alice'), make_user('bob'), make_user('carol')
+        self.to_bob = Message.objects.create(sender=self.alice, receiver=self.bob, content='lunch tomorrow?')
+        self.from_carol = Message.objects.create(sender=self.carol, receiver=self.alice, content='Lunch at noon, lunch!')
+        Message.objects.create(sender=self.bob, receiver=self.carol, content='lunch without alice')
+        self.backend = get_search_backend()
+
+    def ids(self, hits):
+        return [hit['id'] for hit in hits]
+
+    def test_only_participant_messages_with_all_terms(self):
+        self.assertEqual(set(self.ids(self.backend.search(self.alice.id, 'lunch', 10))), {self.to_bob.id, self.from_carol.id})
+        self.assertEqual(self.ids(self.backend.search(self.alice.id, 'lunch noon', 10)), [self.from_carol.id])
+        self.assertEqual(self.ids(self.backend.search(self.alice.id, 'lunch', 10, peer_id=self.bob.id)), [self.to_bob.id])
+        hit = self.backend.search(self.alice.id, 'noon', 10)[0]
+        self.assertEqual(hit['highlight'], 'Lunch at <mark>noon</mark>, lunch!')
+
+    def test_new_messages_are_indexed(self):
+        self.backend.search(self.alice.id, 'lunch', 10)
+        message = Message.objects.create(sender=self.bob, receiver=self.alice, content='pizza')
+        self.assertEqual(self.ids(self.backend.search(self.alice.id, 'pizza', 10)), [message.id])
+
+    def test_cursor_and_max_id(self):
+        first = self.backend.search(self.alice.id, 'lunch', 1, max_id=self.from_carol.id)
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='lunch lunch lunch')
+        second = self.backend.search(
+            self.alice.id, 'lunch', 10, cursor=(first[0]['rank'], first[0]['id']), max_id=self.from_carol.id,
+        )
+        self.assertEqual(sorted(self.ids(first + second)), [self.to_bob.id, self.from_carol.id])
+
+
+class SearchMessagesTests(TestCase):
+    """Endpoint `messages/search/`: pages stables malgré les nouveaux messages."""
+
+    def setUp(self):
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+        self.alice, self.bob = make_user('alice'), make_user('bob')
+        self.messages = [
+            Message.objects.create(sender=self.bob, receiver=self.alice, content=' '.join(['report'] * n + ['draft']))
+            for n in (1, 2, 3)
+        ]
+        # Fenêtre de candidats réduite: sans borne figée, chaque nouveau message en chasserait un
+        get_search_backend().max_candidates = len(self.messages)
+        self.client = api_client(self.alice)
+
+    def search(self, **params):
+        response = self.client.get(reverse('search_messages'), {'q': 'report', 'limit': 1, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_do_not_repeat_or_skip(self):
+        seen = []
+        page = self.search()
+        seen += [hit['id'] for hit in page['results']]
+        while page['has_more']:
+            # Nouveau message entre deux pages: absent de cette pagination
+            Message.objects.create(sender=self.bob, receiver=self.alice, content='report')
+            page = self.search(cursor=page['next'])
+            seen += [hit['id'] for hit in page['results']]
+        self.assertEqual(sorted(seen), [message.id for message in self.messages])
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('search_messages'), {'q': 'report', 'cursor': '1.0_2'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RevocationTests(SimpleTestCase):
+    """Liste de révocation: `iat` en secondes entières, cache local borné par `local_ttl`."""
+
+    def setUp(self):
+        self.backend = InMemoryRevocationBackend(local_ttl=30)
+
+    def is_revoked(self, iat, user_id=1):
+        return async_to_sync(self.backend.is_revoked)({'user_id': user_id, 'iat': iat})
+
+    def test_tokens_issued_up_to_the_revocation_second_are_refused(self):
+        with mock.patch('accounts.revocation.time.time', return_value=1000.7):
+            self.backend.revoke_user(1)
+            self.assertTrue(self.is_revoked(999))
+            self.assertTrue(self.is_revoked(1000))
+            self.assertFalse(self.is_revoked(1001))
+            self.assertFalse(self.is_revoked(1000, user_id=2))
+
+    def test_remote_revocation_is_seen_after_local_ttl(self):
+        self.assertFalse(self.is_revoked(int(time.time())))
+        # Révocation par un autre processus: le cache local n'est pas invalidé
+        self.backend._store(1, time.time() + 1)
+        self.assertFalse(self.is_revoked(int(time.time())))
+        with mock.patch('accounts.caching.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertTrue(self.is_revoked(int(time.time())))
+
+    def test_revocation_expires_after_retention(self):
+        self.backend.revoke_user(1)
+        self.backend.local.clear()
+        with mock.patch('accounts.revocation.time.time', return_value=time.time() + self.backend.retention + 1):
+            self.assertFalse(self.is_revoked(0))
+
+
+@override_settings(DB_EXECUTOR={'MAX_WORKERS': 0})
+class ChatConsumerAuthTests(TestCase):
+    """Connexion WebSocket: jeton signé, non révoqué, compte actif."""
+
+    def setUp(self):
+        for getter in (get_db_executor, get_revocation_backend):
+            getter.cache_clear()
+            self.addCleanup(getter.cache_clear)
+        self.alice = make_user('alice')
+
+    def connects(self, token):
+        async def run():
+            communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f'/ws/chat/?token={token}')
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+        return async_to_sync(run)()
+
+    def test_valid_token(self):
+        self.assertTrue(self.connects(JWTAuthentication.generate_token(self.alice)))
+
+    def test_invalid_token(self):
+        self.assertFalse(self.connects('nope'))
+
+    def test_revoked_token(self):
+        token = JWTAuthentication.generate_token(self.alice)
+        get_revocation_backend().revoke_user(self.alice.id)
+        self.assertFalse(self.connects(token))
+
+    def test_inactive_user(self):
+        # Désactivation sans signal (QuerySet.update): pas de révocation, refus par `is_active`
+        token = JWTAuthentication.generate_token(self.alice)
+        User.objects.filter(id=self.alice.id).update(is_active=False)
+        invalidate_cached_user(self.alice.id)
+        self.assertFalse(self.connects(token))
+
+
+class CachedUserTests(TestCase):
+    """Utilisateur authentifié servi par le cache local puis partagé, invalidé par `User.save`."""
+
+    def setUp(self):
+        self.alice = make_user('alice')
+        invalidate_cached_user(self.alice.id)
+        self.addCleanup(invalidate_cached_user, self.alice.id)
+
+    def test_cached_after_first_lookup(self):
+        with self.assertNumQueries(1):
+            get_cached_user(self.alice.id)
+        with self.assertNumQueries(0):
+            user = get_cached_user(self.alice.id)
+        self.assertEqual((user.id, user.email), (self.alice.id, self.alice.email))
+        self.assertNotIn('password', user.__dict__)
+
+    def test_shared_tier_serves_other_processes(self):
+        get_cached_user(self.alice.id)
+        # Autre processus: cache local vide, cache partagé rempli
+        tokenauthentications._local_users.clear()
+        with self.assertNumQueries(0):
+            get_cached_user(self.alice.id)
+
+    def test_save_invalidates(self):
+        get_cached_user(self.alice.id)
+        self.alice.first_name = 'Alice'
+        self.alice.save()
+        self.assertEqual(get_cached_user(self.alice.id).first_name, 'Alice')
+
+    def test_unknown_user(self):
+        with self.assertRaises(User.DoesNotExist):
+            get_cached_user(self.alice.id + 1000)
+
+    def test_deactivated_user_is_refused(self):
+        client = api_client(self.alice)
+        self.assertEqual(client.get('/users/').status_code, 200)
+        self.alice.is_active = False
+        self.alice.save()
+        self.assertIn(client.get('/users/').status_code, (401, 403))
+
+    def test_remote_deactivation_is_seen_after_local_ttl(self):
+        client = api_client(self.alice)
+        client.get('/users/')
+        # Désactivation par un autre processus: seul le cache partagé est invalidé ici
+        User.objects.filter(id=self.alice.id).update(is_active=False)
+        cache.delete(tokenauthentications._user_cache_key(self.alice.id))
+        self.assertEqual(client.get('/users/').status_code, 200)
+        ttl = tokenauthentications._local_users.ttl
+        with mock.patch('accounts.caching.time.monotonic', return_value=time.monotonic() + ttl + 1):
+            self.assertIn(client.get('/users/').status_code, (401, 403))
+
+
+class ConversationSummaryTests(TestCase):
+    """Résumés de conversation: mise à jour incrémentale, recalcul complet et endpoint `conversations/`."""
+
+    def setUp(self):
+        self.alice, self.bob, self.carol = make_user('alice'), make_user('bob'), make_user('carol')
+
+    def summary(self, user, peer):
+        return ConversationSummary.objects.get(user=user, peer=peer)
+
+    def test_record_message_on_create(self):
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='hello')
+        last = Message.objects.create(sender=self.bob, receiver=self.alice, content='')
+        received, sent = self.summary(self.alice, self.bob), self.summary(self.bob, self.alice)
+        self.assertEqual((received.unread_count, sent.unread_count), (2, 0))
+        self.assertEqual((received.last_message_id, received.last_message_preview), (last.id, 'text'))
+        Message.objects.create(sender=self.alice, receiver=self.alice, content='note')
+        self.assertEqual(self.summary(self.alice, self.alice).unread_count, 0)
+
+    def test_upsert_retries_after_concurrent_create(self):
+        message = Message.objects.create(sender=self.bob, receiver=self.alice, content='hello')
+        ConversationSummary.objects.all().delete()
+        real_atomic = transaction.atomic
+
+        @contextmanager
+        def racing_atomic():
+            # Résumé créé par une autre requête entre l'UPDATE (0 ligne) et l'INSERT
+            ConversationSummary.objects.create(user=self.alice, peer=self.bob, unread_count=2)
+            with real_atomic():
+                yield
+
+        with mock.patch('accounts.summaries.transaction.atomic', racing_atomic):
+            summaries._upsert(self.alice.id, self.bob.id, message, 1)
+        summary = self.summary(self.alice, self.bob)
+        self.assertEqual((summary.unread_count, summary.last_message_id), (3, message.id))
+
+    def test_record_messages_batch(self):
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='before')
+        batch = Message.objects.bulk_create([
+            Message(sender=self.bob, receiver=self.alice, content='one'),
+            Message(sender=self.bob, receiver=self.alice, content='two'),
+            Message(sender=self.alice, receiver=self.carol, content='three'),
+        ])
+        summaries.record_messages(batch)
+        self.assertEqual(self.summary(self.alice, self.bob).unread_count, 3)
+        self.assertEqual(self.summary(self.alice, self.bob).last_message_preview, 'two')
+        self.assertEqual((self.summary(self.carol, self.alice).unread_count, self.summary(self.alice, self.carol).unread_count), (1, 0))
+        self.assertEqual(self.summary(self.alice, self.carol).last_message_id, batch[2].id)
+
+    def test_record_read_never_goes_negative(self):
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='hello')
+        summaries.record_read(self.alice.id, self.bob.id, 5)
+        self.assertEqual(self.summary(self.alice, self.bob).unread_count, 0)
+
+    def test_rebuild_summaries(self):
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='one')
+        read = Message.objects.create(sender=self.bob, receiver=self.alice, content='two')
+        last = Message.objects.create(sender=self.alice, receiver=self.bob, content='three')
+        Message.objects.filter(id=read.id).update(read_at=read.created_at)
+        ConversationSummary.objects.update(unread_count=42, last_message=None)
+        self.assertEqual(summaries.rebuild_summaries(), 2)
+        self.assertEqual((self.summary(self.alice, self.bob).unread_count, self.summary(self.bob, self.alice).unread_count), (1, 1))
+        self.assertEqual(self.summary(self.alice, self.bob).last_message_id, last.id)
+
+    def test_list_conversations(self):
+        moment = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        for minutes, peer in enumerate((self.bob, self.carol)):
+            message = Message.objects.create(sender=peer, receiver=self.alice, content=f'from {peer.username}')
+            Message.objects.filter(id=message.id).update(created_at=moment + timedelta(minutes=minutes))
+        summaries.rebuild_summaries()
+        client = api_client(self.alice)
+
+        page = client.get(reverse('list_conversations'), {'limit': 1}).json()
+        self.assertEqual([(c['peer']['id'], c['unread_count'], c['last_message']['preview']) for c in page['results']],
+                         [(self.carol.id, 1, 'from carol')])
+        self.assertTrue(page['has_more'])
+        page = client.get(reverse('list_conversations'), {'limit': 1, 'before': page['before']}).json()
+        self.assertEqual([c['peer']['id'] for c in page['results']], [self.bob.id])
+        self.assertFalse(page['has_more'])
+        self.assertEqual(client.get(reverse('list_conversations'), {'before': 'x'}).status_code, 400)
+        self.assertEqual(api_client(make_user('dave')).get(reverse('list_conversations')).json()['results'], [])
+
+
+class ListUsersTests(TestCase):
+    """Annuaire en deux phases: contacts récents (curseur `c...`), puis autres utilisateurs (`u<id>`)."""
+
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob, self.carol = make_user('bob'), make_user('carol')
+        self.others = [make_user(name) for name in ('dave', 'erin', 'frank')]
+        moment = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        for minutes, peer in enumerate((self.bob, self.carol)):
+            message = Message.objects.create(sender=peer, receiver=self.alice, content='hi')
+            ConversationSummary.objects.filter(last_message=message).update(last_message_at=moment + timedelta(minutes=minutes))
+        self.client = api_client(self.alice)
+
+    def get(self, **params):
+        response = self.client.get(reverse('list_users'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, **params):
+        pages = []
+        page = self.get(**params)
+        while True:
+            pages.append([(u['id'], u['recent']) for u in page['results']])
+            if not page['has_more']:
+                return pages
+            page = self.get(**params, cursor=page['next'])
+
+    def test_contacts_then_directory(self):
+        dave, erin, frank = (u.id for u in self.others)
+        self.assertEqual(self.walk(limit=2), [
+            [(self.carol.id, True), (self.bob.id, True)],
+            [(dave, False), (erin, False)],
+            [(frank, False)],
+        ])
+        # Changement de phase au milieu d'une page
+        self.assertEqual(self.walk(limit=3), [
+            [(self.carol.id, True), (self.bob.id, True), (dave, False)],
+            [(erin, False), (frank, False)],
+        ])
+
+    def test_contacts_paged_by_activity(self):
+        page = self.get(limit=1)
+        self.assertEqual([u['id'] for u in page['results']], [self.carol.id])
+        self.assertTrue(page['next'].startswith('c'))
+        self.assertEqual([u['id'] for u in self.get(limit=1, cursor=page['next'])['results']], [self.bob.id])
+
+    def test_prefix_filter_in_both_phases(self):
+        self.assertEqual(self.walk(q='CA'), [[(self.carol.id, True)]])
+        self.assertEqual(self.walk(q='fr'), [[(self.others[2].id, False)]])
+        self.assertEqual(self.walk(q='zz'), [[]])
+
+    def test_tampered_cursor(self):
+        for cursor in ('x1', 'u', 'u1x', 'cnope', 'c12'):
+            response = self.client.get(reverse('list_users'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+
+
+@override_settings(DB_EXECUTOR={'MAX_WORKERS': 0})
+class ChunkedUploadTests(TestCase):
+    """Envoi par morceaux: reprise, offset refusé, finalisation unique."""
+
+    def setUp(self):
+        get_db_executor.cache_clear()
+        self.addCleanup(get_db_executor.cache_clear)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.alice, self.bob = make_user('alice'), make_user('bob')
+        self.client = api_client(self.alice)
+        self.data = b'0123456789'
+        response = self.client.post(reverse('create_upload'), {
+            'receiver': self.bob.id, 'message_type': 'audio', 'filename': 'voice.webm',
+            'size': len(self.data), 'content_type': 'audio/webm',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.upload_id = response.json()['id']
+        self.url = reverse('upload_detail', args=[self.upload_id])
+
+    def put(self, offset, chunk):
+        return self.client.put(f'{self.url}?offset={offset}', data=chunk, content_type='application/octet-stream')
+
+    def finalize(self):
+        return self.client.post(reverse('finalize_upload', args=[self.upload_id]))
+
+    def test_resume_after_interruption(self):
+        self.assertEqual(self.put(0, self.data[:4]).json()['offset'], 4)
+        # Reprise: le client relit l'offset courant puis envoie la suite
+        self.assertEqual(self.client.get(self.url).json(), {'id': self.upload_id, 'offset': 4, 'size': 10})
+        self.assertEqual(self.put(4, self.data[4:]).json()['offset'], 10)
+        response = self.finalize()
+        self.assertEqual(response.status_code, 201, response.content)
+        message = Message.objects.get(id=response.json()['id'])
+        with message.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.data)
+
+    def test_offset_mismatch(self):
+        self.put(0, self.data[:4])
+        # Même morceau renvoyé (requête dupliquée): refusé, offset attendu renvoyé
+        response = self.put(0, self.data[:4])
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 4))
+        self.assertEqual(self.put(6, self.data[6:]).status_code, 409)
+        self.assertEqual(self.put(4, self.data[4:] + b'extra').status_code, 409)
+        self.assertEqual(MediaUpload.objects.get(id=self.upload_id).received_size, 4)
+
+    def test_finalize_incomplete(self):
+        self.put(0, self.data[:4])
+        response = self.finalize()
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 4))
+
+    def test_double_finalize(self):
+        self.put(0, self.data)
+        first = self.finalize()
+        second = self.finalize()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((second.status_code, second.json()['message']), (409, first.json()['id']))
+        self.assertEqual(Message.objects.filter(sender=self.alice).count(), 1)
+        self.assertEqual(self.put(10, b'x').status_code, 404)
+
+    def test_other_users_upload(self):
+        self.assertEqual(api_client(self.bob).get(self.url).status_code, 404)
+        self.assertEqual(api_client(self.bob).post(reverse('finalize_upload', args=[self.upload_id])).status_code, 404)
+
+    def test_delete(self):
+        self.put(0, self.data[:4])
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertFalse(MediaUpload.objects.filter(id=self.upload_id).exists())
+
+
+@override_settings(DB_EXECUTOR={'MAX_WORKERS': 0})
+class MediaJobTests(TestCase):
+    """File `MediaJob`: réservation, reprise des verrous expirés, échecs replanifiés, worker."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_db_executor.cache_clear()
+        self.addCleanup(get_db_executor.cache_clear)
+        self.alice, self.bob = make_user('alice'), make_user('bob')
+
+    def media_message(self, data=b'0123456789' * 100):
+        message = Message(sender=self.alice, receiver=self.bob, message_type='audio')
+        message.file.save('voice.webm', ContentFile(data), save=False)
+        message.save()
+        return message
+
+    def claim(self, message):
+        self.assertEqual(mediajobs.claim_jobs(10), [message.media_job.id])
+        return MediaJob.objects.get(message=message)
+
+    def test_claim_jobs(self):
+        ready, later = self.media_message(), self.media_message(b'other')
+        MediaJob.objects.filter(message=later).update(available_at=django_timezone.now() + timedelta(minutes=5))
+        job = self.claim(ready)
+        self.assertEqual((job.status, job.attempts), ('running', 1))
+        self.assertEqual(mediajobs.claim_jobs(10), [])
+        # Worker arrêté: verrou expiré, tâche reprise
+        MediaJob.objects.filter(id=job.id).update(locked_at=job.locked_at - timedelta(seconds=601))
+        self.assertEqual(self.claim(ready).attempts, 2)
+
+    def test_fail_job_backoff_then_failed(self):
+        message = self.media_message()
+        job = self.claim(message)
+        before = django_timezone.now()
+        self.assertTrue(mediajobs.fail_job(job, 'boom'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error, job.locked_at), ('pending', 'boom', None))
+        self.assertGreaterEqual(job.available_at, before + timedelta(seconds=30))
+        for attempt in (2, 3):
+            MediaJob.objects.filter(id=job.id).update(available_at=django_timezone.now())
+            job = self.claim(message)
+            self.assertEqual(job.attempts, attempt)
+            mediajobs.fail_job(job, 'boom')
+        job.refresh_from_db()
+        message.refresh_from_db()
+        self.assertEqual((job.status, message.media_status), ('failed', 'failed'))
+
+    def test_stale_completion_is_dropped(self):
+        message = self.media_message()
+        stale = self.claim(message)
+        MediaJob.objects.filter(id=stale.id).update(locked_at=stale.locked_at - timedelta(seconds=601))
+        current = self.claim(message)
+        with self.assertLogs('accounts.mediajobs', 'WARNING'):
+            self.assertFalse(mediajobs.complete_job(stale, {'duration': 1.0}))
+            self.assertFalse(mediajobs.fail_job(stale, 'late'))
+        message.refresh_from_db()
+        self.assertEqual(message.media_status, 'pending')
+        self.assertTrue(mediajobs.complete_job(current, {'duration': 2.0, 'waveform': [1, 2]}))
+        message.refresh_from_db()
+        self.assertEqual((message.media_status, message.duration, message.waveform), ('ready', 2.0, [1, 2]))
+        self.assertEqual(MediaJob.objects.get(id=current.id).status, 'done')
+
+    def test_run_worker_once(self):
+        messages = [self.media_message(), self.media_message(b'x' * 4096)]
+        self.assertEqual(mediajobs.run_worker(workers=1, once=True), 2)
+        for message in messages:
+            message.refresh_from_db()
+            self.assertEqual(message.media_status, 'ready')
+            self.assertIsNotNone(message.waveform)
+        self.assertEqual(set(MediaJob.objects.values_list('status', flat=True)), {'done'})
+
+
+class SendMessageBatchTests(TestCase):
+    """`POST messages/send/batch/`: validation du corps, résultats par élément, statut selon la présence."""
+
+    def setUp(self):
+        get_presence_backend.cache_clear()
+        self.addCleanup(get_presence_backend.cache_clear)
+        self.alice, self.bob, self.carol = make_user('alice'), make_user('bob'), make_user('carol')
+        self.client = api_client(self.alice)
+        self.url = reverse('send_message_batch')
+
+    def test_body_must_be_an_object(self):
+        for body in ([{'receiver': self.bob.id, 'content': 'hi'}], 'hi', 3):
+            response = self.client.post(self.url, body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(response.json(), {'detail': 'Request body must be a JSON object.'})
+        self.assertFalse(Message.objects.exists())
+
+    def test_invalid_batches(self):
+        for body in ({}, {'items': []}, {'receivers': 'bob', 'content': 'hi'}):
+            self.assertEqual(self.client.post(self.url, body, format='json').status_code, 400, body)
+        response = self.client.post(self.url, {'items': [{'receiver': 'x', 'content': 'hi'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['results'], [{'index': 0, 'receiver': 'x', 'error': 'Invalid receiver.'}])
+
+    def test_results_follow_items_and_presence(self):
+        async_to_sync(get_presence_backend().connect)(self.bob.id, 'tab')
+        response = self.client.post(self.url, {'items': [
+            {'receiver': self.bob.id, 'content': 'hi bob'},
+            {'receiver': 999999, 'content': 'lost'},
+            {'receiver': self.carol.id, 'content': ' '},
+            {'receiver': self.carol.id, 'content': 'hi carol'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        results = response.json()['results']
+        self.assertEqual([(r['index'], r.get('status'), r.get('error')) for r in results], [
+            (0, 'delivered', None), (1, None, 'Unknown receiver.'), (2, None, 'Invalid content.'), (3, 'sent', None),
+        ])
+        self.assertEqual(
+            list(Message.objects.order_by('id').values_list('receiver_id', 'content', 'status')),
+            [(self.bob.id, 'hi bob', 'delivered'), (self.carol.id, 'hi carol', 'sent')],
+        )
+        self.assertEqual([event for _, event, _ in get_event_log().read_after(self.alice.id, 0, 10)], ['messages_created'])
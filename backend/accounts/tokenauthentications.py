@@ -4,35 +4,93 @@ from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.authentication import BaseAuthentication
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
 from datetime import datetime, timezone
 from datetime import timedelta
 
+from .caching import MISSING, TTLCache
+from .dbexecutor import run_db
+
+# Durée de validité des jetons émis par `generate_token`
+TOKEN_LIFETIME = timedelta(minutes=30)
+
+# Cache des utilisateurs authentifiés: niveau local (processus) devant le cache partagé (Redis).
+# Le TTL local borne le délai avant qu'une désactivation faite ailleurs soit vue par ce processus.
+USER_CACHE = getattr(settings, 'AUTH_USER_CACHE', {})
+_local_users = TTLCache(maxsize=USER_CACHE.get('LOCAL_MAXSIZE', 10_000), ttl=USER_CACHE.get('LOCAL_TTL', 5))
+
+
+def _user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def get_cached_user(user_id):
+    """Retourne l'utilisateur `user_id` via le cache local puis le cache partagé, sinon la base.
+
+    Le mot de passe n'est jamais mis en cache: il reste différé sur l'instance reconstruite.
+    Lève `DoesNotExist` si l'utilisateur n'existe pas.
+    """
+    User = get_user_model()
+    row = _local_users.get(user_id)
+    if row is MISSING:
+        key = _user_cache_key(user_id)
+        row = cache.get(key)
+        if row is None:
+            field_names = [f.attname for f in User._meta.concrete_fields if f.attname != 'password']
+            values = User.objects.filter(id=user_id).values_list(*field_names).first()
+            if values is None:
+                raise User.DoesNotExist
+            row = (field_names, values)
+            cache.set(key, row, USER_CACHE.get('TTL', 300))
+        _local_users.set(user_id, row)
+    field_names, values = row
+    return User.from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+
+async def aget_cached_user(user_id):
+    """Version asynchrone de `get_cached_user`: sans changer de thread si le cache local suffit."""
+    row = _local_users.get(user_id)
+    if row is MISSING:
+        return await run_db(get_cached_user, user_id)
+    field_names, values = row
+    return get_user_model().from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+
+def invalidate_cached_user(user_id):
+    """Supprime l'utilisateur des caches (local et partagé) après modification."""
+    _local_users.delete(user_id)
+    cache.delete(_user_cache_key(user_id))
+
 class JWTAuthentication(BaseAuthentication):
     """Authentication DRF basée sur un JWT court (HS256).
 
     - Extrait le token de l'en-tête `Authorization: Bearer ...`
     - Vérifie la signature et l'expiration
-    - Récupère l'utilisateur à partir du `user_id` dans le payload
+    - Récupère l'utilisateur à partir du `user_id` dans le payload (via `get_cached_user`)
     """
     def authenticate(self, request):
         token = self.extract_token(request)
         if token:
             try:
                 payload = self.verify_token(token)
-                user = get_user_model().objects.get(id=payload['user_id'])
-                return (user, token)
-            except AuthenticationFailed:
+                user = get_cached_user(payload['user_id'])
+            except (AuthenticationFailed, KeyError, get_user_model().DoesNotExist):
                 raise AuthenticationFailed('Invalid token.')
+            if not user.is_active:
+                raise AuthenticationFailed('User is not active.')
+            return (user, token)
         return None
         
     @staticmethod
     def generate_token(user):
         """Génère un JWT de courte durée (30 min) pour l'utilisateur donné."""
-        expiration_time = datetime.now(timezone.utc) + timedelta(minutes=30)
+        issued_at = datetime.now(timezone.utc)
         payload = {
             'user_id': user.id,
             'email': user.email,
-            'exp': expiration_time,
+            'iat': issued_at,
+            'exp': issued_at + TOKEN_LIFETIME,
         }
         token = jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
         return token
@@ -55,4 +113,14 @@ class JWTAuthentication(BaseAuthentication):
         except ExpiredSignatureError:
             raise AuthenticationFailed('Token has expired.')
         except Exception as e:
-            raise AuthenticationFailed(str(e))
\ No newline at end of file
+            raise AuthenticationFailed(str(e))
+
+
+class MediaJWTAuthentication(JWTAuthentication):
+    """Variante pour les médias: jeton accepté aussi en query string (`?token=`).
+
+    Les éléments `<audio>`/`<video>` du navigateur ne peuvent pas envoyer d'en-tête
+    `Authorization` (même contrainte que la WebSocket).
+    """
+    def extract_token(self, request):
+        return super().extract_token(request) or request.GET.get('token') or None
@@ -0,0 +1,151 @@
+"""Indicateurs de saisie ("en train d'écrire"), éphémères et à débit borné.
+
+Le client envoie la commande `typing` (`{to, typing}`) aussi souvent qu'il veut
+(à chaque frappe); `TypingTracker` n'en retient qu'un état par couple
+`(utilisateur, interlocuteur)`, local au processus et expirant après `TTL` secondes
+sans nouvelle frappe. Les changements sont regroupés sur une courte fenêtre
+(`BATCH_WINDOW`) puis envoyés à l'interlocuteur en un seul `typing.batch`
+(groupe `user_<id>`), sans passer par la base ni par le journal d'événements
+(`accounts.eventlog`): pas de `seq`, rien à rejouer après reconnexion.
+
+Charge bornée sur la couche channels, même face à un client qui abuse:
+- un début de saisie déjà annoncé n'est réannoncé qu'une fois par `TTL / 2`
+  (le client de l'interlocuteur efface l'indicateur au bout de `ttl` secondes)
+- un début puis une fin dans la même fenêtre ne produisent rien
+- au plus `MAX_PEERS` interlocuteurs simultanés par utilisateur, et un budget
+  d'annonces par utilisateur (`RATE` par seconde, rafale `BURST`)
+"""
+import asyncio
+import time
+from functools import lru_cache
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+DEFAULTS = {
+    'TTL': 6.0,
+    'BATCH_WINDOW': 0.25,
+    'MAX_PEERS': 5,
+    'RATE': 1.0,
+    'BURST': 10,
+}
+
+
+def typing_setting(name):
+    return getattr(settings, 'TYPING', {}).get(name, DEFAULTS[name])
+
+
+class TypingTracker:
+    """États de saisie du processus et diffusion regroupée de leurs changements."""
+
+    def __init__(self, ttl=DEFAULTS['TTL'], window=DEFAULTS['BATCH_WINDOW'], max_peers=DEFAULTS['MAX_PEERS'],
+                 rate=DEFAULTS['RATE'], burst=DEFAULTS['BURST'], channel_layer=None):
+        self.ttl = ttl
+        self.window = window
+        self.max_peers = max_peers
+        self.rate = rate
+        self.burst = burst
+        self.channel_layer = channel_layer
+        # user_id -> {peer_id: [expiration, dernière annonce]} (horloge monotone)
+        self._states = {}
+        # (user_id, peer_id) -> état au début de la fenêtre; réannonces en attente
+        self._pending = {}
+        self._refreshes = set()
+        # user_id -> (jetons restants, instant du dernier calcul)
+        self._budgets = {}
+        self._task = None
+
+    def is_typing(self, user_id, peer_id):
+        return peer_id in self._states.get(user_id, ())
+
+    def _take(self, user_id, now):
+        """Consomme une annonce du budget de `user_id`; `False` si le budget est épuisé."""
+        tokens, at = self._budgets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - at) * self.rate)
+        if tokens < 1:
+            self._budgets[user_id] = (tokens, now)
+            return False
+        self._budgets[user_id] = (tokens - 1, now)
+        return True
+
+    def _changed(self, user_id, peer_id, initial):
+        self._pending.setdefault((user_id, peer_id), initial)
+
+    async def record(self, user_id, peer_id, typing):
+        """Enregistre une frappe (`typing=True`) ou une fin de saisie. Retourne `False` si ignorée."""
+        now = time.monotonic()
+        peers = self._states.get(user_id, {})
+        state = peers.get(peer_id)
+        if typing:
+            if state is None:
+                if len(peers) >= self.max_peers or not self._take(user_id, now):
+                    return False
+                self._states.setdefault(user_id, {})[peer_id] = [now + self.ttl, now]
+                self._changed(user_id, peer_id, False)
+            else:
+                state[0] = now + self.ttl
+                # Réannonce avant expiration côté client, dans la limite du budget
+                if now - state[1] >= self.ttl / 2 and self._take(user_id, now):
+                    state[1] = now
+                    self._refreshes.add((user_id, peer_id))
+        elif state is not None:
+            self._stop(user_id, peer_id)
+        else:
+            return False
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return True
+
+    def _stop(self, user_id, peer_id):
+        peers = self._states[user_id]
+        del peers[peer_id]
+        if not peers:
+            del self._states[user_id]
+        self._changed(user_id, peer_id, True)
+
+    def expire(self, now=None):
+        """Termine les saisies sans frappe depuis `ttl` secondes et oublie les budgets pleins."""
+        now = time.monotonic() if now is None else now
+        for user_id, peers in list(self._states.items()):
+            for peer_id, (expires, _) in list(peers.items()):
+                if expires <= now:
+                    self._stop(user_id, peer_id)
+        for user_id, (tokens, at) in list(self._budgets.items()):
+            if tokens + (now - at) * self.rate >= self.burst:
+                del self._budgets[user_id]
+
+    async def _run(self):
+        # Actif tant qu'il reste des saisies en cours ou des changements à diffuser
+        while self._states or self._pending:
+            await asyncio.sleep(self.window)
+            self.expire()
+            await self.flush()
+        self.expire()
+
+    async def flush(self):
+        """Diffuse les changements nets de la fenêtre: un `typing.batch` par interlocuteur."""
+        pending, self._pending = self._pending, {}
+        refreshes, self._refreshes = self._refreshes, set()
+        by_peer = {}
+        for user_id, peer_id in pending.keys() | refreshes:
+            typing = self.is_typing(user_id, peer_id)
+            if pending.get((user_id, peer_id), typing) == typing and not (typing and (user_id, peer_id) in refreshes):
+                continue
+            by_peer.setdefault(peer_id, []).append({'user_id': user_id, 'typing': typing, 'ttl': self.ttl})
+        if not by_peer:
+            return
+        layer = self.channel_layer or get_channel_layer()
+        for peer_id, updates in by_peer.items():
+            await layer.group_send(f"user_{peer_id}", {'type': 'typing.batch', 'updates': updates})
+
+
+@lru_cache(maxsize=None)
+def get_typing_tracker():
+    """Suivi des saisies du processus courant (réglage `settings.TYPING`)."""
+    return TypingTracker(
+        ttl=typing_setting('TTL'),
+        window=typing_setting('BATCH_WINDOW'),
+        max_peers=typing_setting('MAX_PEERS'),
+        rate=typing_setting('RATE'),
+        burst=typing_setting('BURST'),
+    )
@@ -0,0 +1,110 @@
+"""Envoi de médias par morceaux, sans charger le fichier en mémoire.
+
+Déroulé côté client:
+1) `POST /uploads/` avec les métadonnées (type, nom, taille, type MIME): limites vérifiées d'emblée
+2) `PUT /uploads/<id>/?offset=<n>` avec les octets bruts du morceau, autant de fois que nécessaire
+   (`GET /uploads/<id>/` renvoie l'offset courant pour reprendre après une coupure)
+3) `POST /uploads/<id>/finalize/`: le fichier partiel est déplacé dans `messages/` et le `Message` créé
+
+Limites configurables via `settings.MEDIA_UPLOAD`.
+"""
+import os
+
+from django.conf import settings
+from django.core.files import File
+
+from .storage import get_message_storage
+
+MIB = 1024 * 1024
+READ_BLOCK = 64 * 1024
+
+DEFAULTS = {
+    'CHUNK_SIZE': 8 * MIB,
+    'MAX_SIZE': {'audio': 50 * MIB, 'video': 1024 * MIB},
+    'CONTENT_TYPES': {
+        'audio': ['audio/webm', 'audio/ogg', 'audio/mpeg', 'audio/mp4', 'audio/wav'],
+        'video': ['video/webm', 'video/mp4', 'video/quicktime', 'video/ogg'],
+    },
+}
+
+
+class UploadError(Exception):
+    """Erreur de validation d'un envoi (message destiné au client)."""
+
+
+def upload_setting(name):
+    return getattr(settings, 'MEDIA_UPLOAD', {}).get(name, DEFAULTS[name])
+
+
+def validate_upload(message_type, content_type, size):
+    """Vérifie type, type MIME et taille déclarés avant tout transfert. Lève `UploadError`."""
+    allowed = upload_setting('CONTENT_TYPES')
+    if message_type not in allowed:
+        raise UploadError("message_type must be 'audio' or 'video'.")
+    if content_type.split(';')[0].strip() not in allowed[message_type]:
+        raise UploadError(f'Unsupported content type for {message_type}.')
+    if size <= 0 or size > upload_setting('MAX_SIZE')[message_type]:
+        raise UploadError('File size exceeds the allowed limit.')
+
+
+def partial_path(upload):
+    """Chemin du fichier partiel d'un envoi en cours."""
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', f'{upload.id}.part')
+
+
+def append_chunk(upload, offset, stream, length):
+    """Écrit `length` octets lus depuis `stream` à la position `offset`, par blocs de 64 Kio.
+
+    L'offset doit correspondre aux octets déjà reçus (pas de trou ni de réécriture).
+    Retourne le nouvel offset. Lève `UploadError` si le morceau est invalide.
+    """
+    if offset != upload.received_size:
+        raise UploadError(f'Expected offset {upload.received_size}.')
+    if length <= 0 or length > upload_setting('CHUNK_SIZE'):
+        raise UploadError('Invalid chunk size.')
+    if offset + length > upload.size:
+        raise UploadError('Chunk exceeds declared file size.')
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as fh:
+        fh.seek(offset)
+        fh.truncate()
+        while written < length:
+            block = stream.read(min(READ_BLOCK, length - written))
+            if not block:
+                break
+            fh.write(block)
+            written += len(block)
+    if written != length:
+        raise UploadError('Incomplete chunk.')
+    return offset + written
+
+
+class _PartialFile(File):
+    """Fichier déjà sur disque: `FileSystemStorage` le déplace au lieu de le recopier."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def store_upload(upload):
+    """Déplace le fichier complet dans le stockage des médias et retourne son nom.
+
+    Le stockage de `Message.file` est adressé par contenu: un fichier déjà connu n'est pas réécrit.
+    """
+    storage = get_message_storage()
+    path = partial_path(upload)
+    with open(path, 'rb') as fh:
+        target = storage.generate_filename(f'messages/{os.path.basename(upload.filename)}')
+        name = storage.save(target, _PartialFile(fh))
+    if os.path.exists(path):
+        os.remove(path)
+    return name
+
+
+def discard_upload(upload):
+    """Supprime le fichier partiel d'un envoi abandonné."""
+    path = partial_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
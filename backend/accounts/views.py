@@ -1,17 +1,38 @@
 from rest_framework.decorators import api_view
-from rest_framework.decorators import authentication_classes, permission_classes
+from rest_framework.decorators import authentication_classes, permission_classes, renderer_classes
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from .serializers import UserSerializer, LoginSerializer, MessageSerializer
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.db import transaction
 from django.db.models import Q
 from django.contrib.auth import get_user_model
-from accounts.tokenauthentications import JWTAuthentication
-from .models import Message
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from accounts.tokenauthentications import JWTAuthentication, MediaJWTAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from .models import ArchivedMedia, ConversationSummary, MediaUpload, Message
+from .archive import archived_after, archived_before
+from .batchsend import BatchError, batch_events, create_batch, parse_batch, receiver_ids
+from .dbpool import pool_stats
+from .encoders import FastJSONRenderer, MessageRow, get_message_encoder, message_rows
+from .eventlog import publish, publish_many
+from .presence import get_presence_backend
+from .pagination import (
+    SYNC_SAFETY_WINDOW, decode_cursor, decode_rank_cursor, encode_cursor, encode_rank_cursor, keyset_after, keyset_before,
+    parse_limit, sync_position,
+)
+from .receipts import mark_read_up_to
+from .search import get_search_backend
+from .storage import content_digest, get_message_storage
+from .uploads import UploadError, append_chunk, discard_upload, store_upload, upload_setting, validate_upload
+from django.conf import settings
+from django.utils import timezone
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+import mimetypes
+import os
+import posixpath
 import urllib.request
 import json as pyjson
 
@@ -34,12 +55,24 @@ def register_user(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST )
 
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
 def list_messages(request):
-    """Retourne l'historique des messages entre l'utilisateur courant et `with`.
+    """Retourne une page de l'historique des messages entre l'utilisateur courant et `with`.
 
-    Paramètre query: `with=<user_id>`.
+    Paramètres query:
+    - `with=<user_id>` (requis)
+    - `limit`: taille de page (défaut 50, max 200)
+    - `before=<cursor>`: page de messages plus anciens que le curseur
+    - `after=<cursor>`: messages plus récents que le curseur
+    - `since=<sync_token>`: synchro delta, lignes créées ou modifiées (statut) depuis le jeton;
+      les lignes des `SYNC_SAFETY_WINDOW` dernières secondes sont renvoyées à chaque appel (fusion par id)
+
+    Sans curseur, renvoie les `limit` messages les plus récents. La réponse contient
+    `results` (ordre chronologique), `before`/`after` (curseurs des bornes de la page),
+    `has_more` et `sync_token` à repasser dans `since` au prochain appel. Les messages
+    archivés (`accounts.archive`) prolongent l'historique de façon transparente.
     """
     other_id = request.query_params.get('with')
     if not other_id:
@@ -48,23 +81,225 @@ def list_messages(request):
         other_id_int = int(other_id)
     except ValueError:
         return Response({'detail': "Invalid 'with' parameter."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = parse_limit(request.query_params.get('limit'))
+        cursors = {
+            key: decode_cursor(request.query_params[key])
+            for key in ('before', 'after', 'since') if request.query_params.get(key)
+        }
+    except (ValueError, OverflowError):
+        return Response({'detail': 'Invalid cursor or limit.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    qs = Message.objects.filter(
-        Q(sender_id=request.user.id, receiver_id=other_id_int) |
-        Q(sender_id=other_id_int, receiver_id=request.user.id)
-    ).order_by('created_at')
-    data = MessageSerializer(qs, many=True).data
-    return Response(data, status=status.HTTP_200_OK)
+    conversation_key = Message.conversation_key_for(request.user.id, other_id_int)
+    qs = Message.objects.filter(conversation_key=conversation_key)
+    # Lignes horodatées après l'horizon: peut-être pas toutes validées, le jeton reste en deçà
+    horizon = timezone.now() - SYNC_SAFETY_WINDOW
+    if 'since' in cursors:
+        # Synchro delta: uniquement les lignes créées ou dont le statut a changé
+        rows = message_rows(qs.filter(keyset_after('updated_at', cursors['since'])).order_by('updated_at', 'id')[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        position = (rows[-1].updated_at, rows[-1].id) if rows else cursors['since']
+        if position[0] > horizon:
+            # Le reste sera relu au prochain appel depuis l'horizon
+            has_more = False
+        sync_token = encode_cursor(*sync_position(position, horizon, floor=cursors['since']))
+        rows.sort(key=lambda m: (m.created_at, m.id))
+    else:
+        # Messages archivés (stockage froid, tous antérieurs à la table chaude): lus seulement au-delà de celle-ci
+        if 'after' in cursors:
+            rows = archived_after(conversation_key, cursors['after'], limit + 1)
+            if len(rows) <= limit:
+                start = (rows[-1].created_at, rows[-1].id) if rows else cursors['after']
+                rows += message_rows(qs.filter(keyset_after('created_at', start)).order_by('created_at', 'id')[:limit + 1 - len(rows)])
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            if 'before' in cursors:
+                qs = qs.filter(keyset_before('created_at', cursors['before']))
+            rows = message_rows(qs.order_by('-created_at', '-id')[:limit + 1])
+            if len(rows) <= limit:
+                start = (rows[-1].created_at, rows[-1].id) if rows else cursors.get('before')
+                rows += archived_before(conversation_key, start, limit + 1 - len(rows))
+            has_more = len(rows) > limit
+            rows = rows[:limit][::-1]
+        latest = max(rows, key=lambda m: (m.updated_at, m.id), default=None)
+        sync_token = encode_cursor(*sync_position((latest.updated_at, latest.id), horizon)) if latest else None
+
+    return Response({
+        'results': get_message_encoder().encode_many(rows),
+        'before': encode_cursor(rows[0].created_at, rows[0].id) if rows else None,
+        'after': encode_cursor(rows[-1].created_at, rows[-1].id) if rows else None,
+        'has_more': has_more,
+        'sync_token': sync_token,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def list_conversations(request):
+    """Liste les conversations de l'utilisateur courant, de la plus récente à la plus ancienne.
+
+    Chaque entrée contient l'interlocuteur, le nombre de non lus et l'aperçu du dernier
+    message; les données viennent de `ConversationSummary` (aucun `COUNT(*)` à la lecture).
+    Paramètres query: `limit` (défaut 50, max 200), `before=<cursor>` pour la page suivante.
+    """
+    try:
+        limit = parse_limit(request.query_params.get('limit'))
+        before = request.query_params.get('before')
+        cursor = decode_cursor(before) if before else None
+    except (ValueError, OverflowError):
+        return Response({'detail': 'Invalid cursor or limit.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    qs = ConversationSummary.objects.filter(user_id=request.user.id, last_message_at__isnull=False).select_related('peer')
+    if cursor:
+        qs = qs.filter(keyset_before('last_message_at', cursor))
+    rows = list(qs.order_by('-last_message_at', '-id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    results = [{
+        'peer': {
+            'id': row.peer.id,
+            'first_name': row.peer.first_name,
+            'last_name': row.peer.last_name,
+            'email': row.peer.email,
+        },
+        'unread_count': row.unread_count,
+        'last_message': {
+            'id': row.last_message_id,
+            'preview': row.last_message_preview,
+            'created_at': row.last_message_at.isoformat(),
+        },
+    } for row in rows]
+    return Response({
+        'results': results,
+        'before': encode_cursor(rows[-1].last_message_at, rows[-1].id) if has_more else None,
+        'has_more': has_more,
+    }, status=status.HTTP_200_OK)
+
+
+def _prefix_search(query, prefix=''):
+    """Filtre `Q` de recherche par préfixe sur prénom, nom et email (préfixe de relation optionnel)."""
+    return (
+        Q(**{f'{prefix}first_name__istartswith': query})
+        | Q(**{f'{prefix}last_name__istartswith': query})
+        | Q(**{f'{prefix}email__istartswith': query})
+    )
 
 
 @api_view(['GET'])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
 def list_users(request):
-    """Liste les autres utilisateurs (pour la sidebar de discussions)."""
+    """Annuaire paginé des autres utilisateurs (pour la sidebar de discussions).
+
+    Paramètres query:
+    - `q`: recherche par préfixe sur prénom, nom ou email (insensible à la casse)
+    - `limit`: taille de page (défaut 50, max 200)
+    - `cursor`: curseur `next` renvoyé par la page précédente
+
+    Les contacts récents (ayant une conversation) viennent d'abord, par activité
+    décroissante, puis les autres utilisateurs par identifiant. Réponse:
+    `{ results: [{id, first_name, last_name, email, recent}], next, has_more }`.
+    """
     User = get_user_model()
-    users = User.objects.exclude(id=request.user.id).values('id', 'first_name', 'last_name', 'email')
-    return Response(list(users), status=status.HTTP_200_OK)
+    query = (request.query_params.get('q') or '').strip()
+    cursor = request.query_params.get('cursor') or 'c'
+    try:
+        limit = parse_limit(request.query_params.get('limit'))
+        phase, key = cursor[0], cursor[1:]
+        if phase == 'c':
+            key = decode_cursor(key) if key else None
+        elif phase == 'u':
+            key = int(key)
+        else:
+            raise ValueError(cursor)
+    except (ValueError, OverflowError):
+        return Response({'detail': 'Invalid cursor or limit.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    fields = ('id', 'first_name', 'last_name', 'email')
+    contacts = ConversationSummary.objects.filter(user_id=request.user.id, last_message_at__isnull=False)
+    results = []
+    next_cursor = None
+
+    # 1) Contacts récents, par activité (table des résumés de conversation)
+    if phase == 'c':
+        qs = contacts
+        if query:
+            qs = qs.filter(_prefix_search(query, prefix='peer__'))
+        if key:
+            qs = qs.filter(keyset_before('last_message_at', key))
+        rows = list(qs.select_related('peer').order_by('-last_message_at', '-id')[:limit + 1])
+        results = [{**{f: getattr(row.peer, f) for f in fields}, 'recent': True} for row in rows[:limit]]
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = 'c' + encode_cursor(last.last_message_at, last.id)
+        else:
+            phase, key = 'u', 0
+
+    # 2) Puis le reste de l'annuaire, par identifiant
+    remaining = limit - len(results)
+    if phase == 'u' and remaining > 0:
+        qs = User.objects.exclude(id=request.user.id).exclude(id__in=contacts.values('peer_id')).filter(id__gt=key)
+        if query:
+            qs = qs.filter(_prefix_search(query))
+        rows = list(qs.order_by('id').values(*fields)[:remaining + 1])
+        results += [{**row, 'recent': False} for row in rows[:remaining]]
+        if len(rows) > remaining:
+            next_cursor = f"u{rows[remaining - 1]['id']}"
+    elif phase == 'u' and next_cursor is None:
+        # Page pleine de contacts: la suivante commence l'annuaire
+        next_cursor = f"u{key}"
+
+    return Response({'results': results, 'next': next_cursor, 'has_more': next_cursor is not None}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def search_messages(request):
+    """Recherche plein texte dans les conversations de l'utilisateur courant.
+
+    Paramètres query:
+    - `q`: termes recherchés (tous requis)
+    - `with`: limite la recherche à la conversation avec cet utilisateur (optionnel)
+    - `limit`: taille de page (défaut 50, max 200)
+    - `cursor`: curseur `next` renvoyé par la page précédente
+
+    Résultats par pertinence décroissante (voir `accounts.search`). Réponse:
+    `{ results: [{id, from, to, peer, created_at, rank, highlight}], next, has_more }`,
+    `highlight` étant un extrait échappé HTML où les termes trouvés sont entre `<mark>`.
+    """
+    query = (request.query_params.get('q') or '').strip()
+    if not query:
+        return Response({'detail': "Missing 'q' parameter."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = parse_limit(request.query_params.get('limit'))
+        cursor = request.query_params.get('cursor')
+        cursor, max_id = decode_rank_cursor(cursor) if cursor else (None, None)
+        peer_id = request.query_params.get('with')
+        peer_id = int(peer_id) if peer_id else None
+    except (ValueError, OverflowError):
+        return Response({'detail': 'Invalid cursor, limit or peer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Première page: borne haute figée pour toute la pagination (les nouveaux messages n'en font pas partie)
+    if max_id is None:
+        max_id = Message.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    hits = get_search_backend().search(request.user.id, query, limit + 1, cursor=cursor, peer_id=peer_id, max_id=max_id)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    results = [{
+        **hit,
+        'peer': hit['to'] if hit['from'] == request.user.id else hit['from'],
+        'created_at': hit['created_at'].isoformat(),
+    } for hit in hits]
+    return Response({
+        'results': results,
+        'next': encode_rank_cursor(hits[-1]['rank'], hits[-1]['id'], max_id) if has_more else None,
+        'has_more': has_more,
+    }, status=status.HTTP_200_OK)
+
 
 @api_view(['GET'])
 @authentication_classes([JWTAuthentication])
@@ -90,6 +325,7 @@ def user_detail(request, user_id):
 
 @csrf_exempt
 @api_view(['POST'])
+@renderer_classes([FastJSONRenderer])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
 def send_message(request):
@@ -101,28 +337,165 @@ def send_message(request):
     """
     serializer = MessageSerializer(data=request.data)
     if serializer.is_valid():
-        msg = serializer.save(sender=request.user)
-        data = MessageSerializer(msg).data
-        payload = {
-            'type': 'chat.message',
-            'event': 'message_created',
-            'data': {
-                'id': data['id'],
-                'from': data['sender'],
-                'to': data['receiver'],
-                'content': data.get('content'),
-                'message_type': data.get('message_type', 'text'),
-                'file': data.get('file'),
-                'created_at': data['created_at'],
-                'status': data.get('status', 'sent'),
-            }
-        }
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(f"user_{data['sender']}", payload)
-        async_to_sync(channel_layer.group_send)(f"user_{data['receiver']}", payload)
-        return Response(data, status=status.HTTP_201_CREATED)
+        row = MessageRow.from_message(serializer.save(sender=request.user))
+        _notify_message_created(row)
+        return Response(get_message_encoder().encode(row), status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+@csrf_exempt
+@api_view(['POST'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def send_message_batch(request):
+    """Envoi groupé de messages texte (bots, annonces).
+
+    Corps JSON: `{ items: [{ receiver, content }, ...] }` ou `{ receivers: [...], content }` (500 max).
+    Les éléments valides sont créés en un seul `bulk_create`; la réponse donne le résultat de
+    chaque élément, dans l'ordre: `{ results: [{ index, id, receiver, status } | { index, receiver, error }] }`.
+    """
+    try:
+        items = parse_batch(request.data)
+    except BatchError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    online_ids = get_presence_backend().online_among_sync(sorted(receiver_ids(items)))
+    messages, results = create_batch(request.user.id, items, online_ids)
+    if not messages:
+        return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+    publish_many(batch_events(request.user.id, messages))
+    return Response({'results': results}, status=status.HTTP_201_CREATED)
+
+
+def _notify_message_created(row):
+    """Diffuse `message_created` à l'émetteur et au destinataire (`MessageRow`)."""
+    publish([row.sender_id, row.receiver_id], 'message_created', get_message_encoder().event(row))
+
+
+@csrf_exempt
+@api_view(['POST'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def create_upload(request):
+    """Démarre un envoi de média par morceaux.
+
+    Corps JSON: `{ receiver, message_type: 'audio'|'video', filename, size, content_type }`.
+    Type, type MIME et taille sont validés avant tout transfert.
+    Retourne 201 `{ id, offset, size, chunk_size }`.
+    """
+    User = get_user_model()
+    try:
+        receiver_id = int(request.data.get('receiver'))
+        size = int(request.data.get('size'))
+        message_type = request.data.get('message_type') or ''
+        content_type = request.data.get('content_type') or ''
+        filename = str(request.data.get('filename') or '')[:255]
+        validate_upload(message_type, content_type, size)
+    except (TypeError, ValueError):
+        return Response({'detail': "Invalid 'receiver' or 'size' parameter."}, status=status.HTTP_400_BAD_REQUEST)
+    except UploadError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if not filename or not User.objects.filter(id=receiver_id).exists():
+        return Response({'detail': 'Invalid receiver or filename.'}, status=status.HTTP_400_BAD_REQUEST)
+    upload = MediaUpload.objects.create(
+        sender=request.user, receiver_id=receiver_id, message_type=message_type,
+        filename=filename, content_type=content_type, size=size,
+    )
+    return Response({'id': str(upload.id), 'offset': 0, 'size': size, 'chunk_size': upload_setting('CHUNK_SIZE')},
+                    status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@api_view(['GET', 'PUT', 'DELETE'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def upload_detail(request, upload_id):
+    """État, ajout d'un morceau ou abandon d'un envoi par morceaux.
+
+    - GET: `{ id, offset, size }` (pour reprendre après une coupure)
+    - PUT `?offset=<n>`: corps brut (octets du morceau), écrit sur disque par blocs
+    - DELETE: abandon, le fichier partiel est supprimé
+
+    PUT et DELETE verrouillent l'envoi (`select_for_update`): deux morceaux envoyés au même
+    offset sont sérialisés et le second est refusé d'après l'offset relu après verrouillage.
+    """
+    uploads = MediaUpload.objects.filter(id=upload_id, sender=request.user, message__isnull=True)
+    if request.method == 'GET':
+        upload = uploads.first()
+        if upload is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'id': str(upload.id), 'offset': upload.received_size, 'size': upload.size}, status=status.HTTP_200_OK)
+    with transaction.atomic():
+        upload = uploads.select_for_update().first()
+        if upload is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if request.method == 'DELETE':
+            discard_upload(upload)
+            upload.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        try:
+            offset = int(request.query_params.get('offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            # Lecture directe du flux: le corps n'est jamais chargé entièrement en mémoire
+            upload.received_size = append_chunk(upload, offset, request.stream, length)
+        except ValueError:
+            return Response({'detail': "Invalid 'offset' parameter."}, status=status.HTTP_400_BAD_REQUEST)
+        except UploadError as e:
+            return Response({'detail': str(e), 'offset': upload.received_size}, status=status.HTTP_409_CONFLICT)
+        upload.save(update_fields=['received_size'])
+    return Response({'id': str(upload.id), 'offset': upload.received_size, 'size': upload.size}, status=status.HTTP_200_OK)
+
+
+@csrf_exempt
+@api_view(['POST'])
+@renderer_classes([FastJSONRenderer])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def finalize_upload(request, upload_id):
+    """Termine un envoi complet: crée le `Message` média et le diffuse (`message_created`).
+
+    L'envoi est verrouillé puis son état relu: une seconde finalisation concurrente obtient 409
+    (`message`: id du message déjà créé) au lieu de créer un doublon.
+    """
+    with transaction.atomic():
+        upload = MediaUpload.objects.select_for_update().filter(id=upload_id, sender=request.user).first()
+        if upload is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if upload.message_id is not None:
+            return Response({'detail': 'Upload already finalized.', 'message': upload.message_id}, status=status.HTTP_409_CONFLICT)
+        if upload.received_size != upload.size:
+            return Response({'detail': 'Upload incomplete.', 'offset': upload.received_size}, status=status.HTTP_409_CONFLICT)
+        msg = Message.objects.create(
+            sender_id=upload.sender_id, receiver_id=upload.receiver_id,
+            message_type=upload.message_type, file=store_upload(upload),
+        )
+        upload.message = msg
+        upload.save(update_fields=['message'])
+    row = MessageRow.from_message(msg)
+    _notify_message_created(row)
+    return Response(get_message_encoder().encode(row), status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@api_view(['POST'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def read_messages(request):
+    """Accusé de lecture groupé (équivalent REST de la commande WS `read_up_to`).
+
+    Corps JSON: `{ with: <user_id>, up_to: <message_id> }`. Marque comme lus tous les
+    messages non lus reçus de `with` jusqu'à `up_to` et diffuse un seul `messages_read`.
+    """
+    try:
+        peer_id = int(request.data.get('with'))
+        up_to_id = int(request.data.get('up_to'))
+    except (TypeError, ValueError):
+        return Response({'detail': "Invalid 'with' or 'up_to' parameter."}, status=status.HTTP_400_BAD_REQUEST)
+    data = mark_read_up_to(request.user.id, peer_id, up_to_id)
+    if data is None:
+        return Response({'count': 0}, status=status.HTTP_200_OK)
+    publish([peer_id, request.user.id], 'messages_read', data)
+    return Response(data, status=status.HTTP_200_OK)
+
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -192,4 +565,128 @@ def login_google(request):
     })
 
     token = JWTAuthentication.generate_token(user)
-    return Response({'token': token}, status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response({'token': token}, status=status.HTTP_200_OK)
+
+
+def _media_etag(name, stat):
+    """ETag fort: l'empreinte de contenu pour les fichiers adressés par contenu, sinon taille + mtime."""
+    digest = content_digest(name)
+    return f'"{digest}"' if digest else f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _parse_range(header, size):
+    """Analyse un en-tête `Range: bytes=...` à plage unique.
+
+    Retourne `(début, fin incluse)`, `None` si l'en-tête est absent ou non géré
+    (réponse complète), ou lève `ValueError` si la plage est insatisfiable.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start, _, end = header[len('bytes='):].strip().partition('-')
+    try:
+        if start:
+            first = int(start)
+            last = min(int(end), size - 1) if end else size - 1
+        else:
+            first = max(size - int(end), 0)
+            last = size - 1
+    except ValueError:
+        return None
+    if first > last or first >= size:
+        raise ValueError(header)
+    return first, last
+
+
+def _iter_file_range(fh, first, length, block=64 * 1024):
+    """Lit uniquement `length` octets à partir de `first`."""
+    try:
+        fh.seek(first)
+        while length > 0:
+            data = fh.read(min(block, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        fh.close()
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_media(request, path):
+    """Sert un fichier média avec ETag fort, `If-None-Match` et requêtes `Range` (lecture/avance rapide).
+
+    - Réservé aux participants: JWT (`Authorization: Bearer` ou `?token=`), 401 sans jeton valide,
+      404 si l'utilisateur n'est ni émetteur ni destinataire d'un message (courant ou archivé)
+      portant ce fichier (ou poster)
+    - 304 si l'ETag correspond, 206 + `Content-Range` pour une plage, 416 si insatisfiable
+    - Réponse complète via `FileResponse` (wsgi.file_wrapper / sendfile du serveur)
+    - Si `MEDIA_SENDFILE_HEADER` est défini (ex: `X-Accel-Redirect`), délègue l'envoi au reverse proxy
+      après ces contrôles (l'emplacement du proxy doit être `internal`)
+    """
+    try:
+        authenticated = MediaJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        authenticated = None
+    if authenticated is None:
+        return HttpResponse(status=401)
+    user = authenticated[0]
+    storage = get_message_storage()
+    name = posixpath.normpath(path).lstrip('/')
+    participant = Q(sender_id=user.id) | Q(receiver_id=user.id)
+    # Message courant, ou message archivé (`ArchivedMedia`, renseigné par `accounts.archive`)
+    owned = (
+        Message.objects.filter(Q(file=name) | Q(poster=name)).filter(participant).exists()
+        or ArchivedMedia.objects.filter(name=name).filter(participant).exists()
+    )
+    if name.startswith('..') or not owned or not storage.exists(name):
+        raise Http404('Media not found.')
+    full_path = storage.path(name)
+    stat = os.stat(full_path)
+    etag = _media_etag(name, stat)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    # Privé: réponse propre à l'utilisateur authentifié, jamais mise en cache par un proxy partagé
+    cache_control = 'private, max-age=31536000, immutable' if content_digest(name) else 'private, max-age=0, must-revalidate'
+
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    sendfile_header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+    if sendfile_header:
+        response = HttpResponse(content_type=content_type)
+        response[sendfile_header] = f"{getattr(settings, 'MEDIA_SENDFILE_PREFIX', settings.MEDIA_URL)}{name}"
+    else:
+        range_header = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+        if if_range and if_range != etag:
+            range_header = None
+        try:
+            byte_range = _parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range is None:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        else:
+            first, last = byte_range
+            length = last - first + 1
+            response = StreamingHttpResponse(
+                _iter_file_range(open(full_path, 'rb'), first, length), status=206, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {first}-{last}/{stat.st_size}'
+            response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAdminUser])
+def db_metrics(request):
+    """Métriques de connexion à la base du worker courant (pool, exécuteur base). Réservé aux administrateurs."""
+    return Response(pool_stats(), status=status.HTTP_200_OK)
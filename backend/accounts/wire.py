@@ -0,0 +1,160 @@
+"""Format des trames WebSocket de `ChatConsumer`, négocié par sous-protocole.
+
+- par défaut (aucun sous-protocole, ou `gmsg.json.v1`): trames texte JSON
+- `gmsg.msgpack.v1`: trames binaires MessagePack, dans les deux sens; le type
+  d'événement/commande et les clés courantes sont remplacés par de petits entiers
+  (`TYPE_CODES`, `KEY_CODES`, tables figées pour la v1: ajouter des codes, ne jamais
+  en réaffecter); les valeurs et clés inconnues restent telles quelles
+
+Le client annonce les formats qu'il sait lire (`new WebSocket(url, ['gmsg.msgpack.v1'])`),
+le serveur retient le premier qu'il connaît (`negotiate`). La compression
+permessage-deflate est négociée par le serveur ASGI (uvicorn: active par défaut,
+daphne: non prise en charge) et s'applique aux deux formats; le gain de MessagePack
+reste surtout CPU et taille avant compression (voir `bench_ws_codecs`).
+"""
+import json
+
+import msgpack
+
+from .encoders import dumps
+
+TYPE_CODES = {
+    # Événements serveur -> client
+    'message_created': 1,
+    'messages_created': 2,
+    'message_delivered': 3,
+    'messages_delivered': 4,
+    'message_read': 5,
+    'messages_read': 6,
+    'media_processed': 7,
+    'presence_batch': 8,
+    'presence_snapshot': 9,
+    'sync_state': 10,
+    'sync_done': 11,
+    'sync_reset': 12,
+    'batch_sent': 13,
+    'typing_batch': 14,
+    # Commandes client -> serveur
+    'send_message': 32,
+    'send_batch': 33,
+    'read_ack': 34,
+    'read_up_to': 35,
+    'presence_subscribe': 36,
+    'sync': 37,
+    'typing': 38,
+}
+KEY_CODES = {
+    'type': 0,
+    'seq': 1,
+    'id': 2,
+    'from': 3,
+    'to': 4,
+    'content': 5,
+    'status': 6,
+    'created_at': 7,
+    'message_type': 8,
+    'file': 9,
+    'media_status': 10,
+    'delivered_at': 11,
+    'read_at': 12,
+    'first_id': 13,
+    'up_to_id': 14,
+    'count': 15,
+    'messages': 16,
+    'updates': 17,
+    'user_id': 18,
+    'online': 19,
+    'last_seen': 20,
+    'duration': 21,
+    'waveform': 22,
+    'poster': 23,
+    'online_user_ids': 24,
+    'ref': 25,
+    'results': 26,
+    'error': 27,
+    'index': 28,
+    'receiver': 29,
+    'receivers': 30,
+    'items': 31,
+    'after': 32,
+    'with': 33,
+    'up_to': 34,
+    'user_ids': 35,
+    'typing': 36,
+    'ttl': 37,
+}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+KEY_NAMES = {code: name for name, code in KEY_CODES.items()}
+
+
+def _compact(value):
+    """Copie de `value` (dict) avec clés et type codés; parcourt les dicts et listes de dicts imbriqués."""
+    compact = {}
+    for key, item in value.items():
+        cls = item.__class__
+        if cls is dict:
+            item = _compact(item)
+        elif cls is list:
+            item = [_compact(element) if element.__class__ is dict else element for element in item]
+        elif key == 'type':
+            item = TYPE_CODES.get(item, item)
+        compact[KEY_CODES.get(key, key)] = item
+    return compact
+
+
+def _expand(value):
+    """Inverse de `_compact`."""
+    expanded = {}
+    for key, item in value.items():
+        key = KEY_NAMES.get(key, key)
+        cls = item.__class__
+        if cls is dict:
+            item = _expand(item)
+        elif cls is list:
+            item = [_expand(element) if element.__class__ is dict else element for element in item]
+        elif key == 'type':
+            item = TYPE_NAMES.get(item, item)
+        expanded[key] = item
+    return expanded
+
+
+class JsonCodec:
+    """Trames texte JSON (format historique)."""
+    binary = False
+
+    def __init__(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    def encode(self, content):
+        return dumps(content).decode()
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """Trames binaires MessagePack à codes entiers (`gmsg.msgpack.v1`)."""
+    binary = True
+    subprotocol = 'gmsg.msgpack.v1'
+
+    def encode(self, content):
+        return msgpack.packb(_compact(content), use_bin_type=True)
+
+    def decode(self, data):
+        content = msgpack.unpackb(data, raw=False, strict_map_key=False)
+        return _expand(content) if isinstance(content, dict) else content
+
+
+JSON_CODEC = JsonCodec()
+CODECS = {
+    'gmsg.msgpack.v1': MsgpackCodec(),
+    'gmsg.json.v1': JsonCodec('gmsg.json.v1'),
+}
+
+
+def negotiate(subprotocols):
+    """Codec du premier sous-protocole connu proposé par le client (JSON sans sous-protocole sinon)."""
+    for name in subprotocols or ():
+        if name in CODECS:
+            return CODECS[name]
+    return JSON_CODEC
@@ -0,0 +1,164 @@
+"""Écriture différée (write-behind) des transitions de statut des messages.
+
+Les événements temps réel (`message_delivered`, `message_read`) partent
+immédiatement; seule la persistance est regroupée: les transitions sont
+fusionnées par message puis écrites par lots (au plus deux UPDATE avec
+`CASE WHEN` par flush), toutes les `INTERVAL` secondes ou dès `MAX_PENDING`
+messages en attente. Un lot dont l'écriture échoue est remis en attente (erreur
+journalisée) et réessayé au flush suivant.
+
+Les transitions restantes sont écrites à l'arrêt du worker via l'événement
+`lifespan` de l'ASGI (`lifespan`, branché dans `backend.asgi`); la fermeture
+d'une WebSocket ne force pas de flush (pas d'écriture par socket lors d'une
+vague de reconnexions).
+"""
+import asyncio
+import logging
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from .dbexecutor import run_db
+from .models import Message
+from .summaries import record_read
+
+DEFAULT_INTERVAL = 0.2
+DEFAULT_MAX_PENDING = 500
+
+logger = logging.getLogger(__name__)
+
+
+class StatusWriteBuffer:
+    """Tampon des transitions `delivered`/`read` en attente d'écriture."""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, max_pending=DEFAULT_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._flush_task = None
+        # Dernière écriture en échec: pas de flush immédiat à MAX_PENDING, réessai à l'intervalle
+        self._failing = False
+
+    async def record(self, message_id, status, at):
+        """Enregistre la transition de `message_id` vers `status` ('delivered' ou 'read') à l'instant `at`."""
+        entry = self._pending.setdefault(message_id, {})
+        entry.setdefault(f'{status}_at', at)
+        if (len(self._pending) >= self.max_pending and not self._failing) or self.interval <= 0:
+            await self.flush()
+        else:
+            self._schedule()
+
+    def _schedule(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    def _take(self):
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def _restore(self, pending):
+        """Remet en attente un lot non écrit, fusionné avec les transitions enregistrées depuis.
+
+        Comme dans `record`, le premier horodatage d'une transition est conservé: celui du lot.
+        """
+        for message_id, entry in pending.items():
+            self._pending[message_id] = {**self._pending.get(message_id, {}), **entry}
+
+    async def flush(self):
+        """Écrit les transitions en attente (depuis la boucle asyncio).
+
+        Retourne `False` si l'écriture a échoué: le lot est alors remis en attente.
+        """
+        pending = self._take()
+        if not pending:
+            return True
+        try:
+            await run_db(self._write, pending)
+        except Exception:
+            logger.exception('Status write-behind flush failed (%d message(s)), will retry', len(pending))
+            self._restore(pending)
+            self._failing = True
+            if self.interval > 0:
+                self._schedule()
+            return False
+        self._failing = False
+        return True
+
+    def flush_sync(self):
+        """Écrit les transitions en attente de façon synchrone (hors boucle asyncio, ex: tests)."""
+        pending = self._take()
+        if not pending:
+            return True
+        try:
+            self._write(pending)
+        except Exception:
+            logger.exception('Status write-behind flush failed (%d message(s))', len(pending))
+            self._restore(pending)
+            return False
+        return True
+
+    @staticmethod
+    def _write(pending):
+        now = timezone.now()
+        delivered = {pk: entry['delivered_at'] for pk, entry in pending.items() if 'delivered_at' in entry}
+        read = {pk: entry['read_at'] for pk, entry in pending.items() if 'read_at' in entry}
+        with transaction.atomic():
+            # Les filtres sur l'état courant empêchent toute régression de statut (read -> delivered)
+            if delivered:
+                Message.objects.filter(id__in=delivered, status='sent').update(
+                    status='delivered',
+                    delivered_at=Case(*[When(id=pk, then=Value(at)) for pk, at in delivered.items()], output_field=DateTimeField()),
+                    updated_at=now,
+                )
+            if read:
+                # Lignes verrouillées: les non lus décomptés sont exactement ceux marqués ici, même si
+                # `mark_read_up_to` (autre socket) les lit en même temps
+                unread = list(
+                    Message.objects.select_for_update().filter(id__in=read, read_at__isnull=True)
+                    .order_by('id').values_list('id', 'receiver_id', 'sender_id')
+                )
+                if unread:
+                    Message.objects.filter(id__in=[pk for pk, _, _ in unread]).update(
+                        status='read',
+                        is_read=True,
+                        read_at=Case(*[When(id=pk, then=Value(read[pk])) for pk, _, _ in unread], output_field=DateTimeField()),
+                        updated_at=now,
+                    )
+                per_pair = Counter((receiver_id, sender_id) for _, receiver_id, sender_id in unread)
+                for (receiver_id, sender_id), count in per_pair.items():
+                    record_read(receiver_id, sender_id, count)
+
+
+@lru_cache(maxsize=None)
+def get_status_buffer():
+    """Tampon du processus courant, configuré par `settings.STATUS_WRITE_BUFFER`."""
+    config = getattr(settings, 'STATUS_WRITE_BUFFER', {})
+    return StatusWriteBuffer(
+        interval=config.get('INTERVAL', DEFAULT_INTERVAL),
+        max_pending=config.get('MAX_PENDING', DEFAULT_MAX_PENDING),
+    )
+
+
+async def lifespan(scope, receive, send):
+    """Application ASGI du protocole `lifespan`: écrit les transitions en attente à l'arrêt du worker.
+
+    Le serveur ASGI (uvicorn, hypercorn) envoie `lifespan.shutdown` sur SIGTERM/SIGINT,
+    après la fermeture des connexions.
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if get_status_buffer.cache_info().currsize:
+                await get_status_buffer().flush()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
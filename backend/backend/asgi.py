@@ -10,6 +10,7 @@ Configuration ASGI du projet :
 - HTTP : géré par l'application Django classique (get_asgi_application)
 - WebSocket : géré par Django Channels via un routeur qui pointe sur `accounts.routing`
 - Sécurisation : AllowedHostsOriginValidator applique ALLOWED_HOSTS pour les origines WS
+- Lifespan : à l'arrêt du worker, écriture des statuts en attente (`accounts.writebehind.lifespan`)
 """
 
 import os
@@ -24,10 +25,12 @@ django_asgi_app = get_asgi_application()
 
 # Import des routes WebSocket après l'initialisation de Django (évite les imports prématurés)
 from accounts import routing as accounts_routing  # 
+from accounts.writebehind import lifespan
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         URLRouter(accounts_routing.websocket_urlpatterns)
     ),
+    "lifespan": lifespan,
 })
@@ -10,9 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 load_dotenv()
 
 # Chemins de base du projet
@@ -81,6 +83,62 @@ CACHES = {
     }
 }
 
+# Registre de présence partagé entre workers (voir accounts.presence).
+# En tests/dev sans Redis: "accounts.presence.InMemoryPresenceBackend".
+PRESENCE = {
+    "BACKEND": "accounts.presence.RedisPresenceBackend",
+    "OPTIONS": {"url": f"redis://{REDIS_HOST}:{REDIS_PORT}/2", "ttl": 60},
+    # Fenêtre (secondes) de regroupement des événements de présence envoyés aux clients
+    "BATCH_WINDOW": 0.25,
+}
+
+# Indicateurs de saisie (voir accounts.typingstate): état en mémoire du worker, expiré après TTL secondes
+# sans frappe; changements regroupés sur BATCH_WINDOW; par utilisateur au plus MAX_PEERS interlocuteurs
+# simultanés et RATE annonces par seconde (rafale BURST).
+TYPING = {"TTL": 6.0, "BATCH_WINDOW": 0.25, "MAX_PEERS": 5, "RATE": 1.0, "BURST": 10}
+
+# Liste de révocation des JWT (voir accounts.revocation), consultée par les WebSockets.
+# En tests/dev sans Redis: "accounts.revocation.InMemoryRevocationBackend".
+AUTH_REVOCATION = {
+    "BACKEND": "accounts.revocation.RedisRevocationBackend",
+    "OPTIONS": {"url": f"redis://{REDIS_HOST}:{REDIS_PORT}/3", "local_ttl": 30},
+}
+
+# Cache des utilisateurs authentifiés par JWT (voir accounts.tokenauthentications):
+# TTL (s) du cache partagé Redis et du cache local de chaque processus.
+AUTH_USER_CACHE = {"TTL": 300, "LOCAL_TTL": 5}
+
+# Pool de threads dédié aux accès base depuis les consommateurs WebSocket (voir accounts.dbexecutor).
+# 0: thread unique partagé de sync_to_async (comportement Django par défaut).
+DB_EXECUTOR = {"MAX_WORKERS": 16}
+
+# Journal d'événements par utilisateur (voir accounts.eventlog): reprise après reconnexion
+# via la commande WebSocket `sync`, à partir du dernier `seq` reçu par le client.
+# Rétention: max_events par utilisateur, max_age secondes (flux Redis bornés à l'ajout et expirés après
+# max_age d'inactivité). Sans Redis: "accounts.eventlog.DatabaseEventLogBackend" (option trim_every,
+# purge globale: commande trim_event_log).
+EVENT_LOG = {
+    "BACKEND": "accounts.eventlog.RedisEventLogBackend",
+    "OPTIONS": {"url": f"redis://{REDIS_HOST}:{REDIS_PORT}/4", "max_events": 1000, "max_age": 7 * 24 * 60 * 60},
+}
+
+# Recherche plein texte des messages (voir accounts.search): colonne tsvector (migration 0013, puis
+# commande rebuild_search_index pour les messages existants) + index GIN par participant (btree_gin, 0017).
+# InMemorySearchBackend (index inversé local au processus) pour SQLite / tests.
+MESSAGE_SEARCH = {
+    "BACKEND": "accounts.search.PostgresSearchBackend",
+    "OPTIONS": {"max_candidates": 10000},
+}
+
+# Partitionnement mensuel de accounts_message et archivage froid (voir accounts.partitions, accounts.archive):
+# commandes partition_messages (partitions des PARTITIONS_AHEAD mois à venir) et archive_messages
+# (mois antérieurs à HOT_MONTHS déplacés en tranches compressées de SEGMENT_SIZE messages).
+MESSAGE_ARCHIVE = {"HOT_MONTHS": 12, "SEGMENT_SIZE": 500, "PARTITIONS_AHEAD": 3}
+
+# Écriture différée des statuts delivered/read (voir accounts.writebehind):
+# flush toutes les INTERVAL secondes ou dès MAX_PENDING messages en attente.
+STATUS_WRITE_BUFFER = {"INTERVAL": 0.2, "MAX_PENDING": 500}
+
 # CORS (origines autorisées pour le front)
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -142,9 +200,29 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Connexions persistantes (psycopg2): réutilisées par les threads de DB_EXECUTOR,
+        # vérifiées avant réutilisation après une période d'inactivité
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Pool de connexions natif, optionnel: requirements.txt installe psycopg2, le pool demande psycopg 3
+# et psycopg_pool (`pip install "psycopg[binary,pool]"`) et s'active avec DB_POOL=1. Dimensionné
+# d'après l'exécuteur base (un thread = au plus une connexion) plus une marge pour les vues REST.
+# Métriques: accounts.dbpool.pool_stats(), GET /metrics/db/ (administrateurs).
+if os.getenv('DB_POOL', '0') == '1':
+    if not (find_spec('psycopg') and find_spec('psycopg_pool')):
+        raise ImproperlyConfigured('DB_POOL=1 requiert psycopg 3 et psycopg_pool: pip install "psycopg[binary,pool]"')
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # Incompatible avec le pool
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', str(DB_EXECUTOR['MAX_WORKERS'] + 8))),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -177,13 +255,36 @@ USE_I18N = True
 USE_TZ = True
 
 
-# Fichiers statiques et médias (dev)
-# En dev, MEDIA_URL est servi par backend.urls si DEBUG=True.
+# Fichiers statiques et médias
+# MEDIA_URL est servi par accounts.views.serve_media (Range, ETag), ou délégué au proxy (MEDIA_SENDFILE_HEADER).
 
 STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Envoi des médias délégué au reverse proxy (zéro copie), ex: "X-Accel-Redirect" (nginx)
+# ou "X-Sendfile" (Apache). None: le fichier est servi par Django (Range/ETag gérés).
+MEDIA_SENDFILE_HEADER = None
+
+# Traitement des médias en arrière-plan (voir accounts.mediajobs, commande process_media):
+# poster (vidéo), forme d'onde (audio) et durée. En local sans ffmpeg:
+# "PROCESSOR": "accounts.mediaprocessors.StubMediaProcessor".
+MEDIA_PROCESSING = {
+    "PROCESSOR": "accounts.mediaprocessors.FFmpegMediaProcessor",
+    "OPTIONS": {"waveform_points": 64, "poster_width": 480},
+    "WORKERS": 2,
+    "POLL_INTERVAL": 1.0,
+    "MAX_ATTEMPTS": 3,
+    # Durée max (secondes) de chaque appel ffprobe/ffmpeg: au-delà, processus tué et tâche replanifiée
+    "TIMEOUT": 120,
+}
+
+# Envoi de médias par morceaux (voir accounts.uploads): taille max d'un morceau et d'un fichier
+MEDIA_UPLOAD = {
+    "CHUNK_SIZE": 8 * 1024 * 1024,
+    "MAX_SIZE": {"audio": 50 * 1024 * 1024, "video": 1024 * 1024 * 1024},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,25 @@
+"""
+Réglages des tests: `python manage.py test --settings=backend.settings_test`
+(ou `DJANGO_SETTINGS_MODULE=backend.settings_test` pour un autre lanceur, ex. pytest-django).
+
+Par défaut: SQLite et backends en mémoire, sans PostgreSQL ni Redis.
+Avec `TEST_DB=postgres`, la base PostgreSQL de `.env` est utilisée (base de test créée
+par Django) avec `PostgresSearchBackend`: les chemins propres à PostgreSQL (recherche,
+partitions, pool de connexions) sont alors exercés. Avec `TEST_REDIS_URL` (ex.
+`redis://127.0.0.1:6379/15`, base vidée par les tests), les backends Redis sont aussi testés.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, MEDIA_PROCESSING, PRESENCE
+import os
+
+if os.getenv('TEST_DB', 'sqlite') != 'postgres':
+    DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'test.sqlite3'}}
+    MESSAGE_SEARCH = {'BACKEND': 'accounts.search.InMemorySearchBackend'}
+
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+PRESENCE = {**PRESENCE, 'BACKEND': 'accounts.presence.InMemoryPresenceBackend', 'OPTIONS': {'ttl': 60}}
+AUTH_REVOCATION = {'BACKEND': 'accounts.revocation.InMemoryRevocationBackend'}
+EVENT_LOG = {'BACKEND': 'accounts.eventlog.DatabaseEventLogBackend'}
+MEDIA_PROCESSING = {**MEDIA_PROCESSING, 'PROCESSOR': 'accounts.mediaprocessors.StubMediaProcessor'}
@@ -3,11 +3,11 @@ from django.contrib import admin
 from django.urls import path
 from accounts import views
 from django.conf import settings
-from django.conf.urls.static import static
 
 # Fichier de routage principal (HTTP) du projet.
 # Expose les endpoints REST de l'application accounts et
-# sert les fichiers médias en développement via MEDIA_URL.
+# sert les fichiers médias via MEDIA_URL aux seuls participants de la conversation
+# (JWT, requêtes Range, ETag; voir `views.serve_media`).
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('register/', views.register_user, name='register'),
@@ -15,10 +15,20 @@ urlpatterns = [
     path('login/google/', views.login_google, name='login_google'),
     path('messages/', views.list_messages, name='list_messages'),
     path('messages/send/', views.send_message, name='send_message'),
+    path('messages/send/batch/', views.send_message_batch, name='send_message_batch'),
+    path('messages/search/', views.search_messages, name='search_messages'),
+    path('messages/read/', views.read_messages, name='read_messages'),
+    path('uploads/', views.create_upload, name='create_upload'),
+    path('uploads/<uuid:upload_id>/', views.upload_detail, name='upload_detail'),
+    path('uploads/<uuid:upload_id>/finalize/', views.finalize_upload, name='finalize_upload'),
+    path('conversations/', views.list_conversations, name='list_conversations'),
     path('users/', views.list_users, name='list_users'),
     path('users/<int:user_id>/', views.user_detail, name='user_detail'),
+    path('metrics/db/', views.db_metrics, name='db_metrics'),
 ]
 
-# En mode DEBUG uniquement: exposition des fichiers uploadés (images/vidéos/audio)
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Fichiers uploadés (audio/vidéo): en production, définir MEDIA_SENDFILE_HEADER pour déléguer
+# l'envoi au reverse proxy (X-Accel-Redirect / X-Sendfile)
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", views.serve_media, name='serve_media'),
+]
@@ -1,7 +1,7 @@
 import React, { useEffect, useRef, useState } from 'react'
 import Box from '@mui/material/Box';
 import { Stack, Typography, Avatar, Divider, Paper } from '@mui/material';
-import Messages from './Messages';
+import Messages, { mediaSrc } from './Messages';
 import MessagesInput from './MessagesInput';
 
 export default function ChatArea({ initialMessages = [], receiverId }) {
@@ -18,6 +18,9 @@ export default function ChatArea({ initialMessages = [], receiverId }) {
     const [peer, setPeer] = useState(null);
     // Identifiant de l'utilisateur courant (décodé depuis le JWT).
     const [myId, setMyId] = useState(null);
+    // Indicateur "en train d'écrire" de l'interlocuteur (effacé après `ttl` secondes sans événement).
+    const [peerTyping, setPeerTyping] = useState(false);
+    const peerTypingTimerRef = useRef(null);
 
     const decodeTokenUserId = () => {
         try {
@@ -32,32 +35,58 @@ export default function ChatArea({ initialMessages = [], receiverId }) {
         }
     };
 
+    // Jeton de synchro delta renvoyé par l'API (curseur sur la dernière modification connue).
+    const syncTokenRef = useRef(null);
+
+    // Fusionne des messages backend dans l'état local (par id), triés chronologiquement.
+    // Les bulles optimistes (`pending`) sont remplacées par leur version serveur.
+    const mergeMessages = (prev, incoming) => {
+        const byId = new Map(prev.filter(m => !m.pending).map(m => [m.id, m]));
+        incoming.forEach(m => byId.set(m.id, { ...(byId.get(m.id) || {}), ...m }));
+        return Array.from(byId.values()).sort((a, b) => {
+            const ta = a.created_at ? new Date(a.created_at).getTime() : 0;
+            const tb = b.created_at ? new Date(b.created_at).getTime() : 0;
+            return ta - tb || (Number(a.id) - Number(b.id));
+        });
+    };
+
     // Récupère l'historique des messages pour l'utilisateur sélectionné.
-    // - Appelle l'API REST /messages/?with=<receiverId>
-    // - Met à jour la liste locale des messages (le mapping UI est fait dans <Messages /> via myId)
+    // - Premier appel: dernière page de /messages/?with=<receiverId>
+    // - Appels suivants: synchro delta via `since=<sync_token>` (nouveaux messages et changements de statut)
     const fetchMessages = async () => {
         if (!receiverId) return;
         const token = localStorage.getItem('token');
         try {
             const headers = {};
             if (token) headers['Authorization'] = `Bearer ${token}`;
-            const res = await fetch(`${BASE_URL}/messages/?with=${receiverId}`, { headers });
+            const since = syncTokenRef.current;
+            const url = `${BASE_URL}/messages/?with=${receiverId}${since ? `&since=${encodeURIComponent(since)}` : ''}`;
+            const res = await fetch(url, { headers });
             if (!res.ok) return;
             const data = await res.json();
-            setMessages(data);
+            const results = Array.isArray(data.results) ? data.results : [];
+            if (data.sync_token) syncTokenRef.current = data.sync_token;
+            if (since) {
+                if (results.length) setMessages((prev) => mergeMessages(prev, results));
+            } else {
+                setMessages(results);
+            }
         } catch (e) {
             // En cas d'erreur réseau/API, on ignore pour laisser l'UI continuer de fonctionner.
         }
     };
 
-    // Rafraîchit périodiquement les messages pour la conversation courante.
+    // Charge l'historique de la conversation courante (une fois): les mises à jour
+    // arrivent ensuite par le WebSocket (événements en direct + `sync` à la reconnexion).
     useEffect(() => {
+        syncTokenRef.current = null;
         fetchMessages();
-        const id = setInterval(fetchMessages, 4000);
-        return () => clearInterval(id);
         // eslint-disable-next-line react-hooks/exhaustive-deps
     }, [receiverId]);
 
+    // Dernier numéro de séquence d'événement reçu par le WebSocket (curseur de `sync`).
+    const lastSeqRef = useRef(null);
+
     // Set myId from token once
     // Initialise l'identifiant utilisateur (myId) à partir du JWT en localStorage.
     useEffect(() => {
@@ -94,81 +123,206 @@ export default function ChatArea({ initialMessages = [], receiverId }) {
     // Etablit la connexion WebSocket pour recevoir les événements temps réel:
     // - message_created: nouveau message (envoi/réception)
     // - message_delivered / message_read: accusés d'état
-    // - presence_update / presence_snapshot: statut en ligne / hors-ligne
+    // - messages_created: messages créés par un envoi groupé (un seul événement pour le lot)
+    // - messages_delivered / messages_read: accusés groupés (plage d'identifiants)
+    // - media_processed: poster / forme d'onde / durée d'un média disponibles
+    // - presence_batch / presence_update / presence_snapshot: statut en ligne / hors-ligne
+    // - sync_state / sync_done / sync_reset: réponses à la commande `sync` (reprise après reconnexion)
+    // - typing_batch: début / fin de saisie des interlocuteurs (éphémère, sans `seq`)
     useEffect(() => {
         const token = localStorage.getItem('token');
         if (!token) return;
-        const ws = new WebSocket(`${WS_URL}?token=${encodeURIComponent(token)}`);
-        wsRef.current = ws;
-        ws.onmessage = (evt) => {
-            try {
-                const msg = JSON.parse(evt.data);
-                if (msg.type === 'message_created') {
-                    const uid = myId ?? decodeTokenUserId();
-                    const uidNum = uid == null ? null : Number(uid);
-                    // Si le message concerne une autre conversation, on génère une notification et on incrémente les non lus.
-                    const relatesToCurrent = receiverId && (Number(msg.from) === Number(receiverId) || Number(msg.to) === Number(receiverId));
-                    if (!relatesToCurrent) {
-                        try {
-                            const fromId = Number(msg.from);
-                            const key = 'unreadCounts';
-                            const raw = localStorage.getItem(key);
-                            const obj = raw ? JSON.parse(raw) : {};
-                            const k = String(fromId);
-                            obj[k] = (obj[k] || 0) + 1;
-                            localStorage.setItem(key, JSON.stringify(obj));
-                            // Dispatch d'un événement custom pour mettre à jour la sidebar
-                            window.dispatchEvent(new CustomEvent('unread', { detail: { from: fromId, count: obj[String(fromId)] } }));
-                            // Notification navigateur (si permis)
-                            if (typeof Notification !== 'undefined') {
-                                if (Notification.permission === 'granted') {
-                                    new Notification('Nouveau message', { body: msg.content });
+        let ws;
+        let closed = false;
+        let retryTimer;
+        let retryDelay = 1000;
+        const connect = () => {
+            ws = new WebSocket(`${WS_URL}?token=${encodeURIComponent(token)}`);
+            wsRef.current = ws;
+            // S'abonner à la présence de l'interlocuteur courant uniquement (réponse: presence_snapshot),
+            // puis rejouer les événements manqués depuis le dernier `seq` reçu
+            ws.onopen = () => {
+                retryDelay = 1000;
+                try {
+                    ws.send(JSON.stringify({ type: 'presence_subscribe', user_ids: receiverId ? [Number(receiverId)] : [] }));
+                    ws.send(JSON.stringify({ type: 'sync', after: lastSeqRef.current }));
+                } catch {}
+            };
+            // Reconnexion avec délai croissant (30 s max); les événements manqués sont rejoués par `sync`
+            ws.onclose = () => {
+                if (closed) return;
+                retryTimer = setTimeout(connect, retryDelay);
+                retryDelay = Math.min(retryDelay * 2, 30000);
+            };
+            ws.onmessage = (evt) => {
+                try {
+                    const msg = JSON.parse(evt.data);
+                    if (msg.seq != null) lastSeqRef.current = Math.max(lastSeqRef.current || 0, msg.seq);
+                    if (msg.type === 'sync_state' || msg.type === 'sync_reset') {
+                        // Premier sync (ou journal dépassé): rattrapage delta par l'API, puis événements en direct
+                        fetchMessages();
+                    } else if (msg.type === 'message_created') {
+                        const uid = myId ?? decodeTokenUserId();
+                        const uidNum = uid == null ? null : Number(uid);
+                        // Si le message concerne une autre conversation, on génère une notification et on incrémente les non lus.
+                        const relatesToCurrent = receiverId && (Number(msg.from) === Number(receiverId) || Number(msg.to) === Number(receiverId));
+                        if (!relatesToCurrent) {
+                            try {
+                                const fromId = Number(msg.from);
+                                const key = 'unreadCounts';
+                                const raw = localStorage.getItem(key);
+                                const obj = raw ? JSON.parse(raw) : {};
+                                const k = String(fromId);
+                                obj[k] = (obj[k] || 0) + 1;
+                                localStorage.setItem(key, JSON.stringify(obj));
+                                // Dispatch d'un événement custom pour mettre à jour la sidebar
+                                window.dispatchEvent(new CustomEvent('unread', { detail: { from: fromId, count: obj[String(fromId)] } }));
+                                // Notification navigateur (si permis)
+                                if (typeof Notification !== 'undefined') {
+                                    if (Notification.permission === 'granted') {
+                                        new Notification('Nouveau message', { body: msg.content });
+                                    }
                                 }
-                            }
-                        } catch {}
-                        return;
-                    }
-                    // Ajout dans la conversation courante
-                    const base = {
-                        id: msg.id,
-                        from: (uidNum != null && Number(msg.from) === uidNum) ? 'me' : 'other',
-                        time: new Date(msg.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
-                        status: msg.status,
-                    };
-                    // Si c'est un message reçu de l'interlocuteur courant, considérer l'utilisateur en ligne et MAJ lastSeen
-                    if (receiverId && Number(msg.from) === Number(receiverId)) {
-                        setOnline(true);
-                        setLastSeen(new Date().toISOString());
-                    }
-                    const mtype = msg.message_type || 'text';
-                    if (mtype === 'text') {
-                        setMessages((prev) => ([...prev, { ...base, text: msg.content, type: 'text' }]));
-                    } else {
-                        const url = msg.file ? (msg.file.startsWith('http') ? msg.file : `${BASE_URL}${msg.file}`) : undefined;
-                        setMessages((prev) => ([...prev, { ...base, type: mtype, url }]));
-                    }
-                } else if (msg.type === 'message_delivered') {
-                    setMessages((prev) => prev.map(m => m.id === msg.id ? { ...m, status: 'delivered' } : m));
-                } else if (msg.type === 'message_read') {
-                    setMessages((prev) => prev.map(m => m.id === msg.id ? { ...m, status: 'read' } : m));
-                } else if (msg.type === 'presence_update') {
-                    if (receiverId && Number(msg.user_id) === Number(receiverId)) {
-                        setOnline(!!msg.online);
-                        setLastSeen(msg.last_seen || null);
-                    }
-                } else if (msg.type === 'presence_snapshot') {
-                    if (receiverId && Array.isArray(msg.online_user_ids)) {
-                        setOnline(msg.online_user_ids.includes(Number(receiverId)));
+                            } catch {}
+                            return;
+                        }
+                        // Ajout dans la conversation courante
+                        const base = {
+                            id: msg.id,
+                            from: (uidNum != null && Number(msg.from) === uidNum) ? 'me' : 'other',
+                            time: new Date(msg.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
+                            created_at: msg.created_at,
+                            status: msg.status,
+                        };
+                        // Si c'est un message reçu de l'interlocuteur courant, considérer l'utilisateur en ligne et MAJ lastSeen
+                        if (receiverId && Number(msg.from) === Number(receiverId)) {
+                            setPeerTyping(false);
+                            setOnline(true);
+                            setLastSeen(new Date().toISOString());
+                        }
+                        // Fusion par id: un événement rejoué par `sync` peut concerner un message déjà chargé
+                        const mtype = msg.message_type || 'text';
+                        if (mtype === 'text') {
+                            setMessages((prev) => mergeMessages(prev, [{ ...base, text: msg.content, type: 'text' }]));
+                        } else {
+                            const url = mediaSrc(BASE_URL, msg.file);
+                            setMessages((prev) => mergeMessages(prev, [{ ...base, type: mtype, url }]));
+                        }
+                    } else if (msg.type === 'messages_created') {
+                        // Envoi groupé: seuls les messages de la conversation courante sont ajoutés,
+                        // les messages reçus d'autres conversations incrémentent leurs non lus
+                        const uid = myId ?? decodeTokenUserId();
+                        const uidNum = uid == null ? null : Number(uid);
+                        const items = Array.isArray(msg.messages) ? msg.messages : [];
+                        const current = items.filter(m => receiverId && (Number(m.from) === Number(receiverId) || Number(m.to) === Number(receiverId)));
+                        const others = items.filter(m => !current.includes(m) && (uidNum == null || Number(m.from) !== uidNum));
+                        if (others.length) {
+                            try {
+                                const key = 'unreadCounts';
+                                const raw = localStorage.getItem(key);
+                                const obj = raw ? JSON.parse(raw) : {};
+                                others.forEach(m => { const k = String(Number(m.from)); obj[k] = (obj[k] || 0) + 1; });
+                                localStorage.setItem(key, JSON.stringify(obj));
+                                new Set(others.map(m => Number(m.from))).forEach(fromId => {
+                                    window.dispatchEvent(new CustomEvent('unread', { detail: { from: fromId, count: obj[String(fromId)] } }));
+                                });
+                            } catch {}
+                        }
+                        if (current.length) {
+                            setMessages((prev) => mergeMessages(prev, current.map(m => ({
+                                id: m.id,
+                                from: (uidNum != null && Number(m.from) === uidNum) ? 'me' : 'other',
+                                time: new Date(m.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
+                                created_at: m.created_at,
+                                status: m.status,
+                                text: m.content,
+                                type: 'text',
+                            }))));
+                        }
+                    } else if (msg.type === 'media_processed') {
+                        const poster = mediaSrc(BASE_URL, msg.poster);
+                        setMessages((prev) => prev.map(m => m.id === msg.id
+                            ? { ...m, media_status: msg.media_status, duration: msg.duration, waveform: msg.waveform, poster: m.type ? poster : msg.poster }
+                            : m));
+                    } else if (msg.type === 'message_delivered') {
+                        setMessages((prev) => prev.map(m => m.id === msg.id ? { ...m, status: 'delivered' } : m));
+                    } else if (msg.type === 'messages_delivered') {
+                        // Remise groupée (destinataire reconnecté): mes messages vers `to` dans [first_id, up_to_id] encore `sent`
+                        const uid = myId ?? decodeTokenUserId();
+                        const sentByMe = (m) => (m.sender != null ? Number(m.sender) === Number(uid) : m.from === 'me');
+                        setMessages((prev) => prev.map(m => (!m.pending && m.status === 'sent' && sentByMe(m) && Number(msg.to) === Number(receiverId)
+                            && Number(m.id) >= msg.first_id && Number(m.id) <= msg.up_to_id) ? { ...m, status: 'delivered' } : m));
+                    } else if (msg.type === 'message_read') {
+                        setMessages((prev) => prev.map(m => m.id === msg.id ? { ...m, status: 'read' } : m));
+                    } else if (msg.type === 'messages_read') {
+                        // Accusé groupé: tous les messages de `from` vers `to` dans [first_id, up_to_id]
+                        const uid = myId ?? decodeTokenUserId();
+                        const sentByFrom = (m) => (m.sender != null ? Number(m.sender) === Number(msg.from) : (m.from === 'me') === (Number(msg.from) === Number(uid)));
+                        setMessages((prev) => prev.map(m => (!m.pending && sentByFrom(m) && Number(m.id) >= msg.first_id && Number(m.id) <= msg.up_to_id) ? { ...m, status: 'read' } : m));
+                    } else if (msg.type === 'presence_update' || msg.type === 'presence_batch') {
+                        // presence_batch: { updates: [{ user_id, online, last_seen }] } (deltas nets regroupés)
+                        const updates = msg.type === 'presence_batch' ? (msg.updates || []) : [msg];
+                        const mine = updates.filter(u => receiverId && Number(u.user_id) === Number(receiverId)).pop();
+                        if (mine) {
+                            setOnline(!!mine.online);
+                            setLastSeen(mine.last_seen || null);
+                        }
+                    } else if (msg.type === 'typing_batch') {
+                        // { updates: [{ user_id, typing, ttl }] }: indicateur masqué à l'expiration de `ttl` faute de réannonce
+                        const mine = (msg.updates || []).filter(u => receiverId && Number(u.user_id) === Number(receiverId)).pop();
+                        if (mine) {
+                            clearTimeout(peerTypingTimerRef.current);
+                            setPeerTyping(!!mine.typing);
+                            if (mine.typing) peerTypingTimerRef.current = setTimeout(() => setPeerTyping(false), (mine.ttl || 6) * 1000);
+                        }
+                    } else if (msg.type === 'presence_snapshot') {
+                        if (receiverId && Array.isArray(msg.online_user_ids)) {
+                            setOnline(msg.online_user_ids.includes(Number(receiverId)));
+                        }
                     }
+                } catch (e) {
+                    // On ignore les payloads non conformes (sécurité/robustesse UI).
                 }
-            } catch (e) {
-                // On ignore les payloads non conformes (sécurité/robustesse UI).
-            }
+            };
+        };
+        connect();
+        return () => {
+            closed = true;
+            clearTimeout(retryTimer);
+            clearTimeout(peerTypingTimerRef.current);
+            setPeerTyping(false);
+            ws.close();
         };
-        ws.close();
         // eslint-disable-next-line react-hooks/exhaustive-deps
     }, [receiverId]);
 
+    // Accusé de lecture groupé: un seul `read_up_to` jusqu'au dernier message reçu de l'interlocuteur.
+    const lastAckRef = useRef(0);
+    useEffect(() => { lastAckRef.current = 0; }, [receiverId]);
+    useEffect(() => {
+        const ws = wsRef.current;
+        if (!receiverId || !ws || ws.readyState !== WebSocket.OPEN) return;
+        const fromPeer = messages.filter(m => !m.pending && (m.sender != null ? Number(m.sender) === Number(receiverId) : m.from === 'other'));
+        const upTo = fromPeer.reduce((max, m) => Math.max(max, Number(m.id) || 0), 0);
+        if (upTo > lastAckRef.current) {
+            lastAckRef.current = upTo;
+            try { ws.send(JSON.stringify({ type: 'read_up_to', with: Number(receiverId), up_to: upTo })); } catch {}
+        }
+    }, [messages, receiverId]);
+
+    // Saisie locale: `typing` envoyé au plus une fois par seconde pendant la frappe (le serveur limite
+    // et regroupe de toute façon), fin de saisie envoyée une seule fois.
+    const typingSentRef = useRef(0);
+    const handleTyping = (typing) => {
+        const ws = wsRef.current;
+        if (!receiverId || !ws || ws.readyState !== WebSocket.OPEN) return;
+        const now = Date.now();
+        if (typing ? now - typingSentRef.current < 1000 : !typingSentRef.current) return;
+        typingSentRef.current = typing ? now : 0;
+        try { ws.send(JSON.stringify({ type: 'typing', to: Number(receiverId), typing })); } catch {}
+    };
+    useEffect(() => { typingSentRef.current = 0; }, [receiverId]);
+
     // Demande la permission de notification au premier rendu si disponible.
     useEffect(() => {
         if (typeof Notification !== 'undefined' && Notification.permission === 'default') {
@@ -187,16 +341,45 @@ export default function ChatArea({ initialMessages = [], receiverId }) {
         return () => clearInterval(id);
     }, [receiverId, lastSeen]);
 
+    // Envoi d'un média par morceaux (init / PUT des morceaux / finalisation) pour ne pas
+    // faire transiter le fichier entier dans une seule requête multipart.
+    const uploadMedia = async (file, type) => {
+        const token = localStorage.getItem('token');
+        const auth = token ? { 'Authorization': `Bearer ${token}` } : {};
+        const init = await fetch(`${BASE_URL}/uploads/`, {
+            method: 'POST',
+            headers: { ...auth, 'Content-Type': 'application/json' },
+            body: JSON.stringify({ receiver: receiverId, message_type: type, filename: file.name || `${type}.webm`, size: file.size, content_type: file.type || `${type}/webm` }),
+        });
+        if (!init.ok) throw new Error('upload init failed');
+        const { id, chunk_size: chunkSize } = await init.json();
+        let offset = 0;
+        while (offset < file.size) {
+            const res = await fetch(`${BASE_URL}/uploads/${id}/?offset=${offset}`, {
+                method: 'PUT',
+                headers: { ...auth, 'Content-Type': 'application/octet-stream' },
+                body: file.slice(offset, offset + chunkSize),
+            });
+            const state = await res.json();
+            // En cas de conflit (morceau perdu/rejoué), le serveur renvoie l'offset à reprendre
+            if (!res.ok && (res.status !== 409 || state.offset === offset)) throw new Error('upload chunk failed');
+            offset = state.offset;
+        }
+        const done = await fetch(`${BASE_URL}/uploads/${id}/finalize/`, { method: 'POST', headers: auth });
+        if (!done.ok) throw new Error('upload finalize failed');
+        return done.json();
+    };
+
     // Envoi d'un message:
     // 1) Ajout optimiste dans l'UI (bulle "me")
-    // 2) Requête POST /messages/send/
+    // 2) Requête POST /messages/send/ (texte) ou envoi par morceaux /uploads/ (média)
     // 3) Rafraîchissement de la conversation à la réponse
     const handleSend = (payload) => {
         // payload can be a string (text) or { type: 'audio'|'video', file }
         const now = new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
         if (typeof payload === 'string') {
             if (!payload?.trim()) return;
-            setMessages((prev) => [...prev, { id: Date.now(), from: 'me', text: payload, time: now, type: 'text', status: 'sent' }]);
+            setMessages((prev) => [...prev, { id: Date.now(), from: 'me', text: payload, time: now, created_at: new Date().toISOString(), type: 'text', status: 'sent', pending: true }]);
             if (receiverId) {
                 const token = localStorage.getItem('token');
                 const headers = { 'Content-Type': 'application/json' };
@@ -213,18 +396,9 @@ export default function ChatArea({ initialMessages = [], receiverId }) {
         // media
         if (payload && payload.type && payload.file) {
             const url = URL.createObjectURL(payload.file);
-            setMessages((prev) => [...prev, { id: Date.now(), from: 'me', time: now, type: payload.type, url, status: 'sent' }]);
+            setMessages((prev) => [...prev, { id: Date.now(), from: 'me', time: now, created_at: new Date().toISOString(), type: payload.type, url, status: 'sent', pending: true }]);
             if (receiverId) {
-                const token = localStorage.getItem('token');
-                const fd = new FormData();
-                fd.append('receiver', String(receiverId));
-                fd.append('message_type', payload.type);
-                fd.append('file', payload.file);
-                const headers = {};
-                if (token) headers['Authorization'] = `Bearer ${token}`;
-                fetch(`${BASE_URL}/messages/send/`, { method: 'POST', headers, body: fd })
-                    .then(() => fetchMessages())
-                    .catch(() => {});
+                uploadMedia(payload.file, payload.type).then(() => fetchMessages()).catch(() => {});
             }
         }
     };
@@ -242,7 +416,7 @@ export default function ChatArea({ initialMessages = [], receiverId }) {
                         </Typography>
                         {peer ? (
                             <Typography variant="caption" color="text.secondary">
-                                {online ? 'En ligne' : (lastSeen ? `Vu à ${new Date(lastSeen).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}` : 'Hors ligne')}
+                                {peerTyping ? 'écrit…' : online ? 'En ligne' : (lastSeen ? `Vu à ${new Date(lastSeen).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}` : 'Hors ligne')}
                             </Typography>
                         ) : null}
                     </Box>
@@ -268,7 +442,7 @@ export default function ChatArea({ initialMessages = [], receiverId }) {
             {/* Input */}
             <Divider sx={{ borderColor: '#1f2937' }} />
             <Paper elevation={0} square sx={{ p: 1.5, bgcolor: '#0b1220' }}>
-                <MessagesInput onSend={handleSend} />
+                <MessagesInput onSend={handleSend} onTyping={handleTyping} />
             </Paper>
         </Box>
     )
@@ -10,6 +10,15 @@ const sample = [
     { id: 3, from: 'other', text: 'Parfait, à tout à l’heure 👋', time: '09:43' },
 ];
 
+// URL d'un média servi par le backend: réservé aux participants, le jeton passe en query string
+// (les balises <audio>/<video> ne peuvent pas envoyer d'en-tête Authorization).
+export const mediaSrc = (baseUrl, path) => {
+    if (!path) return undefined;
+    const url = String(path).startsWith('http') ? String(path) : `${baseUrl}${path}`;
+    const token = localStorage.getItem('token');
+    return token ? `${url}${url.includes('?') ? '&' : '?'}token=${encodeURIComponent(token)}` : url;
+};
+
 export default function Messages({ messages, myId, baseUrl }) {
     const normalize = (m) => {
         // If already in UI shape
@@ -25,10 +34,19 @@ export default function Messages({ messages, myId, baseUrl }) {
             id: m.id,
             from,
             time: m.created_at ? new Date(m.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }) : '',
+            status: m.status,
         };
         if (type === 'text') return { ...base, text: m.content, type };
-        const url = m.file ? (String(m.file).startsWith('http') ? m.file : `${baseUrl}${m.file}`) : undefined;
-        return { ...base, type, url };
+        const url = mediaSrc(baseUrl, m.file);
+        const poster = mediaSrc(baseUrl, m.poster);
+        return { ...base, type, url, poster, duration: m.duration, waveform: m.waveform };
+    };
+
+    // Durée "m:ss" (métadonnées calculées par le worker de médias)
+    const formatDuration = (seconds) => {
+        if (seconds == null) return '';
+        const s = Math.round(seconds);
+        return `${Math.floor(s / 60)}:${String(s % 60).padStart(2, '0')}`;
     };
 
     const data = Array.isArray(messages) && messages.length ? messages.map(normalize) : sample;
@@ -49,16 +67,26 @@ export default function Messages({ messages, myId, baseUrl }) {
                         }}
                     >
                         {m.type === 'audio' ? (
-                            <audio controls src={m.url} style={{ maxWidth: '100%' }} />
+                            <Box>
+                                {Array.isArray(m.waveform) && (
+                                    <Box sx={{ display: 'flex', alignItems: 'center', gap: '2px', height: 28, mb: 0.5 }}>
+                                        {m.waveform.map((peak, i) => (
+                                            <Box key={i} sx={{ width: 3, height: `${Math.max(8, peak * 100)}%`, bgcolor: 'rgba(255,255,255,0.6)', borderRadius: 1 }} />
+                                        ))}
+                                    </Box>
+                                )}
+                                {/* preload="none": le fichier n'est téléchargé qu'à la lecture */}
+                                <audio controls preload="none" src={m.url} style={{ maxWidth: '100%' }} />
+                            </Box>
                         ) : m.type === 'video' ? (
-                            <video controls src={m.url} style={{ maxWidth: 320, width: '100%', borderRadius: 8 }} />
+                            <video controls preload="none" poster={m.poster} src={m.url} style={{ maxWidth: 320, width: '100%', borderRadius: 8 }} />
                         ) : (
                             <Typography variant="body2" sx={{ color: m.from === 'me' ? '#ffffff' : '#e5e7eb' }}>{m.text}</Typography>
                         )}
                         <Box sx={{ mt: 0.5, display: 'flex', justifyContent: 'flex-end' }}>
                             <Stack direction="row" spacing={0.5} alignItems="center">
                                 <Typography variant="caption" color={m.from === 'me' ? 'rgba(255,255,255,0.8)' : 'text.secondary'}>
-                                    {m.time}
+                                    {m.duration != null ? `${formatDuration(m.duration)} · ` : ''}{m.time}
                                 </Typography>
                                 {m.from === 'me' && (
                                     m.status === 'read' ? (
@@ -2,7 +2,7 @@ import React from 'react'
 import Box from '@mui/material/Box';
 import { TextField, Button, Stack } from '@mui/material';
 
-export default function MessagesInput({ onSend }) {
+export default function MessagesInput({ onSend, onTyping }) {
     const [text, setText] = React.useState('');
     const [recording, setRecording] = React.useState(false);
     const mediaRef = React.useRef(null);
@@ -15,6 +15,7 @@ export default function MessagesInput({ onSend }) {
         if (!text.trim()) return;
         onSend?.(text);
         setText('');
+        onTyping?.(false);
     };
 
     const startRecording = async () => {
@@ -94,7 +95,7 @@ export default function MessagesInput({ onSend }) {
                     size="small"
                     placeholder="Écrire un message..."
                     value={text}
-                    onChange={(e) => setText(e.target.value)}
+                    onChange={(e) => { setText(e.target.value); onTyping?.(e.target.value.trim() !== ''); }}
                 />
                 <Button type="submit" variant="contained">
                     Envoyer
@@ -7,22 +7,63 @@ export default function Sidebars() {
     const [users, setUsers] = useState([]);
     const [q, setQ] = useState('');
     const [unread, setUnread] = useState({});
+    // Résumés serveur par interlocuteur: { [peerId]: { unread_count, preview, at } }
+    const [summaries, setSummaries] = useState({});
     const navigate = useNavigate();
     const [params] = useSearchParams();
     const selectedId = Number(params.get('with')) || null;
     const BASE_URL = 'http://localhost:8000';
 
-    useEffect(() => {
+    // Curseur de la page suivante de l'annuaire (null si tout est chargé).
+    const [nextCursor, setNextCursor] = useState(null);
+
+    // Charge une page de l'annuaire (contacts récents d'abord), filtrée côté serveur par préfixe.
+    const fetchUsers = (cursor = null) => {
         const token = localStorage.getItem('token');
         if (!token) return;
-        fetch(`${BASE_URL}/users/`, {
+        const params = new URLSearchParams();
+        if (q.trim()) params.set('q', q.trim());
+        if (cursor) params.set('cursor', cursor);
+        fetch(`${BASE_URL}/users/?${params.toString()}`, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
         })
-            .then(res => res.ok ? res.json() : [])
-            .then(data => setUsers(Array.isArray(data) ? data : []))
-            .catch(() => setUsers([]));
+            .then(res => res.ok ? res.json() : null)
+            .then(data => {
+                const results = data && Array.isArray(data.results) ? data.results : [];
+                setUsers((prev) => cursor ? [...prev, ...results] : results);
+                setNextCursor(data ? data.next : null);
+            })
+            .catch(() => { if (!cursor) setUsers([]); });
+    };
+
+    // Recherche serveur avec un léger délai pendant la saisie.
+    useEffect(() => {
+        const id = setTimeout(() => fetchUsers(), 250);
+        return () => clearTimeout(id);
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [q]);
+
+    // Charger les résumés de conversation (non lus + dernier message) calculés côté serveur
+    useEffect(() => {
+        const token = localStorage.getItem('token');
+        if (!token) return;
+        fetch(`${BASE_URL}/conversations/`, { headers: { 'Authorization': `Bearer ${token}` } })
+            .then(res => res.ok ? res.json() : null)
+            .then(data => {
+                if (!data || !Array.isArray(data.results)) return;
+                const map = {};
+                const counts = {};
+                data.results.forEach(c => {
+                    map[c.peer.id] = { unread_count: c.unread_count, preview: c.last_message?.preview, at: c.last_message?.created_at };
+                    if (c.unread_count) counts[String(c.peer.id)] = c.unread_count;
+                });
+                setSummaries(map);
+                try { localStorage.setItem('unreadCounts', JSON.stringify(counts)); } catch {}
+                setUnread(counts);
+            })
+            .catch(() => {});
     }, []);
 
     // Charger les compteurs non lus depuis localStorage et écouter les événements 'unread'
@@ -44,12 +85,13 @@ export default function Sidebars() {
     const stripAccents = (s = '') => s.normalize('NFD').replace(/\p{Diacritic}+/gu, '');
     const norm = (s = '') => stripAccents(String(s).toLowerCase().trim());
     const query = norm(q);
+    const recency = (u) => (summaries[u.id]?.at ? new Date(summaries[u.id].at).getTime() : 0);
     const filtered = users.filter(u => {
         if (!query) return true;
         const name = `${u.first_name || ''} ${u.last_name || ''}`.trim();
         const email = u.email || '';
         return norm(name).includes(query) || norm(email).includes(query);
-    });
+    }).sort((a, b) => recency(b) - recency(a));
 
     const openChat = (id) => {
         // Réinitialiser le compteur pour cet utilisateur
@@ -116,12 +158,17 @@ export default function Sidebars() {
                                     </Badge>
                                     <ListItemText
                                         primary={<Typography variant="subtitle2" fontWeight={600}>{name}</Typography>}
-                                        secondary={<Typography variant="caption" color="text.secondary">Appuyer pour discuter</Typography>}
+                                        secondary={<Typography variant="caption" color="text.secondary" noWrap>{summaries[u.id]?.preview || 'Appuyer pour discuter'}</Typography>}
                                     />
                                 </Stack>
                             </ListItemButton>
                         );
                     })}
+                    {nextCursor ? (
+                        <ListItemButton sx={{ borderRadius: 2, justifyContent: 'center' }} onClick={() => fetchUsers(nextCursor)}>
+                            <Typography variant="caption" color="text.secondary">Charger plus</Typography>
+                        </ListItemButton>
+                    ) : null}
                 </List>
             </Stack>
         </Box>